@@ -1,22 +1,67 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from dotenv import load_dotenv
+from app.settings import load_environment
 import os
 
-load_dotenv()
+load_environment()
 
 # Load the database URL from the .env file
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # print("DATABASE_URL:", DATABASE_URL)
 
+# Connection pool sizing, per engine. The sync engine serves the job workers (JOB_WORKERS) and the threadpool
+# handlers, the async engine the async handlers of the event loop.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before the server or a proxy drops idle ones.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Async drivers of the supported databases
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+"""
+    Returns the URL of the async engine: ASYNC_DATABASE_URL, or DATABASE_URL with the async driver of its database.
+"""
+def get_async_database_url(database_url: str) -> str:
+    """Returns the URL of the async engine."""
+    if os.getenv("ASYNC_DATABASE_URL"):
+        return os.getenv("ASYNC_DATABASE_URL")
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {url.get_backend_name()}, set ASYNC_DATABASE_URL.")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def get_engine_options(database_url: str) -> dict:
+    # SQLite connections are used by the job worker threads too, not only by the thread that opened them.
+    # SQLite is a local file, it has no server side pool to size.
+    if database_url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
 # Create a SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL))
 
 # Create a session maker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create the async engine and session maker, used by the async API handlers.
+# Objects stay readable after commit, lazy loads are not possible outside of the session's greenlet.
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create a base class for declarative models
 Base = declarative_base()
 
@@ -27,3 +72,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Function to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,12 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import projects
-from app.database import engine, Base
+from app.routers import metrics, projects
+from app.database import async_engine, engine, Base
+from app.migrations import upgrade
+from app.services import job_service
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Add the columns and indexes of the models to the tables of an older database
+upgrade(engine)
+
+# Release the background job workers and the async database connections when the server stops
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    job_service.shutdown()
+    await async_engine.dispose()
+
 # Create a FastAPI instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Include the projects router
 app.include_router(projects.router)
+
+# Include the Prometheus metrics endpoint (/metrics)
+app.include_router(metrics.router)
@@ -0,0 +1,72 @@
+## Schema upgrades of existing databases, run at startup after Base.metadata.create_all.
+## create_all creates the missing tables but never alters a table that already exists, so the columns and indexes
+## added to a model since the database was created are added here, followed by the backfill of the new columns.
+
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from app.database import Base
+
+logging.basicConfig(level=logging.INFO)
+
+# Run once, right after their column was added: (table, column) -> statements.
+BACKFILLS = {
+    # Projects stored before the background jobs ran their workflow inline, they are all finished.
+    ("projects", "status"): ["UPDATE projects SET status = 'completed' WHERE status IS NULL"],
+    ("projects", "created_at"): ["UPDATE projects SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"],
+    # srs_blob_sha stays NULL for the older projects: their SRS text is read from srs_content
+    # (project_service.get_srs_content), which is kept as it is.
+}
+
+
+"""
+    Adds the model columns missing from the existing tables.
+    Columns are added nullable and without a server default (SQLite cannot add a column with a non-constant
+    default); the backfills fill the existing rows, the model defaults the new ones.
+
+    Returns:
+        List[tuple]: The (table, column) pairs added.
+"""
+def add_missing_columns(connection: Connection):
+    """Adds the model columns missing from the existing tables."""
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+            ))
+            logging.info(f"Migration: added column {table.name}.{column.name}")
+            added.append((table.name, column.name))
+    return added
+
+
+"""
+    Creates the model indexes missing from the existing tables.
+"""
+def add_missing_indexes(connection: Connection):
+    """Creates the model indexes missing from the existing tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+"""
+    Brings an existing database up to the current models: missing columns (with their backfills) and indexes.
+    Safe to run on every start, it does nothing on an up to date database.
+"""
+def upgrade(engine: Engine):
+    """Brings an existing database up to the current models."""
+    with engine.begin() as connection:
+        for table_column in add_missing_columns(connection):
+            for statement in BACKFILLS.get(table_column, []):
+                connection.execute(text(statement))
+        add_missing_indexes(connection)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String, func
+from app.database import Base
+
+# Content-addressed blobs: SRS texts and generated files, stored once per distinct content.
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # Define columns
+    # SHA-256 of the uncompressed content
+    sha256 = Column(String(64), primary_key=True)
+    data = Column(LargeBinary)
+    # "zstd", "zstd-dict:<sha256 of the dictionary blob>" or "raw"
+    codec = Column(String)
+    size = Column(Integer)
+    compressed_size = Column(Integer)
+    created_at = Column(DateTime, server_default=func.now())
+
+# The generated files of a project, referencing their content in the blob store
+class ProjectArtifact(Base):
+    __tablename__ = "project_artifacts"
+
+    # Define columns
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    # Path relative to the project workspace
+    path = Column(String, primary_key=True)
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=False, index=True)
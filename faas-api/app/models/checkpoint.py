@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, LargeBinary
+from app.database import Base
+
+# LangGraph checkpoints of the generation workflow, one thread per project ("project-<id>")
+class GraphCheckpoint(Base):
+    __tablename__ = "graph_checkpoints"
+
+    # Define columns
+    thread_id = Column(String, primary_key=True)
+    checkpoint_ns = Column(String, primary_key=True, default="")
+    checkpoint_id = Column(String, primary_key=True)
+    parent_checkpoint_id = Column(String)
+    checkpoint_type = Column(String)
+    checkpoint = Column(LargeBinary)
+    metadata_type = Column(String)
+    checkpoint_metadata = Column(LargeBinary)
+
+# Writes of tasks that finished within a step, so a resumed run does not repeat them
+class GraphCheckpointWrite(Base):
+    __tablename__ = "graph_checkpoint_writes"
+
+    # Define columns
+    thread_id = Column(String, primary_key=True)
+    checkpoint_ns = Column(String, primary_key=True, default="")
+    checkpoint_id = Column(String, primary_key=True)
+    task_id = Column(String, primary_key=True)
+    idx = Column(Integer, primary_key=True)
+    channel = Column(String)
+    value_type = Column(String)
+    value = Column(LargeBinary)
+    task_path = Column(String, default="")
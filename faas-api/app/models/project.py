@@ -1,13 +1,31 @@
-from sqlalchemy import Column, Integer, String, LargeBinary, Text
+from sqlalchemy import Column, DateTime, Index, Integer, String, LargeBinary, Text, JSON, func
+from sqlalchemy.orm import deferred
 from app.database import Base
 
 # Define the Project model
 class Project(Base):
     __tablename__ = "projects"
+    # Listing by status pages through the id order of one status (keyset pagination).
+    __table_args__ = (Index("ix_projects_status_id", "status", "id"),)
 
     # Define columns
     id = Column(Integer, primary_key=True, index=True)
-    srs_content = Column(Text)
+    # The SRS text and sections are large and only needed by the pipeline and the full project view,
+    # so they are loaded on first access instead of with every project row.
+    # Legacy inline SRS text; new projects keep it in the blob store (srs_blob_sha), see project_service.get_srs_content.
+    srs_content = deferred(Column(Text))
+    # SHA-256 of the SRS text in the blob store
+    srs_blob_sha = Column(String(64))
+    # The SRS split into sections at upload time, indexed for per-prompt retrieval: [{title, text}]
+    srs_sections = deferred(Column(JSON))
     screenshot_url = Column(String)
     preview_link = Column(String)
     langsmith_run_id = Column(String)
+    # Background job progress: queued -> running -> completed / failed, and the pipeline stage currently executing.
+    status = Column(String, default="queued", index=True)
+    stage = Column(String)
+    error = Column(Text)
+    # LLM token usage per pipeline stage: {stage: {calls, cached_calls, prompt_tokens, completion_tokens}}
+    token_usage = Column(JSON)
+    # Set when the project is stored (by the model too: the column added by app.migrations has no server default)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now(), index=True)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 class ProjectResponse(BaseModel):
     id: int
@@ -7,6 +8,24 @@ class ProjectResponse(BaseModel):
     screenshot_url: Optional[str] = None
     preview_link: Optional[str] = None
     langsmith_run_id: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProjectStatusResponse(BaseModel):
+    id: int  # The project id doubles as the job id.
+    status: Optional[str] = None
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    preview_link: Optional[str] = None
+    token_usage: Optional[Dict[str, Dict[str, int]]] = None
+
+    class Config:
+        from_attributes = True
+
+class ProjectListResponse(BaseModel):
+    # Only the requested fields of every project.
+    items: List[Dict[str, Any]]
+    # Pass as after_id to read the next page, None on the last page.
+    next_after_id: Optional[int] = None
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Boolean, Float, String, JSON
+from app.database import Base
+
+# LangSmith run data served by /projects/{project_id}/logs, so repeated reads do not call LangSmith again.
+# Completed runs never change and are kept; runs still in progress are refetched once their entry is older than the TTL.
+class LangSmithRun(Base):
+    __tablename__ = "langsmith_runs"
+
+    # Define columns
+    run_id = Column(String, primary_key=True)
+    logs = Column(JSON)
+    completed = Column(Boolean, default=False)
+    # Unix time of the last fetch from LangSmith
+    fetched_at = Column(Float)
@@ -0,0 +1,14 @@
+## Prometheus scrape endpoint.
+## /metrics (GET): stage latencies, LLM calls / tokens / retries / cache lookups, queue depths and command run times,
+## in the Prometheus text format (see app/services/metrics_service.py).
+
+from fastapi import APIRouter, Response
+from app.services import metrics_service
+
+# Create an APIRouter instance
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    data, content_type = metrics_service.render()
+    return Response(content=data, media_type=content_type)
@@ -4,25 +4,25 @@
 
 import logging
 import os
-from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services import project_service
+from app.settings import load_environment
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
+from app.database import get_async_db, get_db
+from app.services import project_service, job_service, langsmith_service
 from app.models.project import Project
-from app.models.response_models import ProjectResponse # Import the Pydantic model
-from langsmith import Client  # Import LangSmith client
+from app.models.response_models import ProjectListResponse, ProjectResponse, ProjectStatusResponse # Import the Pydantic models
 
 logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
+load_environment()
 
-LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
-
-if not LANGCHAIN_API_KEY:
-    raise ValueError("LANGCHAIN_API_KEY environment variable not set.")
-
-client = Client(api_key=LANGCHAIN_API_KEY)
+# Maximum page size of GET /projects.
+PROJECT_LIST_MAX_LIMIT = int(os.getenv("PROJECT_LIST_MAX_LIMIT", "500"))
+# Maximum number of projects in one bulk logs request.
+LOGS_BULK_MAX_PROJECTS = int(os.getenv("LOGS_BULK_MAX_PROJECTS", "100"))
 
 # Create an APIRouter instance
 router = APIRouter()
@@ -36,54 +36,140 @@ router = APIRouter()
 # Functionality:
 # Extracts text from the DOCX.
 # Creates a Project record in the database.
-# Starts the LangGraph workflow.
-# Returns the project_id.
-@router.post("/projects/", response_model=ProjectResponse)
-async def create_project(srs_file: UploadFile = File(...), screenshot_url: str = Form(...), db: Session = Depends(get_db)):
-    db_project = project_service.create_project(db, srs_file, screenshot_url)
-    if db_project:
-        return ProjectResponse(
-        id=db_project.id,
-        srs_content=db_project.srs_content,
-        screenshot_url=db_project.screenshot_url,
-        preview_link=db_project.preview_link,
-        langsmith_run_id=db_project.langsmith_run_id
+# Queues the LangGraph workflow on the background worker pool.
+# Returns 202 with the project_id, which is also the job id to poll on /projects/{project_id}/status.
+# Nothing here blocks the event loop (async upload read, DOCX parsing in a thread, AsyncSession), so uploads and
+# reads interleave on one worker.
+@router.post("/projects/", response_model=ProjectStatusResponse, status_code=202)
+async def create_project(srs_file: UploadFile = File(...), screenshot_url: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    if not job_service.has_capacity():
+        raise HTTPException(status_code=503, detail="Generation queue is full, retry later")
+
+    db_project = await project_service.acreate_project(db, await srs_file.read(), screenshot_url)
+    try:
+        job_service.submit_job(db_project.id, project_service.run_project_pipeline, db_project.id)
+    except job_service.JobQueueFullError as e:
+        await db.run_sync(project_service.update_project_status, db_project, status="failed", error=str(e))
+        raise HTTPException(status_code=503, detail="Generation queue is full, retry later")
+
+    return ProjectStatusResponse.model_validate(db_project)
+
+# API endpoint to list projects
+# /projects (GET): one page of projects in id order.
+# Query parameters:
+# after_id: the next_after_id of the previous page (keyset pagination, omit for the first page)
+# limit: page size
+# status: only projects with one of these statuses (repeatable)
+# created_after / created_before: only projects created in this time range
+# fields: comma separated fields to return, e.g. "id,status,created_at" (srs_content is only loaded when listed)
+@router.get("/projects", response_model=ProjectListResponse)
+async def list_projects(
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: int = Query(50, ge=1),
+    status: Optional[List[str]] = Query(None),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    unknown = sorted(set(selected or []) - set(project_service.PROJECT_LIST_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    projects, next_after_id = await db.run_sync(
+        project_service.list_projects, after_id=after_id, limit=min(limit, PROJECT_LIST_MAX_LIMIT), statuses=status,
+        created_after=created_after, created_before=created_before, fields=selected,
     )
-    else:
-        raise HTTPException(status_code=500, detail="Project creation failed")
+    selected = selected or project_service.PROJECT_LIST_DEFAULT_FIELDS
+    items = [{field: getattr(project, field) for field in selected if field != "srs_content"} for project in projects]
+    if "srs_content" in selected:
+        srs_contents = await db.run_sync(project_service.get_srs_contents, projects)
+        for item, project in zip(items, projects):
+            item["srs_content"] = srs_contents[project.id]
+    return ProjectListResponse(items=items, next_after_id=next_after_id)
+
+# API endpoint to read the Langsmith Logs of many projects at once
+# /projects/logs?project_ids=1&project_ids=2 (GET): {project_id: logs}, or {project_id: {"error": ...}} for a project
+# without logs. Declared before /projects/{project_id} so "logs" is not parsed as a project id.
+@router.get("/projects/logs")
+def get_projects_logs(project_ids: List[int] = Query(...), db: Session = Depends(get_db)):
+    if len(project_ids) > LOGS_BULK_MAX_PROJECTS:
+        raise HTTPException(status_code=400, detail=f"At most {LOGS_BULK_MAX_PROJECTS} project ids per request")
+
+    projects = {project.id: project for project in db.query(Project).filter(Project.id.in_(project_ids)).all()}
+    run_ids = [project.langsmith_run_id for project in projects.values() if project.langsmith_run_id]
+    run_logs = langsmith_service.get_runs_logs(db, run_ids)
+
+    logs = {}
+    for project_id in project_ids:
+        project = projects.get(project_id)
+        if not project:
+            logs[project_id] = {"error": "Project not found"}
+        elif not project.langsmith_run_id:
+            logs[project_id] = {"error": "Langsmith run ID not found"}
+        else:
+            logs[project_id] = run_logs[project.langsmith_run_id]
+    return logs
 
 # API endpoint to read a project by ID
 @router.get("/projects/{project_id}", response_model=ProjectResponse)
-def read_project(project_id: int, db: Session = Depends(get_db)):
-    db_project = project_service.get_project(db, project_id)
+async def read_project(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_project = await db.get(Project, project_id, options=[undefer(Project.srs_content)])
+    if db_project:
+        response = ProjectResponse.model_validate(db_project)
+        response.srs_content = await db.run_sync(project_service.get_srs_content, db_project)
+        return response
+    else:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+# API endpoint to read the background job status of a project
+# /projects/{project_id}/status (GET): reports queued / running / completed / failed and the current pipeline stage.
+@router.get("/projects/{project_id}/status", response_model=ProjectStatusResponse)
+async def read_project_status(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_project = await db.get(Project, project_id)
     if db_project:
         return db_project
     else:
         raise HTTPException(status_code=404, detail="Project not found")
 
+# API endpoint to resume a project
+# /projects/{project_id}/resume (POST): continues a failed or interrupted workflow from its last completed stage.
+@router.post("/projects/{project_id}/resume", response_model=ProjectStatusResponse, status_code=202)
+def resume_project(project_id: int, db: Session = Depends(get_db)):
+    db_project = project_service.get_project(db, project_id)
+    if not db_project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if db_project.status == "completed":
+        raise HTTPException(status_code=409, detail="Project already completed")
+    if job_service.is_running(project_id):
+        raise HTTPException(status_code=409, detail="Project workflow is already running")
+
+    previous_status, previous_stage, previous_error = db_project.status, db_project.stage, db_project.error
+    project_service.update_project_status(db, db_project, status="queued", clear_stage=True)
+    try:
+        job_service.submit_job(db_project.id, project_service.resume_project_pipeline, db_project.id)
+    except job_service.JobQueueFullError:
+        project_service.update_project_status(db, db_project, status=previous_status, stage=previous_stage,
+                                              error=previous_error, clear_stage=True)
+        raise HTTPException(status_code=503, detail="Generation queue is full, retry later")
+
+    return db_project
+
 # API endpoint to read Langsmith Logs by Project ID
+# Served from the LangSmith run cache; a plain def so FastAPI runs it in the threadpool, off the event loop.
 @router.get("/projects/{project_id}/logs")
-async def get_project_logs(project_id: int, db: Session = Depends(get_db)):
+def get_project_logs(project_id: int, db: Session = Depends(get_db)):
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     if not project.langsmith_run_id:
         raise HTTPException(status_code=404, detail="Langsmith run ID not found")
 
-    # Fetch logs from LangSmith using project.langsmith_run_id
+    # Fetch logs from LangSmith using project.langsmith_run_id, unless they are cached
     try:
-        run = client.read_run(run_id=project.langsmith_run_id)
-        # Extract desired log information from the run object.
-        # Example:
-        logs = {
-            "name": run.name,
-            "start_time": run.start_time,
-            "end_time": run.end_time,
-            "inputs": run.inputs,
-            "outputs": run.outputs,
-            "events": [event.dict() for event in run.events] # Convert events to dict.
-        }
+        logs = langsmith_service.get_run_logs(db, project.langsmith_run_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching LangSmith logs: {e}")
 
-    return logs
\ No newline at end of file
+    return logs
@@ -1,36 +1,43 @@
 ## Milestone 1, Focus on implementing the "Analysis" milestone. This involves creating an AI workflow using LangChain and LangGraph 
 ## to analyze the SRS document and UI screenshots, extracting the necessary details for frontend generation.
 
-from langchain_groq import ChatGroq
-# or
-# from langchain_groq.chat_models import ChatGroq
-# from langchain_community.chat_models import ChatGroq
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from dotenv import load_dotenv
+from app.settings import load_environment
 import os
 from typing import Dict, Any, List, Optional
 from langchain_core.messages import HumanMessage
 #from langchain_openai import ChatOpenAI
-from PIL import Image
 import requests
 from io import BytesIO
 import base64
-import os
-from dotenv import load_dotenv
 import logging
 from app.services.common_service import GraphState;
+from app.services.client_service import get_chat_model
+from app.services import token_service
+from app.services.cache_service import ImageCache
+import asyncio
+import hashlib
+import json
 
 logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
+load_environment()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
 MEDIA_PATH = os.getenv("MEDIA_PATH")
 
-groq_llm = ChatGroq(groq_api_key=GROQ_API_KEY,model="llama-3.2-11b-vision-preview", #"llama-3.3-70b-versatile", #"mistral-saba-24b" or "llama-3.1-8b-instant",
-                    temperature=0)
+VISION_MODEL = "llama-3.2-11b-vision-preview"
+SCREENSHOT_PROMPT = "Extract UI components, design language, and layout details from this image."
+
+# Screenshot analyses are cached by image content hash, so re-used mockups skip the vision call.
+SCREENSHOT_CACHE_ENABLED = os.getenv("SCREENSHOT_CACHE_ENABLED", "true").lower() == "true"
+SCREENSHOT_CACHE_PATH = os.path.abspath(os.getenv("SCREENSHOT_CACHE_PATH", ".cache/screenshot_cache.sqlite3"))
+SCREENSHOT_CACHE_MAX_BYTES = int(os.getenv("SCREENSHOT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional perceptual hash matching, so re-exported or re-compressed screenshots also hit.
+SCREENSHOT_CACHE_PHASH = os.getenv("SCREENSHOT_CACHE_PHASH", "false").lower() == "true"
+SCREENSHOT_PHASH_MAX_DISTANCE = int(os.getenv("SCREENSHOT_PHASH_MAX_DISTANCE", "4"))
+
+_screenshot_cache: Optional[ImageCache] = None
 
 """
 Takes the SRS content and screenshot details as input.
@@ -39,13 +46,14 @@ Defines ResponseSchema for structured output parsing.
 Uses StructuredOutputParser to parse the LLM response.
 Returns a dictionary containing extracted information.
 """
-def analyze_srs(srs_content: str, screenshot_details:  Dict[str, Any]):
+async def analyze_srs(srs_content: str, screenshot_details:  Dict[str, Any]):
     """Analyzes the SRS document and screenshot details, using Groq LLM, saving results to GraphState."""
 
     analysis_results:  Dict[str, Any] = {}
 
     if not srs_content or not screenshot_details:
         logging.error("SRS content or screenshot details not found in GraphState.")
+        analysis_results["errors"] = ["SRS content or screenshot details not found."]
         return analysis_results  # Return empty
 
     srs_prompt = ChatPromptTemplate.from_template(
@@ -64,8 +72,12 @@ def analyze_srs(srs_content: str, screenshot_details:  Dict[str, Any]):
     output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
     format_instructions = output_parser.get_format_instructions()
 
-    srs_message = srs_prompt.format_messages(srs_content=srs_content, screenshot_details=screenshot_details, format_instructions=format_instructions)
-    srs_response = groq_llm.invoke(srs_message) # llm(srs_message) #groq_llm(message)
+    # Screenshot details are trimmed first, the SRS only if it still does not fit the stage budget.
+    srs_message = token_service.format_messages_within_budget(
+        srs_prompt, "analyze_srs", ["screenshot_details", "srs_content"],
+        srs_content=srs_content, screenshot_details=screenshot_details, format_instructions=format_instructions,
+    )
+    srs_response = await get_chat_model().ainvoke(srs_message, stage="analyze_srs") # llm(srs_message) #groq_llm(message)
 
     try:
         parsed_data = output_parser.parse(srs_response.content)
@@ -82,8 +94,8 @@ def analyze_srs(srs_content: str, screenshot_details:  Dict[str, Any]):
 
     except Exception as e:
         logging.error(f"Parsing Error: {e}")
-        analysis_results.errors = analysis_results.errors or []
-        analysis_results.errors.append(f"SRS Analysis Parsing Error: {e}")
+        analysis_results["errors"] = analysis_results.get("errors") or []
+        analysis_results["errors"].append(f"SRS Analysis Parsing Error: {e}")
 
     # print(analysis_results)\
     
@@ -91,59 +103,126 @@ def analyze_srs(srs_content: str, screenshot_details:  Dict[str, Any]):
     # return {"ui_components": ["button", "form"], "state_management": "NgRx"} # Example data
     return analysis_results
 
-def encode_image(screenshot_path):
+def read_image(screenshot_path):
     with open(MEDIA_PATH + screenshot_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+        return image_file.read()
+
+def encode_image(screenshot_path):
+    return base64.b64encode(read_image(screenshot_path)).decode("utf-8")
 
 
-def get_image_info(encoded_image):
-    response = groq_llm.invoke( 
+async def get_image_info(encoded_image):
+    response = await get_chat_model(VISION_MODEL).ainvoke(
         input=[
             {
                 "role": "user",
                 "content": [
-                    {"type": "text", "text": "Extract UI components, design language, and layout details from this image."},
+                    {"type": "text", "text": SCREENSHOT_PROMPT},
                     {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}},
                 ],
             }
         ],
-        model="llama-3.2-11b-vision-preview",
+        model=VISION_MODEL,
+        stage="analyze_screenshot",
     )
     return response.content
 
+def get_screenshot_cache():
+    global _screenshot_cache
+    if _screenshot_cache is None:
+        _screenshot_cache = ImageCache(SCREENSHOT_CACHE_PATH, "screenshot_details", SCREENSHOT_CACHE_MAX_BYTES)
+    return _screenshot_cache
+
+"""
+Computes a 64-bit difference hash (dHash) of an image.
+Visually identical images (re-exported, resized, re-compressed) get hashes within a few bits of each other.
+Returns None if the bytes cannot be decoded as an image.
+"""
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    from PIL import Image  # imported on first use, Pillow is only needed with SCREENSHOT_CACHE_PHASH
+    try:
+        img = Image.open(BytesIO(image_bytes)).convert("L").resize((9, 8), Image.LANCZOS)
+    except Exception as e:
+        logging.warning(f"Could not compute perceptual hash: {e}")
+        return None
+    pixels = list(img.getdata())
+    phash = 0
+    for row in range(8):
+        for col in range(8):
+            phash = (phash << 1) | int(pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return phash
+
+def screenshot_cache_key(image_bytes: bytes) -> str:
+    # The model and prompt are part of the key, so changing either invalidates old analyses.
+    digest = hashlib.sha256(f"{VISION_MODEL}\n{SCREENSHOT_PROMPT}\n".encode("utf-8"))
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+"""
+Looks up a cached screenshot analysis by content hash, then by perceptual hash when enabled.
+Returns the cached screenshot details, or None on a miss.
+"""
+def get_cached_screenshot_details(image_bytes: bytes) -> Optional[Dict[str, Any]]:
+    if not SCREENSHOT_CACHE_ENABLED:
+        return None
+    cache = get_screenshot_cache()
+    cached = cache.get(screenshot_cache_key(image_bytes))
+    if cached is None and SCREENSHOT_CACHE_PHASH:
+        phash = perceptual_hash(image_bytes)
+        similar_key = cache.find_similar(phash, SCREENSHOT_PHASH_MAX_DISTANCE) if phash is not None else None
+        if similar_key:
+            cached = cache.get(similar_key)
+    return json.loads(cached) if cached is not None else None
+
+def cache_screenshot_details(image_bytes: bytes, screenshot_details: Dict[str, Any]):
+    if not SCREENSHOT_CACHE_ENABLED:
+        return
+    phash = perceptual_hash(image_bytes) if SCREENSHOT_CACHE_PHASH else None
+    get_screenshot_cache().set(screenshot_cache_key(image_bytes), json.dumps(screenshot_details), phash)
+
 """
 Takes the screenshot local file path as input.
+Returns the cached analysis if the same (or, optionally, a visually identical) image was analyzed before.
 Encodes the image as a base64 string.
 Creates a prompt for Llama 3 Vision (Groq) with the image and text.
 Sends the prompt to the Groq LLM.
 Returns the response content (design details).
 Handles potential errors during image fetching or processing.
 """
-def analyze_screenshot(screenshot_path: str):
+async def analyze_screenshot(screenshot_path: str):
     """Analyzes a screenshot using Llama 3 Vision (Groq)."""
     screenshot_details:  Dict[str, Any] = {} 
     if not screenshot_path:
         logging.error("Screenshot Path not found.")
-        screenshot_details["errors"] = screenshot_details["errors"] or []
+        screenshot_details["errors"] = screenshot_details.get("errors") or []
         screenshot_details["errors"].append("Screenshot Path not found.")
         return screenshot_details  # Return without changes
 
     try:
-        img_base64 = encode_image(screenshot_path)
+        # File and cache I/O run in worker threads, off the event loop
+        image_bytes = await asyncio.to_thread(read_image, screenshot_path)
+
+        cached_details = await asyncio.to_thread(get_cached_screenshot_details, image_bytes)
+        if cached_details is not None:
+            logging.info(f"Screenshot analysis cache hit: {screenshot_path}")
+            return cached_details
+
+        img_base64 = base64.b64encode(image_bytes).decode("utf-8")
 
-        message = get_image_info(img_base64)
+        message = await get_image_info(img_base64)
         
         screenshot_details["screenshot_details"] = {"description": message}  
         logging.info(f"Screenshot processing response: {message}")
+        await asyncio.to_thread(cache_screenshot_details, image_bytes, screenshot_details)
     except Exception as e:
         screenshot_details["screenshot_details"] = {"error": f"Error processing screenshot: {e}"}
         logging.exception(f"Error processing screenshot: {e}")
-        screenshot_details["errors"] = screenshot_details["errors"] or []
+        screenshot_details["errors"] = screenshot_details.get("errors") or []
         screenshot_details["errors"].append(f"Groq LLM Error: {e}")
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching screenshot: {e}")
         screenshot_details["screenshot_details"] = {"error": f"Error fetching screenshot: {e}"}
-        screenshot_details["errors"] = screenshot_details["errors"] or []
+        screenshot_details["errors"] = screenshot_details.get("errors") or []
         screenshot_details["errors"].append(f"Request Error: {e}")
 
     return screenshot_details 
@@ -0,0 +1,241 @@
+## Content-addressed blob store.
+## Contents (SRS texts, generated files) are keyed by their SHA-256 and stored once, zstd compressed, so the SRS
+## boilerplate and the components shared by many projects take the space of a single copy.
+## An optional zstd dictionary trained on the stored SRS documents (train_dictionary) further improves the ratio
+## of these small, similar documents. Callers commit the session.
+
+import hashlib
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+import zstandard as zstd
+from app.settings import load_environment
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.blob import Blob, ProjectArtifact
+from app.models.project import Project
+from app.services.cache_service import LRUCache
+from app.services.common_service import run_concurrently
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "10"))
+# SHA-256 of a dictionary stored by train_dictionary. New blobs are compressed with it, existing ones keep theirs.
+BLOB_DICTIONARY_SHA = os.getenv("BLOB_DICTIONARY_SHA")
+BLOB_DICTIONARY_SIZE = int(os.getenv("BLOB_DICTIONARY_SIZE", str(112 * 1024)))
+# Contents smaller than this are stored raw, a zstd frame would not make them smaller.
+BLOB_MIN_COMPRESS_SIZE = int(os.getenv("BLOB_MIN_COMPRESS_SIZE", "64"))
+BLOB_COMPRESS_WORKERS = int(os.getenv("BLOB_COMPRESS_WORKERS", "4"))
+
+DICTIONARY_CODEC_PREFIX = "zstd-dict:"
+
+_dictionaries = LRUCache(8)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _to_bytes(content) -> bytes:
+    return content if isinstance(content, bytes) else (content or "").encode("utf-8")
+
+
+"""
+    Loads a compression dictionary from the store (cached in memory, dictionaries never change).
+
+    Raises:
+        KeyError: If there is no blob with this hash.
+"""
+def load_dictionary(db: Session, sha256: str) -> zstd.ZstdCompressionDict:
+    """Loads a compression dictionary from the store."""
+    dictionary = _dictionaries.get(sha256)
+    if dictionary is None:
+        dictionary = zstd.ZstdCompressionDict(get(db, sha256))
+        _dictionaries.set(sha256, dictionary)
+    return dictionary
+
+
+"""
+    Compresses a content for storage.
+
+    Args:
+        data (bytes): The content.
+        dictionary_sha (str): Hash of a dictionary already loaded with load_dictionary, or None.
+
+    Returns:
+        tuple: (payload, codec), the content itself with codec "raw" when compression does not make it smaller.
+"""
+def compress(data: bytes, dictionary_sha: Optional[str] = None):
+    """Compresses a content for storage."""
+    if len(data) < BLOB_MIN_COMPRESS_SIZE:
+        return data, "raw"
+    if dictionary_sha:
+        compressor = zstd.ZstdCompressor(level=BLOB_COMPRESSION_LEVEL, dict_data=_dictionaries.get(dictionary_sha))
+        codec = DICTIONARY_CODEC_PREFIX + dictionary_sha
+    else:
+        compressor = zstd.ZstdCompressor(level=BLOB_COMPRESSION_LEVEL)
+        codec = "zstd"
+    payload = compressor.compress(data)
+    if len(payload) >= len(data):
+        return data, "raw"
+    return payload, codec
+
+
+def _decompress(db: Session, blob: Blob) -> bytes:
+    if blob.codec == "raw":
+        return blob.data
+    if blob.codec.startswith(DICTIONARY_CODEC_PREFIX):
+        dictionary = load_dictionary(db, blob.codec[len(DICTIONARY_CODEC_PREFIX):])
+        decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+    else:
+        decompressor = zstd.ZstdDecompressor()
+    return decompressor.decompress(blob.data, max_output_size=blob.size)
+
+
+def _insert_ignoring_duplicates(db: Session, rows: List[Dict]):
+    # Another request may store the same content at the same time; its row is identical, keep it.
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        db.execute(insert(Blob), rows)
+        return
+    db.execute(dialect_insert(Blob).on_conflict_do_nothing(index_elements=["sha256"]), rows)
+
+
+def _put_many(db: Session, contents: Iterable, dictionary_sha: Optional[str]) -> List[str]:
+    encoded = [_to_bytes(content) for content in contents]
+    hashes = [content_hash(data) for data in encoded]
+    unique = dict(zip(hashes, encoded))
+    if not unique:
+        return hashes
+
+    existing = {sha for (sha,) in db.query(Blob.sha256).filter(Blob.sha256.in_(list(unique)))}
+    missing = [(sha, data) for sha, data in unique.items() if sha not in existing]
+    if missing:
+        if dictionary_sha:
+            load_dictionary(db, dictionary_sha)
+        # zstd releases the GIL, large batches compress on several cores.
+        compressed = run_concurrently(lambda item: compress(item[1], dictionary_sha), missing, BLOB_COMPRESS_WORKERS)
+        _insert_ignoring_duplicates(db, [
+            {"sha256": sha, "data": payload, "codec": codec, "size": len(data), "compressed_size": len(payload)}
+            for (sha, data), (payload, codec) in zip(missing, compressed)
+        ])
+    logging.info(f"Blob store: {len(missing)} new blobs, {len(unique) - len(missing)} already stored.")
+    return hashes
+
+
+"""
+    Stores contents in the blob store, skipping the ones already stored.
+
+    Args:
+        db (Session): The database session (not committed).
+        contents (Iterable): str (stored as UTF-8) or bytes contents.
+
+    Returns:
+        List[str]: The SHA-256 of every content, in order.
+"""
+def put_many(db: Session, contents: Iterable) -> List[str]:
+    """Stores contents in the blob store, skipping the ones already stored."""
+    return _put_many(db, contents, BLOB_DICTIONARY_SHA)
+
+
+"""
+    Stores one content in the blob store and returns its SHA-256.
+"""
+def put(db: Session, content) -> str:
+    """Stores one content in the blob store and returns its SHA-256."""
+    return put_many(db, [content])[0]
+
+
+"""
+    Reads contents from the blob store.
+
+    Returns:
+        Dict[str, bytes]: SHA-256 -> content, for the hashes that are stored.
+"""
+def get_many(db: Session, hashes: Iterable[str]) -> Dict[str, bytes]:
+    """Reads contents from the blob store."""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    return {blob.sha256: _decompress(db, blob) for blob in db.query(Blob).filter(Blob.sha256.in_(hashes))}
+
+
+"""
+    Reads one content from the blob store.
+
+    Raises:
+        KeyError: If there is no blob with this hash.
+"""
+def get(db: Session, sha256: str) -> bytes:
+    """Reads one content from the blob store."""
+    blob = db.get(Blob, sha256)
+    if blob is None:
+        raise KeyError(f"Blob not found: {sha256}")
+    return _decompress(db, blob)
+
+
+def get_text(db: Session, sha256: str) -> str:
+    return get(db, sha256).decode("utf-8")
+
+
+"""
+    Replaces the stored generated files of a project.
+
+    Args:
+        db (Session): The database session (not committed).
+        project_id (int): The project.
+        files (Dict[str, str]): Path relative to the project workspace -> file content.
+"""
+def save_project_artifacts(db: Session, project_id: int, files: Dict[str, str]):
+    """Replaces the stored generated files of a project."""
+    hashes = put_many(db, files.values())
+    db.query(ProjectArtifact).filter(ProjectArtifact.project_id == project_id).delete()
+    db.add_all([
+        ProjectArtifact(project_id=project_id, path=path, blob_sha256=sha)
+        for path, sha in zip(files, hashes)
+    ])
+
+
+"""
+    Reads the stored generated files of a project.
+
+    Returns:
+        Dict[str, str]: Path relative to the project workspace -> file content.
+"""
+def load_project_artifacts(db: Session, project_id: int) -> Dict[str, str]:
+    """Reads the stored generated files of a project."""
+    artifacts = db.query(ProjectArtifact).filter(ProjectArtifact.project_id == project_id).order_by(ProjectArtifact.path).all()
+    contents = get_many(db, [artifact.blob_sha256 for artifact in artifacts])
+    return {artifact.path: contents[artifact.blob_sha256].decode("utf-8") for artifact in artifacts}
+
+
+"""
+    Trains a zstd dictionary on stored SRS documents and stores it as a blob.
+    Set BLOB_DICTIONARY_SHA to the returned hash to compress new blobs with it.
+
+    Args:
+        db (Session): The database session (committed).
+        samples (List[bytes]): Training samples. Defaults to the SRS documents of the latest sample_limit projects.
+        sample_limit (int): Number of projects sampled when no samples are given.
+
+    Returns:
+        str: The SHA-256 of the dictionary blob.
+"""
+def train_dictionary(db: Session, samples: Optional[List[bytes]] = None, sample_limit: int = 1000) -> str:
+    """Trains a zstd dictionary on stored SRS documents and stores it as a blob."""
+    if samples is None:
+        hashes = [sha for (sha,) in db.query(Project.srs_blob_sha).filter(Project.srs_blob_sha.isnot(None))
+                  .order_by(Project.id.desc()).limit(sample_limit)]
+        samples = list(get_many(db, hashes).values())
+    dictionary = zstd.train_dictionary(BLOB_DICTIONARY_SIZE, samples, level=BLOB_COMPRESSION_LEVEL)
+    # Dictionaries are stored without a dictionary, so loading one never depends on another.
+    sha = _put_many(db, [dictionary.as_bytes()], None)[0]
+    db.commit()
+    logging.info(f"Trained a {len(dictionary.as_bytes())} byte dictionary on {len(samples)} samples: BLOB_DICTIONARY_SHA={sha}")
+    return sha
@@ -0,0 +1,239 @@
+## Local cache building blocks: a thread-safe in-memory LRU tier and a persistent SQLite tier with size-based eviction.
+## Used to memoize expensive results (LLM responses, screenshot analyses) across requests and process restarts.
+## Coroutines use the aget / aset methods, which run the SQLite I/O in a worker thread instead of the event loop.
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+logging.basicConfig(level=logging.INFO)
+
+
+class LRUCache:
+    """Thread-safe in-memory least-recently-used cache."""
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key: str, value: Any):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a SQLite file.
+
+    Entries are evicted least-recently-used first once the total stored size exceeds max_bytes. The total is kept
+    up to date in memory, so an insert does not sum the table. Access times of hits are written in batches
+    (every access_batch hits, and before an eviction), so a hit does not commit a write.
+    """
+
+    # Rows deleted per eviction query.
+    EVICTION_BATCH = 256
+
+    def __init__(self, path: str, table: str = "cache", max_bytes: int = 256 * 1024 * 1024, access_batch: int = 64):
+        self.path = os.path.abspath(path)
+        self.table = table
+        self.max_bytes = max_bytes
+        self.access_batch = access_batch
+        self._lock = threading.Lock()
+        self._accessed = {}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_accessed_at ON {table} (accessed_at)")
+        self._conn.commit()
+        self._total = self._sum_sizes()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.access_batch:
+                self._flush_accessed()
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logging.warning(f"Cache entry of {size} bytes exceeds the {self.table} cache size, not stored.")
+            return
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._accessed.pop(key, None)
+            self._total += size - (row[0] if row else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        await asyncio.to_thread(self.set, key, value)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._accessed.clear()
+            self._total = 0
+
+    def _sum_sizes(self) -> int:
+        return self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._conn.executemany(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict(self):
+        # Other processes may share the file: the total is re-read before evicting.
+        self._total = self._sum_sizes()
+        if self._total <= self.max_bytes:
+            return
+        self._flush_accessed()
+        # Free down to 90% of the limit so a full cache does not evict on every insert.
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._total > target:
+            rows = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC LIMIT ?", (self.EVICTION_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            batch = []
+            for key, size in rows:
+                if self._total <= target:
+                    break
+                batch.append((key,))
+                self._total -= size
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", batch)
+            evicted += len(batch)
+        logging.info(f"Evicted {evicted} entries from the {self.table} cache.")
+
+
+class TieredCache:
+    """In-memory LRU tier in front of a persistent SQLite tier."""
+
+    def __init__(self, path: str, table: str = "cache", max_items: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        self.memory = LRUCache(max_items)
+        self.disk = SQLiteCache(path, table, max_bytes)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        # Memory hits are answered on the event loop, only the disk tier goes to a worker thread.
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = await self.disk.aget(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    async def aset(self, key: str, value: str):
+        self.memory.set(key, value)
+        await self.disk.aset(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+
+class ImageCache(SQLiteCache):
+    """
+    SQLiteCache for image derived results with an optional perceptual-hash index,
+    so visually identical images (re-exported, re-compressed) can share an entry.
+    """
+
+    def __init__(self, path: str, table: str = "images", max_bytes: int = 64 * 1024 * 1024):
+        super().__init__(path, table, max_bytes)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_phash (key TEXT PRIMARY KEY, phash TEXT NOT NULL)")
+        self._conn.commit()
+
+    def set(self, key: str, value: str, phash: Optional[int] = None):
+        super().set(key, value)
+        if phash is not None:
+            with self._lock:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table}_phash (key, phash) VALUES (?, ?)", (key, format(phash, "016x"))
+                )
+                self._conn.commit()
+
+    def find_similar(self, phash: int, max_distance: int = 4) -> Optional[str]:
+        """Returns the key of the closest stored image within max_distance bits of phash."""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT key, phash FROM {self.table}_phash").fetchall()
+        best_key, best_distance = None, max_distance + 1
+        for key, stored in rows:
+            distance = bin(int(stored, 16) ^ phash).count("1")
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def _evict(self):
+        super()._evict()
+        self._conn.execute(f"DELETE FROM {self.table}_phash WHERE key NOT IN (SELECT key FROM {self.table})")
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}_phash")
+            self._conn.commit()
@@ -0,0 +1,275 @@
+## Durable LangGraph checkpointer backed by the application's SQLAlchemy database.
+## The compiled workflow saves GraphState after every step, so a failed or interrupted project
+## can be resumed from its last completed stage instead of starting over from analyze_screenshot.
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import ERROR, TASKS
+from app.database import SessionLocal
+from app.models.checkpoint import GraphCheckpoint, GraphCheckpointWrite
+
+logging.basicConfig(level=logging.INFO)
+
+
+"""
+    Returns the LangGraph thread id used for a project's workflow.
+"""
+def project_thread_id(project_id: int) -> str:
+    return f"project-{project_id}"
+
+
+class SQLAlchemyCheckpointSaver(BaseCheckpointSaver):
+    """LangGraph checkpoint saver storing checkpoints and pending writes in SQLAlchemy tables."""
+
+    def __init__(self, session_factory=SessionLocal, *, serde=None):
+        super().__init__(serde=serde)
+        self.session_factory = session_factory
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Returns the checkpoint of config["configurable"]["checkpoint_id"], or the latest one of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self.session_factory() as db:
+            query = db.query(GraphCheckpoint).filter(
+                GraphCheckpoint.thread_id == thread_id, GraphCheckpoint.checkpoint_ns == checkpoint_ns
+            )
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.filter(GraphCheckpoint.checkpoint_id == checkpoint_id)
+            row = query.order_by(GraphCheckpoint.checkpoint_id.desc()).first()
+            if row is None:
+                return None
+            return self._load_tuple(db, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Lists checkpoints, newest first."""
+        with self.session_factory() as db:
+            query = db.query(GraphCheckpoint)
+            if config:
+                query = query.filter(GraphCheckpoint.thread_id == config["configurable"]["thread_id"])
+                if config["configurable"].get("checkpoint_ns") is not None:
+                    query = query.filter(GraphCheckpoint.checkpoint_ns == config["configurable"]["checkpoint_ns"])
+                if checkpoint_id := get_checkpoint_id(config):
+                    query = query.filter(GraphCheckpoint.checkpoint_id == checkpoint_id)
+            if before and (before_checkpoint_id := get_checkpoint_id(before)):
+                query = query.filter(GraphCheckpoint.checkpoint_id < before_checkpoint_id)
+
+            tuples = []
+            for row in query.order_by(GraphCheckpoint.checkpoint_id.desc()):
+                if limit is not None and len(tuples) >= limit:
+                    break
+                checkpoint_tuple = self._load_tuple(db, row)
+                # Metadata is serialized, so the filter is applied after loading.
+                if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Saves a checkpoint and returns the config pointing at it."""
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(c)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self.session_factory() as db:
+            db.merge(GraphCheckpoint(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                checkpoint_type=checkpoint_type,
+                checkpoint=checkpoint_bytes,
+                metadata_type=metadata_type,
+                checkpoint_metadata=metadata_bytes,
+            ))
+            db.commit()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Saves the writes of a finished task linked to the checkpoint it ran from."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self.session_factory() as db:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                key = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx)
+                # Regular writes are immutable once stored, special writes (errors, interrupts) are replaced.
+                if write_idx >= 0 and db.get(GraphCheckpointWrite, key) is not None:
+                    continue
+                value_type, value_bytes = self.serde.dumps_typed(value)
+                db.merge(GraphCheckpointWrite(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint_id,
+                    task_id=task_id,
+                    idx=write_idx,
+                    channel=channel,
+                    value_type=value_type,
+                    value=value_bytes,
+                    task_path=task_path,
+                ))
+            db.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Deletes every checkpoint and write of a thread."""
+        with self.session_factory() as db:
+            db.query(GraphCheckpointWrite).filter(GraphCheckpointWrite.thread_id == thread_id).delete()
+            db.query(GraphCheckpoint).filter(GraphCheckpoint.thread_id == thread_id).delete()
+            db.commit()
+
+    # The async API runs the blocking database calls in a worker thread.
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def _load_tuple(self, db, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = (
+            db.query(GraphCheckpointWrite)
+            .filter(
+                GraphCheckpointWrite.thread_id == row.thread_id,
+                GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                GraphCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            )
+            .order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+            .all()
+        )
+        sends = []
+        if row.parent_checkpoint_id:
+            sends = (
+                db.query(GraphCheckpointWrite)
+                .filter(
+                    GraphCheckpointWrite.thread_id == row.thread_id,
+                    GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                    GraphCheckpointWrite.checkpoint_id == row.parent_checkpoint_id,
+                    GraphCheckpointWrite.channel == TASKS,
+                )
+                .order_by(GraphCheckpointWrite.task_path, GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+                .all()
+            )
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            checkpoint={
+                **self.serde.loads_typed((row.checkpoint_type, row.checkpoint)),
+                "pending_sends": [self.serde.loads_typed((send.value_type, send.value)) for send in sends],
+            },
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (write.task_id, write.channel, self.serde.loads_typed((write.value_type, write.value)))
+                for write in complete_task_writes(writes)
+            ],
+        )
+
+
+"""
+    Drops the regular writes of the tasks that also recorded an error.
+    When a parallel branch fails, LangGraph cancels its siblings and stores what they had written so far next to
+    their CancelledError: their state updates without the write to the fan-in (join) channel. Restored as is, those
+    tasks count as done on resume and the join never fires, so the workflow stops before save_generated_files.
+    Without their writes they run again.
+"""
+def complete_task_writes(writes: Sequence[GraphCheckpointWrite]) -> list:
+    """Drops the regular writes of the tasks that also recorded an error."""
+    failed_tasks = {write.task_id for write in writes if write.channel == ERROR}
+    return [write for write in writes if write.task_id not in failed_tasks or write.idx < 0]
+
+
+_checkpointer: Optional[SQLAlchemyCheckpointSaver] = None
+
+"""
+    Returns the process-wide workflow checkpointer.
+"""
+def get_checkpointer() -> SQLAlchemyCheckpointSaver:
+    """Returns the process-wide workflow checkpointer."""
+    global _checkpointer
+    if _checkpointer is None:
+        _checkpointer = SQLAlchemyCheckpointSaver()
+    return _checkpointer
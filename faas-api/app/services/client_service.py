@@ -0,0 +1,65 @@
+## Registry of the clients of external services (LLM provider, LangSmith).
+## Every client is built once, on first use, from the shared settings: importing the app neither imports the
+## provider SDKs nor opens connections, and all the services share one client (and its connection pool).
+
+import logging
+import threading
+from typing import Dict, Optional
+from app.settings import get_settings
+from app.services.llm_service import CachedChatModel
+
+logging.basicConfig(level=logging.INFO)
+
+_chat_models: Dict[str, CachedChatModel] = {}
+_langsmith_client = None
+_clients_lock = threading.Lock()
+
+
+"""
+    Returns the shared chat model of the pipeline, wrapped in the LLM cache / rate limit layer (llm_service).
+
+    Args:
+        model (str): The model name. Defaults to the LLM_MODEL setting.
+
+    Returns:
+        CachedChatModel: The same instance for every caller asking for this model.
+"""
+def get_chat_model(model: Optional[str] = None) -> CachedChatModel:
+    """Returns the shared chat model of the pipeline."""
+    settings = get_settings()
+    model = model or settings.llm_model
+    chat_model = _chat_models.get(model)
+    if chat_model is not None:
+        return chat_model
+    with _clients_lock:
+        if model not in _chat_models:
+            from langchain_groq import ChatGroq
+            _chat_models[model] = CachedChatModel(ChatGroq(
+                groq_api_key=settings.groq_api_key,
+                model=model,
+                temperature=0,
+                max_retries=0,  # retries are done by rate_limit_service
+            ))
+            logging.info(f"LLM client created for {model}.")
+        return _chat_models[model]
+
+
+"""
+    Returns the shared LangSmith client.
+
+    Raises:
+        ValueError: If LANGCHAIN_API_KEY is not set.
+"""
+def get_langsmith_client():
+    """Returns the shared LangSmith client."""
+    global _langsmith_client
+    if _langsmith_client is not None:
+        return _langsmith_client
+    settings = get_settings()
+    if not settings.langchain_api_key:
+        raise ValueError("LANGCHAIN_API_KEY environment variable not set.")
+    with _clients_lock:
+        if _langsmith_client is None:
+            from langsmith import Client
+            _langsmith_client = Client(api_key=settings.langchain_api_key)
+        return _langsmith_client
@@ -0,0 +1,322 @@
+## Angular setup command plans.
+## The setup text produced by generate_angular_setup is compiled into a validated, de-duplicated plan
+## (allowlisted commands only, no shell) and executed in phases: workspace creation, serial CLI steps,
+## one batch of file operations and the independent `ng generate` steps in parallel (only schematics known to write
+## nothing but their own files; in an NgModule project, components, directives and pipes run one at a time).
+## Every process runs in its own process group with a timeout and streamed output.
+
+import logging
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from app.settings import load_environment
+from app.services import metrics_service
+from app.services.workspace_service import ANGULAR_PROJECT_NAME
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+# Maximum run time of a single command, and maximum time without any output before it is considered hung.
+COMMAND_TIMEOUT = int(os.getenv("COMMAND_TIMEOUT", "900"))
+COMMAND_IDLE_TIMEOUT = int(os.getenv("COMMAND_IDLE_TIMEOUT", "120"))
+# Idle timeout of `ng add` / `npm install`. With CI=true and a piped stdout they print no progress bar, so a healthy
+# install on a cold npm cache can stay silent for minutes; only a much longer silence means it is hung.
+COMMAND_INSTALL_IDLE_TIMEOUT = int(os.getenv("COMMAND_INSTALL_IDLE_TIMEOUT", "600"))
+# Log the commands instead of running them (benchmarks, debugging the setup plan).
+COMMAND_DRY_RUN = os.getenv("COMMAND_DRY_RUN", "false").lower() == "true"
+# Number of independent `ng generate` commands run side by side.
+COMMAND_MAX_CONCURRENCY = int(os.getenv("COMMAND_MAX_CONCURRENCY", "4"))
+
+# ng sub-commands a plan may contain; anything else is rejected.
+NG_COMMANDS = {"new", "add", "generate", "g", "config"}
+NPM_COMMANDS = {"install", "i"}
+# Built-in schematics that only write their own new files in a standalone project, so they can run concurrently.
+# Any other schematic (module, application, third-party collections like @ngrx/schematics:store) may edit shared
+# files (app.module.ts, angular.json, package.json) and runs serially.
+PARALLEL_SCHEMATICS = {
+    "component", "c", "directive", "d", "pipe", "p", "service", "s", "class", "cl", "interface", "i",
+    "enum", "e", "guard", "interceptor", "resolver",
+}
+# Declared in the closest NgModule (app.module.ts) unless the project is standalone.
+MODULE_SCHEMATICS = {"component", "c", "directive", "d", "pipe", "p"}
+SHELL_METACHARACTERS = (";", "&", "|", "`", "$(", "<", ">")
+# Non-interactive defaults, the CLI must never wait for an answer.
+COMMAND_ENV = {"NG_CLI_ANALYTICS": "false", "CI": "true"}
+
+
+class CommandError(Exception):
+    """Raised when a command exits with a non-zero return code or times out."""
+
+    def __init__(self, args: List[str], message: str, output: str = ""):
+        super().__init__(f"{shlex.join(args)}: {message}")
+        self.output = output
+
+
+@dataclass
+class Command:
+    args: List[str]
+    # True when the command runs inside the Angular project (after `cd project_root`), else in the workspace.
+    in_project: bool = True
+
+    @property
+    def line(self) -> str:
+        return shlex.join(self.args)
+
+
+@dataclass
+class CommandPlan:
+    new_workspace: Optional[Command] = None
+    serial: List[Command] = field(default_factory=list)
+    # File operations, keyed by (relative path, in_project) and applied in one batch.
+    directories: List[Tuple[str, bool]] = field(default_factory=list)
+    files: Dict[Tuple[str, bool], str] = field(default_factory=dict)
+    generate: List[Command] = field(default_factory=list)
+    rejected: List[str] = field(default_factory=list)
+
+
+def _is_serial_generate(args: List[str]) -> bool:
+    schematic = args[2] if len(args) > 2 else ""
+    if schematic not in PARALLEL_SCHEMATICS:
+        return True
+    if any(arg in ("--module", "-m") or arg.startswith("--module=") for arg in args):
+        return True
+    return schematic in MODULE_SCHEMATICS and _declares_in_module(args)
+
+
+def _declares_in_module(args: List[str]) -> bool:
+    return any(arg in ("--standalone=false", "--no-standalone") for arg in args) or (
+        "--standalone" in args and args[args.index("--standalone") + 1:][:1] == ["false"]
+    )
+
+
+"""
+    Checks whether an Angular project is standalone, i.e. has no root NgModule the `ng generate` schematics
+    would declare their components, directives and pipes in.
+"""
+def is_standalone_project(project_root: str) -> bool:
+    """Checks whether an Angular project is standalone."""
+    return not os.path.exists(os.path.join(project_root, "src", "app", "app.module.ts"))
+
+
+"""
+    Splits the `ng generate` commands of a plan into the ones that can run concurrently and the ones that must run
+    one after the other: in an NgModule project, components, directives and pipes all edit app.module.ts.
+
+    Returns:
+        Tuple[List[Command], List[Command]]: (parallel, serial) commands, in plan order.
+"""
+def split_generate(commands: List[Command], standalone: bool) -> Tuple[List[Command], List[Command]]:
+    """Splits the `ng generate` commands into concurrent and serial ones."""
+    if standalone:
+        return list(commands), []
+    parallel = [command for command in commands if command.args[2] not in MODULE_SCHEMATICS]
+    serial = [command for command in commands if command.args[2] in MODULE_SCHEMATICS]
+    return parallel, serial
+
+
+def _is_install(args: List[str]) -> bool:
+    return args[:2] == ["ng", "add"] or (args[:1] == ["npm"] and len(args) > 1 and args[1] in NPM_COMMANDS)
+
+
+"""
+    Compiles the markdown / shell text of generate_angular_setup into a command plan.
+
+    Lines that are not commands (prose, code fences, JSON) are ignored. Commands outside the allowlist
+    or using shell features (pipes, chaining, substitution) are rejected. Duplicates are dropped.
+
+    Args:
+        text (str): The generated setup text.
+
+    Returns:
+        CommandPlan: The phased plan.
+"""
+def compile_command_plan(text: str) -> CommandPlan:
+    """Compiles generated setup text into a validated, de-duplicated command plan."""
+    plan = CommandPlan()
+    seen = set()
+    in_project = False
+
+    for raw_line in (text or "").splitlines():
+        line = raw_line.strip().lstrip("$ ").strip()
+        if not line or line.startswith("#"):
+            continue
+        program = line.split(maxsplit=1)[0]
+        if program not in ("ng", "npm", "cd", "mkdir", "touch", "echo"):
+            continue
+
+        if program == "echo":
+            content, separator, target = line[5:].rpartition(" > ")
+            if not separator or any(char in target for char in SHELL_METACHARACTERS):
+                plan.rejected.append(line)
+                continue
+            try:
+                content = " ".join(shlex.split(content))
+                target = shlex.split(target)[0]
+            except (ValueError, IndexError):
+                plan.rejected.append(line)
+                continue
+            plan.files[(target, in_project)] = content
+            continue
+
+        if any(char in line for char in SHELL_METACHARACTERS):
+            plan.rejected.append(line)
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError:
+            plan.rejected.append(line)
+            continue
+
+        if program == "cd":
+            if args[1:] == [ANGULAR_PROJECT_NAME]:
+                in_project = True
+            else:
+                plan.rejected.append(line)
+            continue
+        if program == "mkdir":
+            for directory in [arg for arg in args[1:] if not arg.startswith("-")]:
+                if (directory, in_project) not in plan.directories:
+                    plan.directories.append((directory, in_project))
+            continue
+        if program == "touch":
+            for path in args[1:]:
+                plan.files.setdefault((path, in_project), "")
+            continue
+
+        subcommand = args[1] if len(args) > 1 else ""
+        if (program == "ng" and subcommand not in NG_COMMANDS) or (program == "npm" and subcommand not in NPM_COMMANDS):
+            plan.rejected.append(line)
+            continue
+        if program == "ng" and subcommand == "add" and "--skip-confirmation" not in args:
+            args.append("--skip-confirmation")
+
+        # The same command in the workspace and in the project are two different steps.
+        key = (tuple(args), in_project)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        command = Command(args, in_project)
+        if subcommand == "new":
+            if plan.new_workspace is None and args[2:3] == [ANGULAR_PROJECT_NAME]:
+                command.in_project = False
+                plan.new_workspace = command
+            else:
+                plan.rejected.append(line)
+        elif subcommand in ("generate", "g") and not _is_serial_generate(args):
+            plan.generate.append(command)
+        else:
+            plan.serial.append(command)
+
+    for line in plan.rejected:
+        logging.warning(f"Rejected setup command: {line}")
+    return plan
+
+
+"""
+    Runs a command without a shell, streaming its output to the log.
+
+    The process gets its own process group, so on timeout the whole tree (ng -> node -> npm ...) is killed.
+
+    Args:
+        args (List[str]): The command and its arguments.
+        cwd (str): The working directory.
+        timeout (int): Maximum run time in seconds. Defaults to COMMAND_TIMEOUT.
+        idle_timeout (int): Maximum time in seconds without output. Defaults to COMMAND_INSTALL_IDLE_TIMEOUT
+                            for `ng add` / `npm install`, COMMAND_IDLE_TIMEOUT otherwise.
+
+    Returns:
+        str: The last lines of the combined stdout/stderr.
+
+    Raises:
+        CommandError: If the command fails, cannot be started or times out.
+"""
+def run_command(args: List[str], cwd: str, timeout: Optional[int] = None, idle_timeout: Optional[int] = None) -> str:
+    """Runs a command without a shell, streaming its output to the log."""
+    if COMMAND_DRY_RUN:
+        logging.info(f"Dry run, not executing: {shlex.join(args)} (in {cwd})")
+        return ""
+    started = time.monotonic()
+    status = "error"
+    try:
+        if not idle_timeout:
+            idle_timeout = COMMAND_INSTALL_IDLE_TIMEOUT if _is_install(args) else COMMAND_IDLE_TIMEOUT
+        output = _run_command(args, cwd, timeout or COMMAND_TIMEOUT, idle_timeout)
+        status = "success"
+        return output
+    finally:
+        metrics_service.observe_command(args, status, time.monotonic() - started)
+
+
+def _run_command(args: List[str], cwd: str, timeout: int, idle_timeout: int) -> str:
+    executable = shutil.which(args[0]) or args[0]
+    logging.info(f"Executing command: {shlex.join(args)} (in {cwd})")
+
+    try:
+        process = subprocess.Popen(
+            [executable, *args[1:]],
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            env={**os.environ, **COMMAND_ENV},
+            start_new_session=True,
+        )
+    except OSError as e:
+        raise CommandError(args, f"could not be started: {e}")
+
+    output = deque(maxlen=50)
+    last_output = [time.monotonic()]
+
+    def read_output():
+        for output_line in process.stdout:
+            last_output[0] = time.monotonic()
+            output.append(output_line.rstrip())
+            logging.info(f"[{args[0]} {args[1] if len(args) > 1 else ''}] {output_line.rstrip()}")
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+
+    started = time.monotonic()
+    while True:
+        try:
+            process.wait(timeout=1)
+            break
+        except subprocess.TimeoutExpired:
+            now = time.monotonic()
+            if now - started > timeout:
+                _kill(process)
+                raise CommandError(args, f"timed out after {timeout}s", "\n".join(output))
+            if now - last_output[0] > idle_timeout:
+                _kill(process)
+                raise CommandError(args, f"no output for {idle_timeout}s, killed", "\n".join(output))
+
+    reader.join(timeout=5)
+    if process.returncode != 0:
+        raise CommandError(args, f"exited with return code {process.returncode}", "\n".join(output))
+    return "\n".join(output)
+
+
+def _kill(process: subprocess.Popen):
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=5)
+                return
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+    process.wait()
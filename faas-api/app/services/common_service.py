@@ -1,37 +1,242 @@
+import asyncio
+import contextvars
+import functools
 import logging
 import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from subprocess import run
-from typing import Any, Dict, List, Optional
+from typing import Annotated, Any, Callable, Dict, Iterable, List, Optional
 import uuid
 
+_stage_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+_stage_listeners_lock = threading.Lock()
+# CPU seconds spent by run_concurrently workers for the stage running in this context.
+_stage_cpu: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("stage_cpu", default=None)
 
+
+"""
+    Reducers used by the LangGraph channels of GraphState, so parallel branches can write
+    to the same key and have their outputs merged instead of raising a conflicting update.
+"""
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Optional[Dict]:
+    """Merges two dict channel values, the right side wins on duplicate keys."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return {**left, **right}
+
+def merge_lists(left: Optional[List], right: Optional[List]) -> Optional[List]:
+    """Concatenates two list channel values."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return left + right
+
+
+@dataclass
 class GraphState:
     screenshot_url: Optional[str] = None
     srs_content: Optional[str] = None
+    # srs_sections: the SRS split into sections ({title, text}), prompts retrieve the relevant ones from it.
+    srs_sections: Optional[List[Dict[str, str]]] = None
     screenshot_details: Optional[Dict[str, Any]] = None
+    # analysis_results: the structured output of analyze_srs, consumed by the setup and component stages.
+    analysis_results: Optional[Dict[str, Any]] = None
     # ui_components: Changed to Dict[str, Dict[str, str]] to store component code as a dictionary of file names and their contents.
-    ui_components: Optional[Dict[str, Dict[str, str]]] = None  # Component name: {file_name: code}
+    ui_components: Annotated[Optional[Dict[str, Dict[str, str]]], merge_dicts] = None  # Component name: {file_name: code}
     state_management: Optional[str] = None
     accessibility: Optional[str] = None
     styling: Optional[str] = None
     api_endpoints: Optional[List[Dict[str, Any]]] = None
     # ui_tests: Changed to Dict[str, str] to store test code associated with component names.
-    ui_tests: Optional[Dict[str, str]] = None # Component name: test code
-    errors: Optional[List[str]] = None
+    ui_tests: Annotated[Optional[Dict[str, str]], merge_dicts] = None # Component name: test code
+    errors: Annotated[Optional[List[str]], merge_lists] = None
     iterations: int = 0
     # ui_dependencies: Added to track UI dependencies to prevent redundant re-generation.
-    ui_dependencies: Optional[Dict[str, List[str]]] = None # Component name: [dependencies]
-    api_services: Optional[Dict[str, str]] = None 
+    ui_dependencies: Annotated[Optional[Dict[str, List[str]]], merge_dicts] = None # Component name: [dependencies]
+    api_services: Annotated[Optional[Dict[str, str]], merge_dicts] = None 
     dockerfile_content: Optional[str] = None
+    setup_commands: Optional[str] = None
+    validation_report: Optional[str] = None
+    preview_link: Optional[str] = None
+    # workspace_path: the project's own directory, every stage reads and writes below it.
+    workspace_path: Optional[str] = None
+
+"""
+    Applies a function to every item using a bounded thread pool.
+
+    Args:
+        fn (Callable): The function to apply, typically one LLM call per item.
+        items (Iterable): The items to process.
+        max_workers (int): Maximum number of calls in flight. 1 runs the items serially.
+
+    Returns:
+        list: The results in the same order as the items, independent of completion order.
+"""
+def run_concurrently(fn: Callable, items: Iterable, max_workers: int = 1) -> List[Any]:
+    """Applies a function to every item using a bounded thread pool, keeping input order."""
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    # Every call runs in a copy of the caller's context, so context variables (e.g. token usage tracking) carry over.
+    context = contextvars.copy_context()
+
+    def run_item(item):
+        started = time.thread_time()
+        try:
+            return fn(item)
+        finally:
+            # Worker CPU time is added to the stage that fanned out.
+            stage_cpu = _stage_cpu.get()
+            if stage_cpu is not None:
+                with _stage_listeners_lock:
+                    stage_cpu[0] += time.thread_time() - started
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(lambda item: context.copy().run(run_item, item), items))
+
+"""
+    Awaits a coroutine function for every item, with at most max_concurrency of them in flight.
+    The async counterpart of run_concurrently, for stages that make their LLM calls with ainvoke.
+
+    Args:
+        fn (Callable): The coroutine function to apply, typically one LLM call per item.
+        items (Iterable): The items to process.
+        max_concurrency (int): Maximum number of calls in flight. 1 runs the items serially.
+
+    Returns:
+        list: The results in the same order as the items, independent of completion order.
+"""
+async def arun_concurrently(fn: Callable, items: Iterable, max_concurrency: int = 1) -> List[Any]:
+    """Awaits a coroutine function for every item with bounded concurrency, keeping input order."""
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def run_item(item):
+        async with semaphore:
+            return await fn(item)
+
+    return await asyncio.gather(*(run_item(item) for item in items))
+
+"""
+    Stage listeners are called after every pipeline stage (graph node) with its timings:
+    listener(stage: str, timings: dict) where timings has
+        wall (s), cpu (s, including the run_concurrently workers it fanned out to),
+        peak_memory (bytes, only while tracemalloc is tracing; stages running in parallel share the peak)
+        and error (str or None; also set when the node returned errors instead of raising).
+"""
+def add_stage_listener(listener: Callable[[str, Dict[str, Any]], None]):
+    """Registers a stage listener."""
+    with _stage_listeners_lock:
+        _stage_listeners.append(listener)
+
+def remove_stage_listener(listener: Callable[[str, Dict[str, Any]], None]):
+    """Unregisters a stage listener."""
+    with _stage_listeners_lock:
+        if listener in _stage_listeners:
+            _stage_listeners.remove(listener)
+
+"""
+    Wraps a graph node (a function or a coroutine function) so its wall time, CPU time and peak memory
+    are reported to the stage listeners, and the exceptions it raises are tagged with the stage (get_failed_stage). Coroutine nodes share the event loop thread with the branches
+    running next to them, so their CPU time includes the work interleaved with them.
+"""
+def timed_stage(stage: str, fn: Callable) -> Callable:
+    """Wraps a graph node so its timings are reported to the stage listeners."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            measurement = _start_measurement()
+            result, error = None, None
+            try:
+                result = await fn(state)
+                return result
+            except Exception as e:
+                error = str(e)
+                _tag_failed_stage(e, stage)
+                raise
+            finally:
+                _finish_measurement(stage, measurement, result, error)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        measurement = _start_measurement()
+        result, error = None, None
+        try:
+            result = fn(state)
+            return result
+        except Exception as e:
+            error = str(e)
+            _tag_failed_stage(e, stage)
+            raise
+        finally:
+            _finish_measurement(stage, measurement, result, error)
+    return wrapper
+
+"""
+    Returns the stage an exception was raised in (the innermost timed stage), or None.
+"""
+def get_failed_stage(error: BaseException) -> Optional[str]:
+    """Returns the stage an exception was raised in, or None."""
+    return getattr(error, "failed_stage", None)
+
+def _tag_failed_stage(error: Exception, stage: str):
+    # Parallel branches fail the whole step, the tag tells which of them raised.
+    if get_failed_stage(error) is None:
+        try:
+            error.failed_stage = stage
+        except AttributeError:
+            pass
+
+def _start_measurement() -> Dict[str, Any]:
+    stage_cpu = [0.0]
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    return {
+        "stage_cpu": stage_cpu,
+        "token": _stage_cpu.set(stage_cpu),
+        "memory_start": tracemalloc.get_traced_memory()[0] if tracing else None,
+        "started": time.perf_counter(),
+        "cpu_started": time.thread_time(),
+    }
+
+def _finish_measurement(stage: str, measurement: Dict[str, Any], result, error: Optional[str]):
+    _stage_cpu.reset(measurement["token"])
+    # Nodes report handled failures in the errors channel instead of raising.
+    if error is None and isinstance(result, dict) and result.get("errors"):
+        error = "; ".join(str(e) for e in result["errors"])
+    memory_start = measurement["memory_start"]
+    timings = {
+        "wall": time.perf_counter() - measurement["started"],
+        "cpu": time.thread_time() - measurement["cpu_started"] + measurement["stage_cpu"][0],
+        "peak_memory": max(tracemalloc.get_traced_memory()[1] - memory_start, 0) if memory_start is not None else None,
+        "error": error,
+    }
+    with _stage_listeners_lock:
+        listeners = list(_stage_listeners)
+    for listener in listeners:
+        try:
+            listener(stage, timings)
+        except Exception as e:
+            logging.error(f"Stage listener failed for {stage}: {e}")
 
 # Conceptual function to deploy the frontend project
-def deploy_frontend(generated_code, project_name="project_root"):
+def deploy_frontend(generated_code, project_name="project_root", workspace_path=None):
     """
     Conceptual function to deploy the frontend project.
 
     Args:
         generated_code (dict): A dictionary representing the generated code files.
         project_name (str): The name of the project.
+        workspace_path (str): The project workspace, used for temporary build files.
 
     Returns:
         str: The URL of the deployed application.
@@ -44,7 +249,8 @@ def deploy_frontend(generated_code, project_name="project_root"):
         if dockerfile_content:
             image_tag = f"{project_name}:{uuid.uuid4()}"
             # Save Dockerfile to a temp location.
-            with open("temp_dockerfile", "w") as f:
+            temp_dockerfile = os.path.join(workspace_path or ".", "temp_dockerfile")
+            with open(temp_dockerfile, "w") as f:
                 f.write(dockerfile_content)
 
             # Build docker Image
@@ -59,7 +265,7 @@ def deploy_frontend(generated_code, project_name="project_root"):
             deployment_url = f"https://preview.example.com/{uuid.uuid4()}" # Placeholder # dummy
 
             # 4. Cleanup temporary files
-            os.remove("temp_dockerfile")
+            os.remove(temp_dockerfile)
 
         else:
             # Handle non-docker deployments.
@@ -0,0 +1,134 @@
+## Dependency graph of the UI components and the order they are generated in.
+## A component depends on the components whose element tags its template uses (detect_dependencies, kept in
+## GraphState.ui_dependencies) and on the components its analysis details mention. The graph is cut into
+## topological waves: every component of a wave only depends on components of earlier waves (or already generated
+## ones), so a wave is generated in parallel and its dependents get the finished code of their children.
+
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List
+
+logging.basicConfig(level=logging.INFO)
+
+# Keys of an analyzed component that hold its own name, not a reference to another component.
+NAME_KEYS = ("name", "component", "type")
+
+
+"""
+    Returns the kebab-case file / selector name of a component, e.g. "LoginForm" or "Login Form" -> "login-form".
+"""
+def component_slug(name) -> str:
+    """Returns the kebab-case name of a component."""
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1-\2", str(name))
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+"""
+    Returns the element selector of a component, with the Angular CLI "app-" prefix.
+"""
+def component_selector(name) -> str:
+    """Returns the element selector of a component."""
+    slug = component_slug(name)
+    return slug if slug.startswith("app-") else f"app-{slug}"
+
+
+"""
+    Maps the element tags used by a template to the components they render.
+
+    Args:
+        tags (Iterable[str]): Element tags, e.g. from detect_dependencies.
+        components (Iterable[str]): The component names of the project.
+
+    Returns:
+        List[str]: The components found, in tag order, without duplicates. Other tags (Angular Material, HTML) are ignored.
+"""
+def resolve_tags(tags: Iterable[str], components: Iterable[str]) -> List[str]:
+    """Maps the element tags used by a template to the components they render."""
+    by_tag = {}
+    for component in components:
+        by_tag.setdefault(component_slug(component), component)
+        by_tag.setdefault(component_selector(component), component)
+    found = [by_tag[tag.lower()] for tag in tags or [] if tag.lower() in by_tag]
+    return list(dict.fromkeys(found))
+
+
+"""
+    Returns the components mentioned in the analysis details of a component (e.g. "a card list of <tile-card>").
+    Only structured details are searched: a component given by its name alone mentions nothing.
+"""
+def mentioned_components(component: str, details: Any, components: Iterable[str]) -> List[str]:
+    """Returns the components mentioned in the analysis details of a component."""
+    if not isinstance(details, dict):
+        return []
+    text = json.dumps({key: value for key, value in details.items() if key not in NAME_KEYS}, default=str)
+    words = f" {component_slug(text).replace('-', ' ')} "
+    return [
+        other for other in components
+        if other != component and component_slug(other) and f" {component_slug(other).replace('-', ' ')} " in words
+    ]
+
+
+"""
+    Builds the dependency graph of the components of a project.
+
+    Args:
+        components (List[str]): The component names, generated and planned.
+        component_specs (Dict[str, Any]): Component name -> analysis details (see generation_service.get_component_specs).
+        known_dependencies (Dict[str, List[str]]): GraphState.ui_dependencies, the element tags detected in the
+                                                   components generated by earlier runs.
+
+    Returns:
+        Dict[str, List[str]]: Component name -> the components it depends on.
+"""
+def build_dependency_graph(components: List[str], component_specs: Dict[str, Any],
+                           known_dependencies: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Builds the dependency graph of the components of a project."""
+    graph = {}
+    for component in components:
+        dependencies = resolve_tags((known_dependencies or {}).get(component) or [], components)
+        dependencies += mentioned_components(component, component_specs.get(component), components)
+        graph[component] = [name for name in dict.fromkeys(dependencies) if name != component]
+    return graph
+
+
+"""
+    Splits components into topological waves (Kahn's algorithm, one wave per level).
+
+    Args:
+        components (List[str]): The components to schedule. Dependencies outside this list are treated as done.
+        graph (Dict[str, List[str]]): Component name -> the components it depends on.
+
+    Returns:
+        List[List[str]]: The waves, in generation order, each in the order of components. Components in a dependency
+                         cycle (and the ones depending on them) form the last wave.
+"""
+def build_waves(components: List[str], graph: Dict[str, List[str]]) -> List[List[str]]:
+    """Splits components into topological waves."""
+    order = {component: index for index, component in enumerate(components)}
+    indegree = {component: 0 for component in components}
+    dependents = {component: [] for component in components}
+    for component in components:
+        for dependency in set(graph.get(component) or []):
+            if dependency in order and dependency != component:
+                indegree[component] += 1
+                dependents[dependency].append(component)
+
+    waves = []
+    wave = [component for component in components if indegree[component] == 0]
+    while wave:
+        waves.append(wave)
+        ready = []
+        for component in wave:
+            for dependent in dependents[component]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+        wave = sorted(ready, key=order.get)
+
+    scheduled = {component for wave in waves for component in wave}
+    cyclic = [component for component in components if component not in scheduled]
+    if cyclic:
+        logging.warning(f"Dependency cycle between components {cyclic}, they are generated together in the last wave.")
+        waves.append(cyclic)
+    return waves
@@ -0,0 +1,150 @@
+## Incremental writer for generated project files.
+## Every workspace keeps a manifest of the content hashes it has written, so regenerating a project only
+## touches files whose content changed (no needless rebuilds from file watchers in preview containers).
+## Writes are atomic (temp file + rename) and large batches are spread over a small I/O thread pool.
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+from typing import Dict, Optional
+from app.settings import load_environment
+from app.services.common_service import run_concurrently
+from app.services.workspace_service import resolve_path
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+FILE_WRITE_WORKERS = int(os.getenv("FILE_WRITE_WORKERS", "4"))
+# Batches smaller than this are written from the calling thread.
+FILE_WRITE_PARALLEL_THRESHOLD = int(os.getenv("FILE_WRITE_PARALLEL_THRESHOLD", "32"))
+MANIFEST_FILE_NAME = ".generated_manifest.json"
+
+
+def _read_umask() -> int:
+    # os.umask can only be read by setting it; done once at import, before the writer threads start.
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Mode of new files, as open() would create them: mkstemp creates its temp files owner-only (0600).
+NEW_FILE_MODE = 0o666 & ~_read_umask()
+
+_manifest_locks: Dict[str, threading.Lock] = {}
+_manifest_locks_lock = threading.Lock()
+
+
+def _manifest_lock(workspace_path: str) -> threading.Lock:
+    with _manifest_locks_lock:
+        return _manifest_locks.setdefault(workspace_path, threading.Lock())
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+"""
+    Loads the manifest of a workspace.
+
+    Returns:
+        dict: Path relative to the workspace -> {"sha256": str, "size": int, "mtime_ns": int}.
+"""
+def load_manifest(workspace_path: str) -> Dict[str, Dict]:
+    """Loads the manifest of a workspace."""
+    try:
+        with open(os.path.join(workspace_path, MANIFEST_FILE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(workspace_path: str, manifest: Dict[str, Dict]):
+    atomic_write(os.path.join(workspace_path, MANIFEST_FILE_NAME), json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+
+
+"""
+    Writes a file atomically: the content goes to a temp file in the same directory which then replaces the target,
+    so readers (dev servers, file watchers) never see a partially written file.
+"""
+def atomic_write(path: str, data: bytes):
+    """Writes a file atomically."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # os.replace keeps the temp file's mode: give it the target's mode, or the mode of a newly created file.
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _is_unchanged(path: str, digest: str, entry: Optional[Dict]) -> bool:
+    if not entry or entry.get("sha256") != digest:
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime_ns"):
+        return True
+    # Touched since the last write, compare the content itself.
+    with open(path, "rb") as f:
+        return _content_hash(f.read()) == digest
+
+
+"""
+    Writes generated files into a workspace, skipping the ones whose content is unchanged.
+
+    Args:
+        workspace_path (str): The project workspace, the manifest is stored in it.
+        files (Dict[str, str]): Path relative to the workspace -> file content.
+
+    Returns:
+        dict: {"written": int, "unchanged": int}
+"""
+def write_files(workspace_path: Optional[str], files: Dict[str, str]) -> Dict[str, int]:
+    """Writes generated files into a workspace, skipping the ones whose content is unchanged."""
+    workspace_path = os.path.abspath(workspace_path or ".")
+    with _manifest_lock(workspace_path):
+        manifest = load_manifest(workspace_path)
+
+        pending = []
+        for relative_path, content in files.items():
+            path = resolve_path(workspace_path, relative_path)
+            key = os.path.relpath(path, workspace_path)
+            data = (content or "").encode("utf-8")
+            digest = _content_hash(data)
+            if not _is_unchanged(path, digest, manifest.get(key)):
+                pending.append((key, path, data, digest))
+
+        def write(item):
+            key, path, data, digest = item
+            atomic_write(path, data)
+            stat = os.stat(path)
+            return key, {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        workers = FILE_WRITE_WORKERS if len(pending) >= FILE_WRITE_PARALLEL_THRESHOLD else 1
+        for key, entry in run_concurrently(write, pending, max_workers=workers):
+            manifest[key] = entry
+        if pending:
+            _save_manifest(workspace_path, manifest)
+
+    stats = {"written": len(pending), "unchanged": len(files) - len(pending)}
+    logging.info(f"Wrote {stats['written']} generated files, {stats['unchanged']} unchanged.")
+    return stats
@@ -17,45 +17,44 @@
 ##  Python script that uses Groq's Llama 3 model and LangChain 
 ## to generate the necessary commands and file structures (Angular project setup)
 
-from langchain_groq import ChatGroq
-from langchain.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
+from langchain_core.prompts import ChatPromptTemplate
+from app.settings import load_environment
 import os
 import subprocess
 from typing import Dict, List, Optional, Any
 from langgraph.graph import StateGraph, START, END
 import logging
 from app.services.analysis_service import analyze_screenshot, analyze_srs
-from PIL import Image
 from io import BytesIO
-from langchain_core.tools import tool
-from langgraph.checkpoint.memory import MemorySaver
-from langchain.callbacks.tracers.langchain import LangChainTracer
+from app.services.checkpoint_service import get_checkpointer
+from app.services.workspace_service import ANGULAR_PROJECT_NAME, get_project_root, resolve_path
+from app.services import command_service, dependency_service, file_service, template_service, scaffold_service, srs_index_service, token_service
 from app.services.common_service import GraphState
-from .common_service import deploy_frontend
-
-from langchain_community.graphs.graph_document import GraphDocument
-#from langchain.graphs.graph_document import GraphDocument
-import networkx as nx
-import matplotlib.pyplot as plt
+from .common_service import arun_concurrently, deploy_frontend, run_concurrently, timed_stage
+from app.services.client_service import get_chat_model
 
+import asyncio
+import json
 import re
 
 logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
+load_environment()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY") # from the .env file
-LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
 MEDIA_PATH = os.getenv("MEDIA_PATH")
-
-# Initialize LangChainTracer -- This initializes the LangChain tracer with your LangSmith project name.
-tracer = LangChainTracer(project_name="AI-Frontend-Generation11223")
-
-# initialize 
-groq_llm = ChatGroq(groq_api_key=GROQ_API_KEY,
-    model="llama-3.2-11b-vision-preview", #"llama-3.3-70b-versatile", #"mistral-saba-24b" or "llama-3.1-8b-instant",
-    temperature=0)
+# "template" synthesizes the Angular setup plan without an LLM call when possible, "llm" always asks the model.
+ANGULAR_SETUP_MODE = os.getenv("ANGULAR_SETUP_MODE", "template")
+# "map_reduce" validates every component with its own call in parallel, "single" validates everything with one call.
+VALIDATE_UI_MODE = os.getenv("VALIDATE_UI_MODE", "map_reduce")
+# SRS tokens given to the validation of one component in map_reduce mode.
+VALIDATE_UI_SRS_TOKENS = int(os.getenv("VALIDATE_UI_SRS_TOKENS", "1500"))
+# Maximum number of LLM calls a single stage keeps in flight when it fans out per component / endpoint.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Service key of the root API path ("/"), which has no path segment to name the service after.
+ROOT_ENDPOINT_KEY = "/root"
+
+class AngularSetupError(Exception):
+    """The Angular project could not be set up (a command failed, timed out or the plan was rejected)."""
 
 """
     Parses the response content from an LLM to extract component code and filenames.
@@ -95,37 +94,50 @@ def parse_component_code(response_content):
         component_code (dict): The dict containing the component's code.
 
     Returns:
-        dict: A list of detected dependencies (imported modules/components).
+        dict: A list of detected dependencies (imported modules/components). components holds the custom element tags
+              the templates use (e.g. app-login-form, mat-card), in order of first use.
 """
 def detect_dependencies(component_code):
     # with LangChainTracer("detect_dependencies",project_name="AI-Frontend-Generation11223") as run:
     """Detects dependencies using string matching."""
 
-    typescript_code = component_code.get("component.ts", "") # or component.component.ts
-    html_code = component_code.get("component.html", "") # or component.component.html
+    # File names carry the component name (login-form.component.ts), match them by extension
+    typescript_code = "\n".join(code for name, code in component_code.items() if name.endswith(".ts"))
+    html_code = "\n".join(code for name, code in component_code.items() if name.endswith(".html"))
+    # Inline templates of standalone components
+    html_code = "\n".join([html_code] + re.findall(r"template\s*:\s*`([^`]*)`", typescript_code))
 
     module_dependencies = re.findall(r"import\s*{[^}]*}\s*from\s*['\"]@angular/[^'\"]+['\"]", typescript_code)
     component_dependencies = re.findall(r"<([\w-]+)[^>]*>", html_code)
 
-    # remove html tags.
-    component_dependencies = list(set(component_dependencies))
+    # remove html tags: custom elements always contain a hyphen.
+    component_dependencies = list(dict.fromkeys(tag.lower() for tag in component_dependencies if "-" in tag))
 
     return {"modules": module_dependencies, "components": component_dependencies}
     
 """
-    Generates Angular project setup commands and file structure using Groq LLM.
+    Generates Angular project setup commands and file structure.
 
     Args:
         analysis_results: The analysis results to be used in the prompt.
+        mode (str): "template" builds the plan from the fixed scaffold and the analyzed state management / styling,
+                    falling back to the LLM when those cannot be determined; "llm" always asks Groq LLM.
+                    Defaults to ANGULAR_SETUP_MODE.
 
     Returns:
         The generated Angular project setup commands and file structure.
              Returns None if an error occurs during LLM interaction.
 """    
-def generate_angular_setup(analysis_results):
-    """Generates Angular project setup commands and file structure using Groq LLM."""
+async def generate_angular_setup(analysis_results, mode: Optional[str] = None):
+    """Generates Angular project setup commands and file structure."""
     # with LangChainTracer("generate_angular_setup",project_name="AI-Frontend-Generation11223") as run:
 
+    if (mode or ANGULAR_SETUP_MODE) == "template":
+        setup_plan = scaffold_service.build_setup_plan(analysis_results)
+        if setup_plan:
+            logging.info(" generate_angular_setup: built from template, no LLM call. ")
+            return setup_plan
+
     # --skip-install 
     #     8.  **styling**
     #     * The SCSS block should include button { display: inline-block; } to prevent stacking issues.
@@ -268,7 +280,7 @@ def generate_angular_setup(analysis_results):
     """
 
     message = prompt.format_messages(analysis_results=analysis_results, folder_structure=folder_structure)
-    response = groq_llm.invoke(message)
+    response = await get_chat_model().ainvoke(message, stage="generate_angular_setup")
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     #logging.info(response)
     logging.info(" generate_angular_setup: success! ")
@@ -278,91 +290,179 @@ def generate_angular_setup(analysis_results):
 """
     Executes the generated Angular CLI commands.
 
+    The text is compiled into a command plan first (see command_service), which runs in phases:
+    `ng new` (or a clone of the golden workspace template), the serial CLI steps (`ng add`, `ng config`, ...),
+    all mkdir/touch/echo file operations in one batch, and the independent `ng generate` commands in parallel
+    (one at a time for components, directives and pipes of an NgModule project, which all edit app.module.ts).
+    Commands run without a shell, with a timeout, and stop the setup on the first failure.
+
     Args:
         commands (str): A string containing the Angular CLI commands to be executed,
                         separated by newlines.
+        workspace_path (str): The project workspace. `ng new project_root` runs inside it and
+                              commands after `cd project_root` run in the new Angular project.
+                              The process working directory is never changed.
+                              When the golden workspace template is available it is cloned instead of
+                              running `ng new`, and `ng add` commands for libraries it contains are skipped.
+        max_concurrency (int): Maximum number of `ng generate` commands run at once. Defaults to COMMAND_MAX_CONCURRENCY.
+        raise_errors (bool): Raise AngularSetupError instead of returning False when the setup fails.
     Returns:
-        None: This function does not return a value.
+        bool: True if every command succeeded.
 """
-def execute_angular_setup(commands):
+def execute_angular_setup(commands, workspace_path: Optional[str] = None, max_concurrency: Optional[int] = None,
+                          raise_errors: bool = False):
     """Executes the generated Angular CLI commands."""
 
     # with LangChainTracer("execute_angular_setup",project_name="AI-Frontend-Generation11223") as run:
 
-    workspace_path="project_root"
+    workspace_path = workspace_path or "."
+    project_root = get_project_root(workspace_path)
+    plan = command_service.compile_command_plan(commands)
+    template_cloned = False
+
+    def command_dir(in_project: bool) -> str:
+        return project_root if in_project else workspace_path
 
-    # original_cwd = os.getcwd()  # Store the original working directory
     try:
-        # os.mkdir(workspace_path)  # mkdir Angular workspace directory should be done by ng new
-        # os.chdir(workspace_path)  # Change to the Angular workspace directory
-
-        lines = commands.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('ng new project_root'):
-                try:
-                    print(f"Executing command: {line}")
-                    result = subprocess.run(line, shell=True, check=True, capture_output=True, text=True)
-                    print(f"Command executed, return code: {result.returncode}")
-                    if result.returncode != 0:
-                        logging.error(f"Error creating Angular workspace. Stopping execution.")
-                        return  # Stop if ng new fails.
-                    # if not os.path.exists("./angular.json"):
-                    #    logging.error(f"angular.json file not found. Stopping execution.")
-                    #    return # stop if angular.json is not found.
-                except subprocess.CalledProcessError as e:
-                    logging.error(f"Error executing command: {line} - {e}")
-                    logging.error(f"Stdout: {e.stdout}")
-                    logging.error(f"Stderr: {e.stderr}")
-                    return #stop execution.
-
-            elif line.startswith('cd project_root'):
-                try:
-                    print(f"Executing command: {line}")
-                    os.chdir("./project_root")
-                    print(f"Current working directory: {os.getcwd()}")
-                except Exception as e:
-                    logging.error(f"Error changing directory: {e}")
-                    return
-            elif line.startswith('ng '):
-                try:
-                    print(f"Executing command: {line}")
-                    result = subprocess.run(line, shell=True, check=True, capture_output=True, text=True)
-                    print(f"Command executed, return code: {result.returncode}")
-                except subprocess.CalledProcessError as e:
-                    logging.error(f"Error executing command: {line} - {e}")
-                    logging.error(f"Stdout: {e.stdout}")
-                    logging.error(f"Stderr: {e.stderr}")
-                    return # stop execution.
-            elif line.startswith('mkdir '):
-                try:
-                    os.makedirs(line[6:])
-                except FileExistsError:
-                    logging.warning(f"Directory already exists: {line[6:]}")
-                    pass
-                except Exception as e:
-                    logging.error(f"Error creating directory: {line[6:]} - {e}")
-            elif line.startswith('touch '):
-                try:
-                    with open(line[6:], 'w') as f:
-                        pass
-                except Exception as e:
-                    logging.error(f"Error creating file: {line[6:]} - {e}")
-            elif line.startswith('echo '):
-                parts = line.split(' > ')
-                if len(parts) == 2:
-                    content = parts[0][5:]
-                    try:
-                        with open(parts[1], 'w') as f:
-                            f.write(content)
-                    except Exception as e:
-                        logging.error(f"Error writing to file: {parts[1]} - {e}")
-    finally:
-        # os.chdir(original_cwd)  # Return to the original directory
-        logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
-        #logging.info(commands)
-        logging.info(" execute_angular_setup: success! ")
-        logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
+        if plan.new_workspace:
+            # Clone the prebuilt golden workspace instead of running ng new + ng add for every project.
+            if template_service.matches(plan.new_workspace.line) and template_service.clone_template(workspace_path):
+                template_cloned = True
+            else:
+                command_service.run_command(plan.new_workspace.args, workspace_path)
+
+        for command in plan.serial:
+            if template_cloned and command.args[:2] == ["ng", "add"]:
+                if template_service.provides(command.line):
+                    logging.info(f"Skipping command, provided by the workspace template: {command.line}")
+                    continue
+                template_service.detach_node_modules(project_root)
+            elif template_cloned and command.args[0] == "npm":
+                template_service.detach_node_modules(project_root)
+            command_service.run_command(command.args, command_dir(command.in_project))
+
+        for directory, in_project in plan.directories:
+            os.makedirs(resolve_path(command_dir(in_project), directory), exist_ok=True)
+        for (path, in_project), content in plan.files.items():
+            file_path = resolve_path(command_dir(in_project), path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            if content or not os.path.exists(file_path):
+                with open(file_path, 'w') as f:
+                    f.write(content + "\n" if content else "")
+
+        parallel, serial = command_service.split_generate(plan.generate, command_service.is_standalone_project(project_root))
+        run_concurrently(
+            lambda command: command_service.run_command(command.args, command_dir(command.in_project)),
+            parallel,
+            max_workers=max_concurrency or command_service.COMMAND_MAX_CONCURRENCY,
+        )
+        for command in serial:
+            command_service.run_command(command.args, command_dir(command.in_project))
+    except command_service.CommandError as e:
+        logging.error(f"Error executing command: {e}")
+        logging.error(f"Output: {e.output}")
+        if raise_errors:
+            raise AngularSetupError(f"Error executing the Angular setup commands: {e}") from e
+        return False
+    except Exception as e:
+        logging.error(f"Error executing Angular setup: {e}")
+        if raise_errors:
+            raise AngularSetupError(f"Error executing Angular setup: {e}") from e
+        return False
+
+    logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
+    logging.info(" execute_angular_setup: success! ")
+    logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
+    return True
+
+"""
+    Extracts the component names and their details from the analysis results.
+
+    Args:
+        analysis_results: Either the analysis results dict (its "ui_components" entry is used)
+                          or a plain list of components.
+
+    Returns:
+        dict: Component name -> component details, in analysis order.
+"""
+def get_component_specs(analysis_results) -> Dict[str, Any]:
+    """Extracts the component names and their details from the analysis results."""
+    components = analysis_results
+    if isinstance(analysis_results, dict):
+        components = analysis_results.get("ui_components") or []
+    if isinstance(components, str):
+        components = [name.strip() for name in components.split(",") if name.strip()]
+    if isinstance(components, dict):
+        components = [{"name": name, "details": details} for name, details in components.items()]
+
+    specs = {}
+    for component in components or []:
+        if isinstance(component, dict):
+            name = component.get("name") or component.get("component") or component.get("type") or str(component)
+        else:
+            name = str(component)
+        specs.setdefault(name, component)
+    return specs
+
+"""
+    Formats the generated code of the components a component uses for its prompt.
+    Only the TypeScript files are given: the selector, inputs and outputs are all a parent needs to use a child.
+"""
+def format_dependency_code(dependency_code: Optional[Dict[str, Dict[str, str]]]) -> str:
+    """Formats the generated code of the components a component uses for its prompt."""
+    if not dependency_code:
+        return ""
+    blocks = []
+    for name, files in dependency_code.items():
+        typescript = "\n".join(code for file_name, code in files.items() if file_name.endswith(".ts"))
+        blocks.append(f"{name} ({dependency_service.component_selector(name)}):\n```typescript\n{typescript}\n```")
+    return ("These components are already generated, use them by their selector and do not redefine them:\n"
+            + "\n".join(blocks))
+
+"""
+    Generates the code of a single Angular UI component with one LLM call.
+
+    Args:
+        component (str): The component name.
+        details (Any): The component details from the analysis results.
+        existing_components (List[str]): Names of the other components the project will contain.
+        srs_sections (List[Dict[str, str]]): The SRS sections, the ones relevant to the component are added to the prompt.
+        dependency_code (Dict[str, dict]): The generated code of the components it uses (name -> file name -> content).
+
+    Returns:
+        dict: The parsed component code (file name -> content).
+"""
+async def generate_ui_component(component: str, details: Any, existing_components: List[str], srs_sections: Optional[List[Dict[str, str]]] = None,
+                                dependency_code: Optional[Dict[str, Dict[str, str]]] = None):
+    """Generates the code of a single Angular UI component with one LLM call."""
+    prompt = ChatPromptTemplate.from_template(
+        """Generate an Angular component for: {component}. Use the selector {selector}.
+        Follow best practices: component-based architecture, accessibility, styling consistency, modular design, 
+        use existing components if needed.
+        Existing components: {existing_components}
+        {dependency_code}
+        Use TypeScript, SCSS, and Angular Material themes if applicable.
+        {component_details}
+        Relevant SRS sections:
+        {srs_context}
+        Provide the component code in a markdown format, including file content for each file.
+        """
+    )
+    component_details = f"Component Details: {details}"
+
+    message = token_service.format_messages_within_budget(
+        prompt, "generate_ui_components", ["existing_components", "srs_context", "dependency_code", "component_details"],
+        component=component,
+        selector=dependency_service.component_selector(component),
+        existing_components=existing_components,
+        dependency_code=format_dependency_code(dependency_code),
+        component_details=component_details,
+        srs_context=srs_index_service.retrieve(srs_sections, f"{component} {details}"),
+    )
+    response = await get_chat_model().ainvoke(message, stage="generate_ui_components")
+
+    #logging.info(response)
+    return parse_component_code(response.content)
 
 """
     Generates Angular UI components based on analysis results and previous components.
@@ -370,11 +470,15 @@ def execute_angular_setup(commands):
     Args:
         state (GraphState): The GraphState object containing project details and analysis results.
         analysis_results (Dict[str, Any]): The analysis results used for component generation. Defaults to an empty dictionary.
+        max_concurrency (int): Maximum number of component LLM calls in flight. Defaults to LLM_MAX_CONCURRENCY, 1 generates serially.
+
+    The components are generated in dependency order (dependency_service.build_waves): the components of a wave run
+    in parallel, and each component's prompt gets the code of the generated components it uses.
 
     Returns:
         GraphState: The updated GraphState object with generated UI components.
 """
-def generate_ui_components(state: GraphState, analysis_results: Dict[str, Any] = {}):
+async def generate_ui_components(state: GraphState, analysis_results: Dict[str, Any] = {}, max_concurrency: Optional[int] = None):
     """Generates Angular UI components based on analysis results and previous components."""
     # with LangChainTracer("generate_ui_components",project_name="AI-Frontend-Generation11223") as run:
 
@@ -390,47 +494,41 @@ def generate_ui_components(state: GraphState, analysis_results: Dict[str, Any] =
     ui_components = state.ui_components or {}
     ui_dependencies = state.ui_dependencies or {}
 
-    new_components = []
-    
     # Determine which components are new based on the analysis results
-    for component in analysis_results:
-        if component not in ui_components:
-            new_components.append(component)
-    
-    # Generate each new UI component using the LLM
-    for component in new_components:
-        prompt = ChatPromptTemplate.from_template(
-            """Generate an Angular component for: {component}.
-            Follow best practices: component-based architecture, accessibility, styling consistency, modular design, 
-            use existing components if needed.
-            Existing components: {existing_components}
-            Use TypeScript, SCSS, and Angular Material themes if applicable.
-            {component_details}
-            Provide the component code in a markdown format, including file content for each file.
-            """
-        )
-        existing_components = list(ui_components.keys())
-        component_details = f"Component Details: {component}"
-
-        message = prompt.format_messages(
-            component=component,
-            existing_components=existing_components,
-            component_details=component_details
-        )
-        response = groq_llm.invoke(message)
-
-        #logging.info(response)
-        # Parse the response and update ui_components and ui_dependencies
-        component_code = parse_component_code(response.content)
-        ui_components[component] = component_code
-        ui_dependencies[component] = detect_dependencies(component_code)["components"]
+    component_specs = get_component_specs(analysis_results)
+    new_components = [component for component in component_specs if component not in ui_components]
+
+    # Every prompt sees the same component list, so the output does not depend on the generation order.
+    planned_components = list(ui_components.keys()) + new_components
+
+    # Children are generated before the parents that use them, from the dependencies known before generating:
+    # the ones detected in earlier runs and the components the analysis details mention.
+    dependency_graph = dependency_service.build_dependency_graph(planned_components, component_specs, ui_dependencies)
+    waves = dependency_service.build_waves(new_components, dependency_graph)
+    logging.info(f"generate_ui_components: {len(new_components)} components in {len(waves)} waves: {waves}")
+
+    async def generate(component):
+        existing_components = [name for name in planned_components if name != component]
+        dependency_code = {name: ui_components[name] for name in dependency_graph[component] if name in ui_components}
+        return await generate_ui_component(component, component_specs[component], existing_components, state.srs_sections,
+                                           dependency_code)
+
+    # Generate the new UI components using the LLM, one wave at a time, at most max_concurrency calls at a time
+    for wave in waves:
+        results = await arun_concurrently(generate, wave, max_concurrency or LLM_MAX_CONCURRENCY)
+        for component, component_code in zip(wave, results):
+            ui_components[component] = component_code
+            ui_dependencies[component] = detect_dependencies(component_code)["components"]
+
+    # Keep the analysis order, whatever the generation order was
+    ui_components = {name: ui_components[name] for name in planned_components}
     
     # Update the state with the newly generated components and dependencies
     state.ui_components = ui_components
     state.ui_dependencies = ui_dependencies
 
-    # Call the save_generated_files function to persist the generated UI components to disk
-    save_generated_files(state)
+    # Call the save_generated_files function to persist the generated UI components to disk (off the event loop)
+    await asyncio.to_thread(save_generated_files, state)
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     logging.info(" generate_ui_components: success! ")
@@ -438,16 +536,119 @@ def generate_ui_components(state: GraphState, analysis_results: Dict[str, Any] =
 
     return {"ui_components": ui_components, "ui_dependencies": ui_dependencies}
 
+"""
+    Derives the service key of an API endpoint, i.e. its path (e.g. "/api/lms/leave/apply").
+
+    Args:
+        endpoint: An endpoint from the analysis results, either a dict (path/endpoint/url key) or a string like "POST /api/x".
+
+    Returns:
+        str: The endpoint path, ROOT_ENDPOINT_KEY for the root path, or the endpoint text itself if no path can be found.
+"""
+def get_endpoint_key(endpoint) -> str:
+    """Derives the service key of an API endpoint, i.e. its path."""
+    if isinstance(endpoint, dict):
+        for key in ("path", "endpoint", "url", "route"):
+            if endpoint.get(key):
+                endpoint = endpoint[key]
+                break
+        else:
+            endpoint = endpoint.get("name") or str(endpoint)
+
+    match = re.search(r"(/[\w\-./{}:]*)", str(endpoint))
+    if not match:
+        return str(endpoint).strip() or ROOT_ENDPOINT_KEY
+    return match.group(1).rstrip("/.") or ROOT_ENDPOINT_KEY
+
+"""
+    Returns the HTTP method of an API endpoint, from the method key of a dict or the prefix of a string like "GET /users".
+"""
+def get_endpoint_method(endpoint) -> Optional[str]:
+    """Returns the HTTP method of an API endpoint."""
+    if isinstance(endpoint, dict):
+        method = endpoint.get("method") or endpoint.get("http_method") or endpoint.get("verb")
+        if method:
+            return str(method).strip().lower()
+        endpoint = next((endpoint[key] for key in ("path", "endpoint", "url", "route") if endpoint.get(key)), "")
+    match = re.match(r"\s*(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS)\b", str(endpoint), re.IGNORECASE)
+    return match.group(1).lower() if match else None
+
+"""
+    Keys every API endpoint by its path, without dropping any.
+    The first endpoint of a path keeps the bare path; the next ones get their method appended ("/users/post"),
+    and a numeric suffix ("/users/post-2") when the key is still taken.
+
+    Args:
+        api_endpoints (list): The endpoints from the analysis results.
+
+    Returns:
+        Dict[str, Any]: Service key -> endpoint, in the order of api_endpoints.
+"""
+def build_endpoint_keys(api_endpoints) -> Dict[str, Any]:
+    """Keys every API endpoint by its path, without dropping any."""
+    endpoints = {}
+    for endpoint in api_endpoints:
+        key = get_endpoint_key(endpoint)
+        method = get_endpoint_method(endpoint)
+        if key in endpoints and method:
+            key = f"{key}/{method}"
+        unique_key, suffix = key, 2
+        while unique_key in endpoints:
+            unique_key, suffix = f"{key}-{suffix}", suffix + 1
+        endpoints[unique_key] = endpoint
+    return endpoints
+
+"""
+    Extracts the first TypeScript code block from an LLM markdown response.
+
+    Args:
+        response_content (str): The markdown returned by the model.
+
+    Returns:
+        str: The code of the first typescript/ts block, or the whole response if there is none.
+"""
+def extract_typescript_code(response_content: str) -> str:
+    """Extracts the first TypeScript code block from an LLM markdown response."""
+    match = re.search(r"```(?:typescript|ts)\s*([\s\S]*?)```", response_content)
+    return match.group(1).strip() if match else response_content
+
+"""
+    Generates the Angular service of a single API endpoint with one LLM call.
+
+    Args:
+        endpoint: The endpoint from the analysis results.
+
+    Returns:
+        str: The generated service code.
+"""
+async def generate_endpoint_service(endpoint):
+    """Generates the Angular service of a single API endpoint with one LLM call."""
+    prompt = ChatPromptTemplate.from_template(
+        """Generate an Angular service for API endpoint: {endpoint}.
+        Use HttpClientModule for API integration, implement error handling, and state management for responses.
+        {endpoint_details}
+
+        Provide the service code in a markdown format, including file content.
+        """
+    )
+
+    endpoint_details = f"Endpoint Details: {endpoint}" # Add any specific endpoint details here.
+
+    message = prompt.format_messages(endpoint=endpoint, endpoint_details=endpoint_details)
+    response = await get_chat_model().ainvoke(message, stage="generate_api_integration")
+    return extract_typescript_code(response.content)
+
 """
     Generates Angular API integration code and updates GraphState.
 
     Args:
         state (GraphState): The GraphState object containing project details and API specifications.
+        max_concurrency (int): Maximum number of endpoint LLM calls in flight. Defaults to LLM_MAX_CONCURRENCY.
 
     Returns:
-        GraphState: The updated GraphState object with generated API integration code.
+        GraphState: The updated GraphState object with generated API integration code, keyed by endpoint path.
 """
-def generate_api_integration(state: GraphState):
+async def generate_api_integration(state: GraphState, max_concurrency: Optional[int] = None):
     """Generates Angular API integration code and updates GraphState."""
     # with LangChainTracer("generate_api_integration",project_name="AI-Frontend-Generation11223") as run:
 
@@ -456,23 +657,13 @@ def generate_api_integration(state: GraphState):
 
     if not api_endpoints:
         return state
-    
-    generated_services = {}
-    for endpoint in api_endpoints:
-        prompt = ChatPromptTemplate.from_template(
-            """Generate an Angular service for API endpoint: {endpoint}.
-            Use HttpClientModule for API integration, implement error handling, and state management for responses.
-            {endpoint_details}
 
-            Provide the service code in a markdown format, including file content.
-            """
-        )
-
-        endpoint_details = f"Endpoint Details: {endpoint}" # Add any specific endpoint details here.
+    # Key every endpoint by its path. Endpoints sharing a path (GET/POST on the same route) get the method appended.
+    endpoints = build_endpoint_keys(api_endpoints)
 
-        message = prompt.format_messages(endpoint=endpoint, endpoint_details=endpoint_details)
-        response = groq_llm.invoke(message)
-        generated_services["endpoint"] = response.content
+    keys = list(endpoints.keys())
+    results = await arun_concurrently(lambda key: generate_endpoint_service(endpoints[key]), keys, max_concurrency or LLM_MAX_CONCURRENCY)
+    generated_services = dict(zip(keys, results))
 
     # Update GraphState with generated services
     state.api_services = generated_services # add api_services to graph state.
@@ -485,37 +676,43 @@ def generate_api_integration(state: GraphState):
     return state
 
 """
-    Generates Cypress UI tests for the generated components.
+    Generates Cypress UI tests for the generated components, one LLM call per component.
 
     Args:
         state (GraphState): The GraphState object containing generated components and project details.
+        max_concurrency (int): Maximum number of test LLM calls in flight. Defaults to LLM_MAX_CONCURRENCY.
 
     Returns:
         GraphState: The updated GraphState object with generated Cypress test files.
 """
-def generate_ui_tests(state: GraphState):
+async def generate_ui_tests(state: GraphState, max_concurrency: Optional[int] = None):
     """Generates Cypress UI tests for the generated components."""
     # with LangChainTracer("generate_ui_tests",project_name="AI-Frontend-Generation11223") as run:
     ui_components = state.ui_components or {}
     ui_tests = state.ui_tests or {}
 
-    new_tests = {}
-    for component, code in ui_components.items():
-        if component not in ui_tests:
-            prompt = ChatPromptTemplate.from_template(
-                """Generate Cypress UI tests for the following Angular component: {component}.
-                Ensure proper unit tests, integration tests, and end-to-end tests.
-                {component_code}
+    prompt = ChatPromptTemplate.from_template(
+        """Generate Cypress UI tests for the following Angular component: {component}.
+        Ensure proper unit tests, integration tests, and end-to-end tests.
+        {component_code}
+        Test the behaviour required by these SRS sections:
+        {srs_context}
 
-                Provide the test code in a markdown format, including file content.
-                """
-            )
+        Provide the test code in a markdown format, including file content.
+        """
+    )
 
-        message = prompt.format_messages(component=component, component_code=code)
-        response = groq_llm.invoke(message)
-        new_tests[component] = response.content
+    async def generate(component):
+        message = token_service.format_messages_within_budget(
+            prompt, "generate_ui_tests", ["srs_context", "component_code"], component=component,
+            component_code=ui_components[component], srs_context=srs_index_service.retrieve(state.srs_sections, component),
+        )
+        response = await get_chat_model().ainvoke(message, stage="generate_ui_tests")
+        return response.content
 
-    ui_tests.update(new_tests)
+    new_components = [component for component in ui_components if component not in ui_tests]
+    results = await arun_concurrently(generate, new_components, max_concurrency or LLM_MAX_CONCURRENCY)
+    ui_tests.update(zip(new_components, results))
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     #logging.info(ui_tests)
@@ -533,7 +730,7 @@ def generate_ui_tests(state: GraphState):
     Returns:
         GraphState: The updated GraphState object with the Dockerfile content.
 """
-def generate_frontend_dockerfile(state: GraphState): #(analysis_results, ui_components):
+async def generate_frontend_dockerfile(state: GraphState): #(analysis_results, ui_components):
     """Generates a Dockerfile for the Angular frontend project and updates GraphState."""
     # with LangChainTracer("generate_frontend_dockerfile",project_name="AI-Frontend-Generation11223") as run:
 
@@ -560,11 +757,12 @@ def generate_frontend_dockerfile(state: GraphState): #(analysis_results, ui_comp
 
     message = prompt.format_messages(project_details=project_details)
     try:
-        response = groq_llm.invoke(message)
+        response = await get_chat_model().ainvoke(message, stage="generate_frontend_dockerfile")
         state.dockerfile_content = response.content 
     except Exception as e:
+        # Raised, so the stage is recorded as failed and a resume generates the Dockerfile again.
         logging.error(f"Error generating Dockerfile: {e}")
-        state.dockerfile_content = ""
+        raise
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     #logging.info(state)
@@ -574,53 +772,60 @@ def generate_frontend_dockerfile(state: GraphState): #(analysis_results, ui_comp
     return state
 
 """
-    Save UI components, API services, and tests to appropriate project directories.
+    Collects the generated files of a GraphState: UI components, API services, tests and the Dockerfile.
 
     Args:
-        graph_state (GraphState): The GraphState object containing the generated files.
+        graph_state (GraphState): The GraphState object containing the generated code.
 
     Returns:
-        GraphState: The updated GraphState object.
+        Dict[str, str]: Path relative to the project workspace -> file content.
 """
-def save_generated_files(graph_state): 
-    """Save UI components, API services, and tests to appropriate project directories.""" 
-    # with LangChainTracer("save_generated_files",project_name="AI-Frontend-Generation11223") as run:
-
-    #base_path = "project_root/src/app"
-    base_path = "src/app"
+def collect_generated_files(graph_state) -> Dict[str, str]:
+    """Collects the generated files of a GraphState, keyed by their path in the workspace."""
+    project_root = ANGULAR_PROJECT_NAME
+    base_path = os.path.join(project_root, "src", "app")
+    files = {}
     # Save UI components
-    for component, files in (graph_state.ui_components or {}).items():
+    for component, component_files in (graph_state.ui_components or {}).items():
         component_path = os.path.join(base_path, "components", component)
-        os.makedirs(component_path, exist_ok=True)
-        for file_name, content in files.items():
-            file_path = os.path.join(component_path, file_name)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(content)
+        for file_name, content in component_files.items():
+            files[os.path.join(component_path, file_name)] = content
 
     # Save API services
     service_path = os.path.join(base_path, "services")
-    os.makedirs(service_path, exist_ok=True)
     for endpoint, service_code in (graph_state.api_services or {}).items():
-        file_name = endpoint.replace("/", "_").strip("_") + ".service.ts"
-        file_path = os.path.join(service_path, file_name)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(service_code)
+        # Distinct keys can give the same file name ("/a/b" and "/a_b"): the later ones get a numeric suffix.
+        name = re.sub(r"[^\w\-]+", "_", endpoint).strip("_") or "root"
+        file_name, suffix = f"{name}.service.ts", 2
+        while os.path.join(service_path, file_name) in files:
+            file_name, suffix = f"{name}-{suffix}.service.ts", suffix + 1
+        files[os.path.join(service_path, file_name)] = service_code
 
     # Save UI tests
-    #test_path = "project_root/tests"
-    test_path = "tests"
-    os.makedirs(test_path, exist_ok=True)
+    test_path = os.path.join(project_root, "tests")
     for component, test_code in (graph_state.ui_tests or {}).items():
-        file_name = f"{component}.spec.ts"
-        file_path = os.path.join(test_path, file_name)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(test_code)
+        files[os.path.join(test_path, f"{component}.spec.ts")] = test_code
 
     # Save Dockerfile
-    #dockerfile_path = "project_root/Dockerfile"
-    dockerfile_path = "Dockerfile"
-    with open(dockerfile_path, "w", encoding="utf-8") as f:
-        f.write(graph_state.dockerfile_content or "")
+    files[os.path.join(project_root, "Dockerfile")] = graph_state.dockerfile_content or ""
+    return files
+
+"""
+    Save UI components, API services, and tests to appropriate project directories.
+    Files are written through file_service, which skips unchanged files and writes atomically.
+
+    Args:
+        graph_state (GraphState): The GraphState object containing the generated files and the project workspace path.
+
+    Returns:
+        GraphState: The updated GraphState object.
+"""
+def save_generated_files(graph_state): 
+    """Save UI components, API services, and tests to appropriate project directories.""" 
+    # with LangChainTracer("save_generated_files",project_name="AI-Frontend-Generation11223") as run:
+
+    # Only files whose content changed since the last call are written.
+    file_service.write_files(graph_state.workspace_path, collect_generated_files(graph_state))
 
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
@@ -632,28 +837,33 @@ def save_generated_files(graph_state):
 
     Args:
         mermaid_syntax (str): The Mermaid syntax string.
+        workspace_path (str): The project workspace the diagram is written to.
 
     Returns:
         str or None: The file path to the generated PNG diagram, or None if an error occurs.
 """
 # pip install mermaid.cli
-def draw_mermaid_png_local(mermaid_syntax):
+def draw_mermaid_png_local(mermaid_syntax, workspace_path: Optional[str] = None):
     """Generates a Mermaid diagram locally using the Mermaid CLI."""
     # with LangChainTracer("draw_mermaid_png_local",project_name="AI-Frontend-Generation11223") as run:
 
+    workspace_path = workspace_path or "."
+    mermaid_file = os.path.join(workspace_path, "mermaid_diagram.mmd")
+    png_file = os.path.join(workspace_path, "mermaid_diagram.png")
     try:
         # Save the Mermaid syntax to a file
-        with open("mermaid_diagram.mmd", "w") as f:
+        with open(mermaid_file, "w") as f:
             f.write(mermaid_syntax)
 
         # Use the Mermaid CLI to generate the PNG
-        subprocess.run(["mmdc", "-i", "mermaid_diagram.mmd", "-o", "mermaid_diagram.png"], check=True)
+        subprocess.run(["mmdc", "-i", mermaid_file, "-o", png_file], check=True)
 
         # Read the PNG and return bytes
-        with open("mermaid_diagram.png", "rb") as f:
+        with open(png_file, "rb") as f:
             image_bytes = f.read()
+        from PIL import Image
         img = Image.open(BytesIO(image_bytes))
-        img.save("project_root"+ "/" + "langgraph_workflow_local.png")
+        img.save(os.path.join(get_project_root(workspace_path), "langgraph_workflow_local.png"))
 
 
         logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
@@ -670,16 +880,22 @@ def draw_mermaid_png_local(mermaid_syntax):
 
     Args:
         workflow (StateGraph): The LangGraph workflow object.
+        workspace_path (str): The project workspace the image is written to.
 
     Returns:
         None: Displays the graph visualization using matplotlib.
 """
-def generate_workflow_visualization(workflow):
+def generate_workflow_visualization(workflow, workspace_path: Optional[str] = None):
     """Generates a graph visualization of the LangGraph workflow."""
     # with LangChainTracer("generate_workflow_visualization",project_name="AI-Frontend-Generation11223") as run:
 
     """Generates a graph visualization of the LangGraph workflow."""
     try:
+        # Imported here, they are only needed to draw the workflow and take longer to import than the whole API
+        import matplotlib.pyplot as plt
+        import networkx as nx
+        from PIL import Image
+
         if not hasattr(workflow, "nodes") or not hasattr(workflow, "edges"):
             print("Error: The provided workflow does not have 'nodes' or 'edges'.")
             return
@@ -702,7 +918,7 @@ def generate_workflow_visualization(workflow):
         plt.figure(figsize=(10, 6))
         nx.draw(graph, pos, with_labels=True, node_size=3000, node_color="skyblue", font_size=10, font_weight="bold")
 
-        output_file="project_root" + "/" + "langgraph_workflow.png"
+        output_file = os.path.join(get_project_root(workspace_path), "langgraph_workflow.png")
         # Save visualization
         with BytesIO() as buffer:
             plt.savefig(buffer, format="png")
@@ -730,8 +946,11 @@ def generate_workflow_visualization(workflow):
 
     Returns:
         GraphState: The updated state of the workflow graph.
+
+    Raises:
+        Exception: If an LLM call or a file write fails, so the stage is recorded as failed.
 """
-def generate_documentation(state: GraphState):
+async def generate_documentation(state: GraphState, max_concurrency: Optional[int] = None):
     """Generates project documentation using Groq LLM."""
     # Generate code comments (conceptual)
     # This would involve parsing the generated code and adding comments using LLM.
@@ -746,7 +965,7 @@ def generate_documentation(state: GraphState):
     }
     ui_components = state.ui_components
 
-    workspace_path: str = f"project_root"
+    project_root = get_project_root(state.workspace_path)
     project_details:str = f"Project Details: {analysis_results}, Components: {list(ui_components.keys()) if ui_components else []}" # Add project details here.
 
     # Generate README.md
@@ -762,19 +981,17 @@ def generate_documentation(state: GraphState):
         """
     )
 
-    readme_message = readme_prompt.format_messages(project_details=project_details, workspace_path=workspace_path)
-    readme_content = groq_llm.invoke(readme_message).content
+    readme_message = token_service.format_messages_within_budget(
+        readme_prompt, "generate_documentation", ["project_details"], project_details=project_details, workspace_path=ANGULAR_PROJECT_NAME
+    )
+    readme_content = (await get_chat_model().ainvoke(readme_message, stage="generate_documentation")).content
 
-    try:
-        #with open(workspace_path + "/" +  "README.md", "w") as f:
-        with open("README.md", "w") as f:
-            f.write(readme_content)
-    except Exception as e:
-        pass
+    await asyncio.to_thread(file_service.write_files, state.workspace_path, {os.path.join(project_root, "README.md"): readme_content})
     print("README.md generated.")
 
-    # Generate component documentation
-    for component, code in ui_components.items():
+    # Generate component documentation, at most max_concurrency LLM calls at a time
+    async def generate(component):
+        code = ui_components[component]
         component_prompt = ChatPromptTemplate.from_template(
             """if not in {workspace_path}, first, change the current directory to the workspace folder using the following command:
             cd {workspace_path}
@@ -782,41 +999,155 @@ def generate_documentation(state: GraphState):
             Then, generate documentation for the following Angular component: {component}.
             Include props, states, API integration details, and usage examples.
             {component_code}
+            Requirements the component implements:
+            {srs_context}
 
             Provide the component documentation in a markdown format.
             """
         )
 
-        component_message = component_prompt.format_messages(workspace_path=workspace_path,component=component, component_code=code)
-        component_content = groq_llm.invoke(component_message).content
-
-        try:
-            #with open(f"{workspace_path} + '/' + {component}.md", "w") as f:
-            with open(f"{component}.md", "w") as f:
-                f.write(component_content)
-        except Exception as e:
-            pass
+        component_message = token_service.format_messages_within_budget(
+            component_prompt, "generate_documentation", ["srs_context", "component_code"], workspace_path=ANGULAR_PROJECT_NAME, component=component, component_code=code,
+            srs_context=srs_index_service.retrieve(state.srs_sections, component),
+        )
+        component_content = (await get_chat_model().ainvoke(component_message, stage="generate_documentation")).content
         print(f"Component documentation generated: {component}.md")
+        return component_content
+
+    components = list(ui_components or {})
+    results = await arun_concurrently(generate, components, max_concurrency or LLM_MAX_CONCURRENCY)
+    component_docs = {os.path.join(project_root, f"{component}.md"): content for component, content in zip(components, results)}
+
+    await asyncio.to_thread(file_service.write_files, state.workspace_path, component_docs)
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     logging.info(" generate_documentation: success! ") #print("Code comments generation (conceptual).")
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     
 
+"""
+    Splits text (component names, analysis details) into lower-case search terms.
+"""
+def get_search_terms(*values) -> set:
+    """Splits text into lower-case search terms."""
+    return set(srs_index_service.tokenize(" ".join(str(value) for value in values if value)))
+
+"""
+    Keeps the screenshot details (top-level entries and list items) that mention one of the search terms.
+    Returns the details unchanged when nothing matches.
+"""
+def select_relevant_screenshot_details(screenshot_details, terms: set):
+    """Keeps the screenshot details that mention one of the search terms."""
+    def mentions(value):
+        return bool(terms & get_search_terms(json.dumps(value, default=str)))
+
+    if not isinstance(screenshot_details, dict):
+        return screenshot_details
+    relevant = {}
+    for key, value in screenshot_details.items():
+        if isinstance(value, list):
+            items = [item for item in value if mentions(item)]
+            if items:
+                relevant[key] = items
+        elif mentions({key: value}):
+            relevant[key] = value
+    return relevant or screenshot_details
+
+"""
+    Validates one generated component against the SRS paragraphs and screenshot details that concern it (map step).
+
+    Returns:
+        str: The findings of the LLM as markdown.
+"""
+async def validate_component(component: str, component_code, srs_sections: str, screenshot_details):
+    """Validates one generated component against the requirements that concern it."""
+    prompt = ChatPromptTemplate.from_template(
+        """Validate the generated Angular component {component} against the requirements that concern it.
+        Component code: {component_code}
+        Relevant SRS sections: {srs_sections}
+        Relevant screenshot details: {screenshot_details}
+        List any discrepancies, inconsistencies, or potential issues as markdown bullet points.
+        If there are none, reply with "No issues found."
+        """
+    )
+    message = token_service.format_messages_within_budget(
+        prompt, "validate_ui", ["screenshot_details", "srs_sections", "component_code"],
+        component=component, component_code=component_code, srs_sections=srs_sections, screenshot_details=screenshot_details,
+    )
+    return (await get_chat_model().ainvoke(message, stage="validate_ui")).content.strip()
+
+"""
+    Merges the per-component findings into the validation report (reduce step, no LLM call).
+
+    Args:
+        findings (Dict[str, str]): Component name -> findings, in component order.
+
+    Returns:
+        str: The markdown validation report.
+"""
+def merge_validation_findings(findings: Dict[str, str]) -> str:
+    """Merges the per-component findings into the validation report."""
+    with_issues = [component for component, text in findings.items() if not text.lower().startswith("no issues")]
+    lines = [
+        "# UI Validation Report",
+        "",
+        f"Validated {len(findings)} components: {len(with_issues)} with findings, {len(findings) - len(with_issues)} without.",
+    ]
+    for component, text in findings.items():
+        lines += ["", f"## {component}", "", text]
+    return "\n".join(lines)
+
 """
     Validates the generated UI code using Groq LLM.
 
+    In "map_reduce" mode (VALIDATE_UI_MODE, the default) every component is validated by its own LLM call,
+    in parallel, against only the SRS sections (retrieved from the section index) and screenshot details that concern it, and the findings are
+    merged into one report without a further LLM call. "single" validates everything with one call.
+
     Args:
-        generated_code: The generated UI code.
+        generated_code: The generated UI code (component name -> files).
         srs_content: The software requirements specification content.
         screenshot_details: Details about the screenshot (e.g., description, file path).
+        mode (str): "map_reduce" or "single". Defaults to VALIDATE_UI_MODE.
+        analysis_results (Dict[str, Any]): The analysis results, their component details refine the SRS selection.
+        max_concurrency (int): Maximum number of validation LLM calls in flight. Defaults to LLM_MAX_CONCURRENCY.
+        srs_sections (List[Dict[str, str]]): The SRS sections to retrieve from, split from srs_content if not given.
 
     Returns:
         str: The validation results from the LLM, or None if an error occurs.
 """
-def validate_ui(generated_code, srs_content, screenshot_details):
+async def validate_ui(generated_code, srs_content, screenshot_details, mode: Optional[str] = None,
+                analysis_results: Optional[Dict[str, Any]] = None, max_concurrency: Optional[int] = None,
+                srs_sections: Optional[List[Dict[str, str]]] = None):
     """Validates the generated UI code using Groq LLM."""
 
+    if (mode or VALIDATE_UI_MODE) == "map_reduce" and generated_code:
+        component_specs = get_component_specs(analysis_results or {})
+        srs_sections = srs_sections or srs_index_service.split_sections(srs_content)
+
+        async def validate(item):
+            component, component_code = item
+            terms = get_search_terms(component, component_specs.get(component))
+            try:
+                return await validate_component(
+                    component,
+                    component_code,
+                    srs_index_service.retrieve(srs_sections, f"{component} {component_specs.get(component) or ''}", max_tokens=VALIDATE_UI_SRS_TOKENS),
+                    select_relevant_screenshot_details(screenshot_details, terms),
+                )
+            except Exception as e:
+                logging.error(f"Error validating component {component}: {e}")
+                return f"Validation failed: {e}"
+
+        items = list(generated_code.items())
+        results = await arun_concurrently(validate, items, max_concurrency or LLM_MAX_CONCURRENCY)
+        report = merge_validation_findings({component: result for (component, _), result in zip(items, results)})
+
+        logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
+        logging.info(" validate_ui: success! ")
+        logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
+        return report
+
     prompt = ChatPromptTemplate.from_template(
         """Given the following generated UI code: {generated_code}, SRS document: {srs_content}, and screenshot details: {screenshot_details},
         validate the UI requirements and design specifications.
@@ -825,8 +1156,12 @@ def validate_ui(generated_code, srs_content, screenshot_details):
         """
     )
 
-    message = prompt.format_messages(generated_code=generated_code, srs_content=srs_content, screenshot_details=screenshot_details)
-    response = groq_llm.invoke(message)
+    # Lowest priority first: the screenshot details, then the SRS; the generated code is what is being validated.
+    message = token_service.format_messages_within_budget(
+        prompt, "validate_ui", ["screenshot_details", "srs_content", "generated_code"],
+        generated_code=generated_code, srs_content=srs_content, screenshot_details=screenshot_details,
+    )
+    response = await get_chat_model().ainvoke(message, stage="validate_ui")
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     logging.info(" validate_ui: success! ") 
@@ -834,288 +1169,133 @@ def validate_ui(generated_code, srs_content, screenshot_details):
 
     return response.content  # Return the validation report
 
+"""
+    LangGraph node adapters.
+    Each node reads what it needs from GraphState, calls the stage function and returns only the keys it produced,
+    so nodes running in parallel branches never write the same non-reducer key.
+"""
+async def analyze_screenshot_node(state: GraphState):
+    screenshot_details = await analyze_screenshot(state.screenshot_url)
+    # Handled failures (missing screenshot, vision call error) also go to the errors channel, so the stage is failed.
+    return {"screenshot_details": screenshot_details, "errors": screenshot_details.get("errors")}
+
+async def analyze_srs_node(state: GraphState):
+    analysis_results = await analyze_srs(state.srs_content, state.screenshot_details)
+    return {
+        "analysis_results": analysis_results,
+        "api_endpoints": analysis_results.get("api_endpoints"),
+        "state_management": analysis_results.get("state_management"),
+        "accessibility": analysis_results.get("accessibility"),
+        "styling": analysis_results.get("styling"),
+        "errors": analysis_results.get("errors"),
+    }
+
+async def generate_angular_setup_node(state: GraphState):
+    return {"setup_commands": await generate_angular_setup(state.analysis_results)}
+
+# Sync nodes (subprocesses, file writes) are run in a worker thread by LangGraph, off the event loop.
+# A failed setup raises: the later stages need the Angular project, and the step must not be checkpointed as done,
+# so the project fails and a resume runs the setup again.
+def execute_angular_setup_node(state: GraphState):
+    execute_angular_setup(state.setup_commands, state.workspace_path, raise_errors=True)
+    return {}
+
+async def generate_ui_components_node(state: GraphState):
+    return await generate_ui_components(state, state.analysis_results or {})
+
+async def generate_api_integration_node(state: GraphState):
+    return {"api_services": (await generate_api_integration(state)).api_services}
+
+async def generate_ui_tests_node(state: GraphState):
+    return await generate_ui_tests(state)
+
+async def generate_documentation_node(state: GraphState):
+    await generate_documentation(state)
+    return {}
+
+async def generate_frontend_dockerfile_node(state: GraphState):
+    return {"dockerfile_content": (await generate_frontend_dockerfile(state)).dockerfile_content}
+
+async def validate_ui_node(state: GraphState):
+    validation_report = await validate_ui(state.ui_components, state.srs_content, state.screenshot_details,
+                                          analysis_results=state.analysis_results, srs_sections=state.srs_sections)
+    logging.info(f"UI Validation Report: {validation_report}")
+    return {"validation_report": validation_report}
+
+def save_generated_files_node(state: GraphState):
+    save_generated_files(state)
+    return {}
+
+def deploy_frontend_node(state: GraphState):
+    return {"preview_link": deploy_frontend(state.dockerfile_content, workspace_path=state.workspace_path)}
+
+# Stages that only read the generated components; they run side by side once generate_ui_components is done.
+PARALLEL_STAGES = [
+    "generate_api_integration",
+    "generate_ui_tests",
+    "generate_documentation",
+    "generate_frontend_dockerfile",
+    "validate_ui",
+]
+
 """
     Creates a StateGraph representing the workflow for frontend generation.
 
+    analyze_screenshot -> analyze_srs -> generate_angular_setup -> execute_angular_setup -> generate_ui_components
+    -> PARALLEL_STAGES (in parallel) -> save_generated_files -> deploy_frontend
+
     Returns:
         StateGraph: A StateGraph object representing the workflow.
 """
 def create_graph():
     workflow = StateGraph(GraphState) 
-    #workflow.add_edge("analyze_screenshot", START)
-    workflow.add_node("analyze_screenshot", analyze_screenshot)
-    workflow.add_node("analyze_srs", analyze_srs)
-    workflow.add_node("generate_angular_setup", generate_angular_setup)
-    workflow.add_node("execute_angular_setup", execute_angular_setup)
-    workflow.add_node("generate_ui_components", generate_ui_components)
-    workflow.add_node("generate_api_integration", generate_api_integration)
-    workflow.add_node("generate_ui_tests", generate_ui_tests)
-    workflow.add_node("generate_frontend_dockerfile", generate_frontend_dockerfile)
-    workflow.add_node("validate_ui", validate_ui)
-    workflow.add_node("generate_documentation", generate_documentation)
-    workflow.add_node("save_generated_files", save_generated_files)
-    workflow.add_node("deploy_frontend", deploy_frontend)
-    #workflow.add_node("END", lambda state: GraphState(state.state_id)) 
+    workflow.add_node("analyze_screenshot", timed_stage("analyze_screenshot", analyze_screenshot_node))
+    workflow.add_node("analyze_srs", timed_stage("analyze_srs", analyze_srs_node))
+    workflow.add_node("generate_angular_setup", timed_stage("generate_angular_setup", generate_angular_setup_node))
+    workflow.add_node("execute_angular_setup", timed_stage("execute_angular_setup", execute_angular_setup_node))
+    workflow.add_node("generate_ui_components", timed_stage("generate_ui_components", generate_ui_components_node))
+    workflow.add_node("generate_api_integration", timed_stage("generate_api_integration", generate_api_integration_node))
+    workflow.add_node("generate_ui_tests", timed_stage("generate_ui_tests", generate_ui_tests_node))
+    workflow.add_node("generate_frontend_dockerfile", timed_stage("generate_frontend_dockerfile", generate_frontend_dockerfile_node))
+    workflow.add_node("validate_ui", timed_stage("validate_ui", validate_ui_node))
+    workflow.add_node("generate_documentation", timed_stage("generate_documentation", generate_documentation_node))
+    workflow.add_node("save_generated_files", timed_stage("save_generated_files", save_generated_files_node))
+    workflow.add_node("deploy_frontend", timed_stage("deploy_frontend", deploy_frontend_node))
 
     # Define edges
+    workflow.add_edge(START, "analyze_screenshot")
     workflow.add_edge("analyze_screenshot", "analyze_srs")
     workflow.add_edge("analyze_srs", "generate_angular_setup")
     workflow.add_edge("generate_angular_setup", "execute_angular_setup")
     workflow.add_edge("execute_angular_setup", "generate_ui_components")
-    workflow.add_edge("generate_ui_components", "generate_api_integration")
-    workflow.add_edge("generate_api_integration", "generate_ui_tests")
-    workflow.add_edge("generate_ui_tests", "generate_frontend_dockerfile")
-    workflow.add_edge("generate_frontend_dockerfile", "validate_ui")
-    workflow.add_edge("validate_ui", "generate_documentation")
-    workflow.add_edge("generate_documentation", "save_generated_files")
+    # Fan out to the parallel branches, their outputs are merged by the GraphState reducers
+    for stage in PARALLEL_STAGES:
+        workflow.add_edge("generate_ui_components", stage)
+    # Fan in: save_generated_files waits for every branch
+    workflow.add_edge(PARALLEL_STAGES, "save_generated_files")
     workflow.add_edge("save_generated_files", "deploy_frontend")
-    #workflow.add_edge("deploy_frontend", END)
-    
-    workflow.set_entry_point("analyze_screenshot") # add entry point
-    #workflow.set_finish_point(END) # add finish point
+    workflow.add_edge("deploy_frontend", END)
 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
     logging.info(" create_graph: success! ") 
     logging.info("\n" + "\n" + "=================================================" +"\n" +"\n")
 
     # Return the created StateGraph object.
-    return workflow #.compile()
-
-
-
-
-# Example usage (assuming analysis_results from the previous step)
-analysis_results = {
-    "ui_components": ["login-form", "signup-form", "button", "modal", "form"],
-    "state_management": "NgRx",
-    "api_endpoints": ["/users", "/auth"],
-    "accessibility": "WCAG guidelines",
-    "styling": "Material UI with custom theme",
-}
-
-ui_components = {
-    "login-form": {"login-form.component.ts": "...", "login-form.component.html": "..."},
-    "signup-form": {"signup-form.component.ts": "...", "signup-form.component.html": "..."},
-}
-
-# Example:
-#setup_commands = generate_angular_setup(analysis_results)
-#print("Generated Setup Commands:\n", setup_commands)
-
-# Example: 
-#generated_components = generate_ui_components(analysis_results)
-#for component, code in generated_components.items():
-#    print(f"Generated Component: {component}\n", code)
-
-# Example usage (assuming analysis_results from the previous step)
-#generated_services = generate_api_integration(analysis_results)
-#for endpoint, code in generated_services.items():
- #   print(f"Generated Service: {endpoint}\n", code)
-
-# Example usage (assuming analysis_results and generated_components from the previous steps)
-#generated_tests = generate_ui_tests(analysis_results, generated_components)
-#for component, test in generated_tests.items():
-#    print(f"Generated Test: {component}\n", test)
-
-# Example: 
-#dockerfile_content = generate_frontend_dockerfile(analysis_results, ui_components)
-#print("Generated Dockerfile:\n", dockerfile_content)
-
-# Example: Execute the commands (be cautious when executing generated commands) # Uncomment below when ready
-#execute_angular_setup(setup_commands)
-
-# Example usage (in your LangGraph workflow):
-# validation_report = validate_ui(graph_state.ui_components, graph_state.srs_content, graph_state.screenshot_details)
-# logging.info(f"UI Validation Report: {validation_report}")
-
-# # Example usage (assuming you have SRS content and screenshot URL)
-graph_state = GraphState() 
-
-#srs_content = """
-# The application should have a dashboard with a table displaying user data. Users should be able to filter and sort the data.
-# There should be a form to add new users. The application should use a REST API for data fetching.
-# """
-
-srs_content = """
-Software Requirements Document (SRD)
-1. Overview
-This document outlines the requirements for the frontend development of three microservices/applications within the DNA ecosystem: Dashboard, LMS (Leave Management System), and PODs. The focus is on UI/UX design, API contracts for integration, and overall frontend development guidelines.
-
-2. UI/UX Design Guidelines
-2.1 Color Scheme
-    • Primary Color: #007bff (Blue - for primary actions)
-    • Secondary Color: #6c757d (Gray - for secondary actions)
-    • Background Color: #f8f9fa (Light Gray - for application background)
-    • Success Color: #28a745 (Green - for success messages)
-    • Error Color: #dc3545 (Red - for error messages)
-2.2 Typography
-    • Font Family: "Inter", sans-serif
-    • Heading Font Size: 24px (Bold)
-    • Subheading Font Size: 18px (Medium)
-    • Body Text Size: 16px (Regular)
-    • Button Text Size: 14px (Bold)
-2.3 Components
-    • Buttons: Rounded corners (8px), filled for primary actions, outlined for secondary actions.
-    • Cards: Shadow (box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1)) with padding (16px).
-    • Modals: Centered popups with a semi-transparent background.
-    • Forms: Input fields with a border radius of 5px and padding of 10px.
-
-3. Application Features
-3.1 Dashboard
-    • Displays multiple tiles reflecting highlights from various applications.
-    • Each tile fetches real-time data from APIs.
-    • Users can customize which tiles appear on their dashboard.
-API Contract
-Fetch Dashboard Data
-Request:
-GET /api/dashboard
-Headers: { Authorization: Bearer <token> }
-Response:
-{
-  "tiles": [
-    { "id": "1", "title": "Leave Summary", "content": "10 leaves remaining" },
-    { "id": "2", "title": "Pod Members", "content": "3 active members" }
-  ]
-}
-
-3.2 LMS (Leave Management System)
-General User Features
-    • Apply for leave.
-    • View granted leaves.
-    • Check available leave balance.
-Manager Features
-    • Approve/reject leave requests.
-    • View team leave history.
-API Contract
-Apply for Leave
-Request:
-POST /api/lms/leave/apply
-Headers: { Authorization: Bearer <token> }
-Body:
-{
-  "startDate": "2025-03-15",
-  "endDate": "2025-03-18",
-  "reason": "Family event"
-}
-Response:
-{
-  "message": "Leave request submitted successfully",
-  "status": "pending"
-}
-Approve Leave (Manager Only)
-Request:
-POST /api/lms/leave/approve
-Headers: { Authorization: Bearer <token> }
-Body:
-{
-  "leaveId": "12345",
-  "status": "approved"
-}
-Response:
-{
-  "message": "Leave request approved",
-  "status": "approved"
-}
-
-3.3 PODs
-    • Managers can add employees to a pod.
-    • Employees can view their pod details.
-    • Employees can recommend other employees to join their pod.
-API Contract
-View Pod Details
-Request:
-GET /api/pods/details
-Headers: { Authorization: Bearer <token> }
-Response:
-{
-  "podId": "56789",
-  "podName": "Innovation Team",
-  "members": [
-    { "id": "1", "name": "John Doe", "role": "Lead Developer" },
-    { "id": "2", "name": "Jane Smith", "role": "UI/UX Designer" }
-  ]
-}
-Recommend an Employee for a Pod
-Request:
-POST /api/pods/recommend
-Headers: { Authorization: Bearer <token> }
-Body:
-{
-  "podId": "56789",
-  "recommendedUserId": "3"
-}
-Response:
-{
-  "message": "Recommendation sent successfully"
-}
-
-4. Authentication & Authorization
-    • Users authenticate via JWT-based login.
-    • Role-based access control (RBAC) to differentiate between managers and employees.
-API Contract
-Login
-Request:
-POST /api/auth/login
-Body:
-{
-  "email": "user@example.com",
-  "password": "securepassword"
-}
-Response:
-{
-  "token": "jwt-token-here",
-  "user": { "id": "1", "role": "manager" }
-}
-Fetch Current User
-Request:
-GET /api/auth/me
-Headers: { Authorization: Bearer <token> }
-Response:
-{
-  "id": "1",
-  "name": "John Doe",
-  "role": "manager"
-}
-
-6. Deployment & Hosting Considerations
-    • Frontend Framework: Angular with Angular with Material UI.
-    • Hosting: Vercel, Netlify, or S3 with CloudFront.
-    • CI/CD: GitHub Actions or GitLab CI/CD for automated deployment.
-
-7. Conclusion
-This document provides frontend implementation guidelines, UI/UX specifications, API contracts, and integration details for Dashboard, LMS, and PODs applications. 
+    return workflow
+
+_compiled_graph = None
+
+"""
+    Returns the compiled workflow, building it on first use.
+    GraphState is checkpointed to the database after every step, keyed by the thread id in the run config.
+
+    Returns:
+        CompiledStateGraph: The runnable LangGraph workflow.
 """
+def get_compiled_graph():
+    """Returns the compiled workflow, building it on first use."""
+    global _compiled_graph
+    if _compiled_graph is None:
+        _compiled_graph = create_graph().compile(checkpointer=get_checkpointer())
+    return _compiled_graph
 
-# screenshot_url = MEDIA_PATH + "Screenshot 2025-03-10 113424.png" #"Test2.png" # Replace with your screenshot URL
-
-# # Calls analyze_screenshot to get screenshot details.
-# screenshot_details = analyze_screenshot(screenshot_url) 
-
-# if screenshot_details.get("screenshot_details", {}).get("error"):
-#      logging.error("Screenshot Analysis Error: %s", screenshot_details["error"])
-# else:
-#      logging.info(screenshot_details)
-#      # Calls analyze_srs with the SRS content and screenshot details.
-#      analysis_results = analyze_srs(srs_content, screenshot_details)
-#      # logging.info("Analysis Results: %s", analysis_results)
-
-# # #Example: LangGraph workflow 
-# workflow = create_graph() # from previous steps
-# commands = generate_angular_setup(analysis_results)
-# execute_angular_setup(commands)
-# ui_generation_results = generate_ui_components(graph_state, analysis_results) 
-# graph_state.ui_components = ui_generation_results["ui_components"] 
-# graph_state.ui_dependencies = ui_generation_results["ui_dependencies"]
-# graph_state.api_endpoints = analysis_results["api_endpoints"] 
-# graph_state = generate_api_integration(graph_state)
-# ui_test_results = generate_ui_tests(graph_state) 
-# graph_state.ui_tests = ui_test_results["ui_tests"]
-# generate_documentation(graph_state)
-# graph_state = generate_frontend_dockerfile(graph_state)
-# validation_report = validate_ui(graph_state.ui_components, graph_state.srs_content, graph_state.screenshot_details)
-# logging.info(f"UI Validation Report: {validation_report}")
-# save_generated_files(graph_state)
-# deployment_url = deploy_frontend(graph_state.dockerfile_content)
-# # Generate workflow visualization
-# generate_workflow_visualization(workflow) # uncomment after creating workflow
-# logging.info("Angular project setup complete with UI components, API services, tests, and Dockerfile and deployed at: " + deployment_url)
\ No newline at end of file
@@ -0,0 +1,108 @@
+## Background job runner for the generation pipeline.
+## The API stores the project and hands the long running LangGraph workflow to a bounded worker pool,
+## so request handling never waits for LLM calls or Angular CLI subprocesses.
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+from app.settings import load_environment
+from app.services import metrics_service
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+# Number of projects generated at the same time by this process (each one in its own workspace).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Number of accepted projects allowed to wait for a free worker.
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+
+executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="project-job")
+
+_jobs: Dict[int, Future] = {}
+_jobs_lock = threading.Lock()
+
+
+class JobQueueFullError(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+"""
+    Returns the number of submitted jobs that have not finished yet (running + queued).
+"""
+def pending_jobs() -> int:
+    """Returns the number of unfinished jobs."""
+    with _jobs_lock:
+        return sum(1 for future in _jobs.values() if not future.done())
+
+
+metrics_service.JOBS_PENDING.set_function(pending_jobs)
+
+
+"""
+    Checks whether a new job can be accepted without exceeding the worker pool and queue limits.
+"""
+def has_capacity() -> bool:
+    """Checks whether a new job can be accepted."""
+    return pending_jobs() < JOB_WORKERS + JOB_QUEUE_SIZE
+
+
+"""
+    Submits a pipeline run for a project to the worker pool.
+
+    Args:
+        project_id (int): The project the job belongs to, also used as the job id.
+        fn (Callable): The function to run in the background.
+        *args: Arguments passed to fn.
+
+    Returns:
+        Future: The future of the submitted job.
+
+    Raises:
+        JobQueueFullError: If the pool and its queue are already full.
+"""
+def submit_job(project_id: int, fn: Callable, *args) -> Future:
+    """Submits a pipeline run for a project to the worker pool."""
+    with _jobs_lock:
+        # Forget finished jobs so the registry only tracks live work.
+        for job_id in [job_id for job_id, future in _jobs.items() if future.done()]:
+            del _jobs[job_id]
+
+        if len(_jobs) >= JOB_WORKERS + JOB_QUEUE_SIZE:
+            raise JobQueueFullError(f"Job queue is full ({len(_jobs)} pending jobs).")
+        if project_id in _jobs:
+            return _jobs[project_id]
+
+        future = executor.submit(_run_job, project_id, fn, *args)
+        _jobs[project_id] = future
+
+    logging.info(f"Project-{project_id} job queued.")
+    return future
+
+
+"""
+    Checks whether a job for the given project is queued or running in this process.
+"""
+def is_running(project_id: int) -> bool:
+    """Checks whether a job for the given project is queued or running."""
+    with _jobs_lock:
+        future = _jobs.get(project_id)
+        return future is not None and not future.done()
+
+
+"""
+    Stops accepting jobs and releases the worker threads.
+"""
+def shutdown(wait: bool = False):
+    """Stops accepting jobs and releases the worker threads."""
+    executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _run_job(project_id: int, fn: Callable, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        # The pipeline records its own failures; this only guards against crashes in the runner itself.
+        logging.exception(f"Project-{project_id} job crashed: {e}")
@@ -0,0 +1,142 @@
+## LangSmith run logs with a database cache.
+## A completed run never changes, so it is fetched from LangSmith once and served from the langsmith_runs table after that.
+## Runs still in progress are cached for LANGSMITH_RUN_TTL seconds, so a polling dashboard does not turn every
+## poll into a LangSmith request.
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from app.settings import load_environment
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.run_log import LangSmithRun
+from app.services.client_service import get_langsmith_client
+from app.services.common_service import run_concurrently
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+# Seconds a run that is still in progress is served from the cache before it is fetched again.
+LANGSMITH_RUN_TTL = int(os.getenv("LANGSMITH_RUN_TTL", "15"))
+# Maximum number of runs fetched from LangSmith at the same time by a bulk read.
+LANGSMITH_FETCH_CONCURRENCY = int(os.getenv("LANGSMITH_FETCH_CONCURRENCY", "8"))
+
+
+"""
+    Converts a LangSmith run into the JSON logs returned by the API.
+
+    Returns:
+        dict: name, status, start_time, end_time, inputs, outputs, error and events.
+"""
+def serialize_run(run) -> Dict[str, Any]:
+    """Converts a LangSmith run into the JSON logs returned by the API."""
+    logs = {
+        "name": run.name,
+        "status": getattr(run, "status", None),
+        "start_time": run.start_time,
+        "end_time": run.end_time,
+        "inputs": run.inputs,
+        "outputs": run.outputs,
+        "error": getattr(run, "error", None),
+        "events": [event if isinstance(event, dict) else event.dict() for event in run.events or []],
+    }
+    # Round trip through JSON once, so datetimes and other objects are stored and served as plain values.
+    return json.loads(json.dumps(logs, default=str))
+
+
+def _is_completed(run) -> bool:
+    return run.end_time is not None and getattr(run, "status", None) != "pending"
+
+
+def _fetch(run_id: str) -> Dict[str, Any]:
+    run = get_langsmith_client().read_run(run_id=run_id)
+    return {"logs": serialize_run(run), "completed": _is_completed(run)}
+
+
+def _is_fresh(entry: Optional[LangSmithRun], now: float) -> bool:
+    return entry is not None and (entry.completed or now - (entry.fetched_at or 0) < LANGSMITH_RUN_TTL)
+
+
+def _store(db: Session, entry: Optional[LangSmithRun], run_id: str, fetched: Dict[str, Any], now: float):
+    if entry is None:
+        entry = LangSmithRun(run_id=run_id)
+        db.add(entry)
+    entry.logs = fetched["logs"]
+    entry.completed = fetched["completed"]
+    entry.fetched_at = now
+
+
+def _commit(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request cached the same run first, its entry is as good as ours.
+        db.rollback()
+
+
+"""
+    Returns the logs of several LangSmith runs, from the cache when possible.
+    Missing and expired runs are fetched from LangSmith in parallel; the cache is updated in one commit.
+
+    Args:
+        db (Session): The database session.
+        run_ids (List[str]): The LangSmith run ids.
+
+    Returns:
+        dict: run id -> logs, or {"error": str} for a run that could not be fetched and is not cached.
+"""
+def get_runs_logs(db: Session, run_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Returns the logs of several LangSmith runs, from the cache when possible."""
+    run_ids = list(dict.fromkeys(run_ids))
+    entries = {entry.run_id: entry for entry in db.query(LangSmithRun).filter(LangSmithRun.run_id.in_(run_ids)).all()}
+    now = time.time()
+    stale = [run_id for run_id in run_ids if not _is_fresh(entries.get(run_id), now)]
+
+    def fetch(run_id):
+        try:
+            return _fetch(run_id)
+        except Exception as e:
+            logging.error(f"Error fetching LangSmith run {run_id}: {e}")
+            return e
+
+    results = {run_id: entry.logs for run_id, entry in entries.items()}
+    stored = False
+    for run_id, fetched in zip(stale, run_concurrently(fetch, stale, LANGSMITH_FETCH_CONCURRENCY)):
+        if isinstance(fetched, Exception):
+            # An expired entry is served until LangSmith answers again.
+            if run_id not in entries:
+                results[run_id] = {"error": f"Error fetching LangSmith logs: {fetched}"}
+            continue
+        _store(db, entries.get(run_id), run_id, fetched, now)
+        results[run_id] = fetched["logs"]
+        stored = True
+    if stored:
+        _commit(db)
+    return {run_id: results[run_id] for run_id in run_ids}
+
+
+"""
+    Returns the logs of a LangSmith run, from the cache when possible.
+
+    Raises:
+        Exception: If the run is not cached and cannot be fetched from LangSmith.
+"""
+def get_run_logs(db: Session, run_id: str) -> Dict[str, Any]:
+    """Returns the logs of a LangSmith run, from the cache when possible."""
+    entry = db.query(LangSmithRun).filter(LangSmithRun.run_id == run_id).first()
+    now = time.time()
+    if _is_fresh(entry, now):
+        return entry.logs
+    try:
+        fetched = _fetch(run_id)
+    except Exception as e:
+        if entry is None:
+            raise
+        logging.warning(f"Error fetching LangSmith run {run_id}, serving the cached logs: {e}")
+        return entry.logs
+    _store(db, entry, run_id, fetched, now)
+    _commit(db)
+    return fetched["logs"]
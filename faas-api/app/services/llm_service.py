@@ -0,0 +1,403 @@
+## Shared LLM call layer used by every groq_llm call site.
+## Wraps a LangChain chat model with a content-addressed response cache, so re-submitted SRS documents
+## and re-runs after a crash do not pay for identical calls again.
+## The model can be swapped for a record / replay backend (LLM_BACKEND), so the pipeline can be run and
+## benchmarked offline from a cassette of recorded responses.
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+from app.settings import load_environment
+from langchain_core.messages import AIMessage, convert_to_messages, message_to_dict, messages_from_dict
+from app.services.cache_service import TieredCache
+from app.services import metrics_service, rate_limit_service, token_service
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.path.abspath(os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3"))
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# live: call the provider. record: call the provider and append every response to the cassette.
+# replay: answer from the cassette only, with LLM_REPLAY_LATENCY seconds of synthetic latency
+# ("recorded" replays the recorded latency); LLM_REPLAY_ON_MISS=synthetic answers unknown requests with a placeholder.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live")
+LLM_CASSETTE_PATH = os.path.abspath(os.getenv("LLM_CASSETTE_PATH", ".cache/llm_cassette.jsonl"))
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "0")
+LLM_REPLAY_JITTER = float(os.getenv("LLM_REPLAY_JITTER", "0"))
+LLM_REPLAY_ON_MISS = os.getenv("LLM_REPLAY_ON_MISS", "error")
+# Identical deterministic requests sent while one is already in flight wait for its response instead of calling again.
+LLM_SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+_llm_cache: Optional[TieredCache] = None
+_llm_cache_lock = threading.Lock()
+
+# Per-stage counters: stage -> {"hits": n, "misses": n, "coalesced": n}
+_cache_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0})
+_cache_stats_lock = threading.Lock()
+
+# Requests in flight: request key -> Future of the response, shared by every caller of the same request.
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+# Result of a flight whose leader was cancelled or interrupted: its followers retry, one of them as the new leader.
+_LEADER_GONE = object()
+
+
+"""
+    Returns the process-wide LLM response cache, opening the SQLite file on first use.
+"""
+def get_llm_cache() -> TieredCache:
+    """Returns the process-wide LLM response cache."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = TieredCache(LLM_CACHE_PATH, "llm_responses", LLM_CACHE_MEMORY_ITEMS, LLM_CACHE_MAX_BYTES)
+        return _llm_cache
+
+
+"""
+    Builds the content-addressed key of an LLM request.
+
+    Args:
+        model (str): The model name.
+        temperature (float): The sampling temperature.
+        messages: The rendered prompt, anything accepted by a LangChain chat model (messages, dicts or a string).
+
+    Returns:
+        str: A SHA-256 hex digest of (model, temperature, messages).
+"""
+def make_cache_key(model: str, temperature: Any, messages) -> str:
+    """Builds the content-addressed key of an LLM request."""
+    rendered = [message_to_dict(message) for message in convert_to_messages(messages)]
+    for message in rendered:
+        # Message ids are generated per call and would defeat the cache.
+        message["data"].pop("id", None)
+    payload = json.dumps({"model": model, "temperature": temperature, "messages": rendered}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+"""
+    Returns a copy of the per-stage cache counters.
+
+    Returns:
+        dict: stage -> {"hits": int, "misses": int, "coalesced": int}
+"""
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Returns a copy of the per-stage cache counters."""
+    with _cache_stats_lock:
+        return {stage: dict(counts) for stage, counts in _cache_stats.items()}
+
+
+def _count(stage: str, outcome: str):
+    with _cache_stats_lock:
+        _cache_stats[stage][outcome] += 1
+    metrics_service.record_cache(stage, outcome)
+
+
+class CachedChatModel:
+    """
+    Drop-in wrapper around a LangChain chat model that memoizes responses.
+
+    invoke/ainvoke accept an extra stage argument used for the per-stage cache counters and token usage. Only deterministic
+    calls (temperature 0) are cached, since for those a stored response is as good as a fresh one.
+    Calls that miss the cache go through the shared rate limit scheduler, which also retries transient failures,
+    and identical deterministic calls made while one is in flight share its response (single-flight).
+    """
+
+    def __init__(self, llm, cache_enabled: bool = LLM_CACHE_ENABLED):
+        self.llm = get_backend(llm)
+        # In record mode every call must reach the recorder, a cache hit would leave it out of the cassette.
+        self.cache_enabled = cache_enabled and not isinstance(self.llm, RecordingChatModel)
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.llm, "model_name", None) or getattr(self.llm, "model", "")
+
+    @property
+    def temperature(self):
+        return getattr(self.llm, "temperature", None)
+
+    def _request_key(self, input, kwargs) -> Optional[str]:
+        # Only deterministic calls (temperature 0) have a key: they can be cached and coalesced.
+        if self.temperature not in (0, 0.0) or not (self.cache_enabled or LLM_SINGLE_FLIGHT_ENABLED):
+            return None
+        return make_cache_key(kwargs.get("model") or self.model_name, self.temperature, input)
+
+    def _lookup(self, key: Optional[str], stage: str):
+        if key is None or not self.cache_enabled:
+            return None
+        return self._decode(get_llm_cache().get(key), stage)
+
+    async def _alookup(self, key: Optional[str], stage: str):
+        # The SQLite tier is read in a worker thread, not on the event loop.
+        if key is None or not self.cache_enabled:
+            return None
+        cache = _llm_cache or await asyncio.to_thread(get_llm_cache)
+        return self._decode(await cache.aget(key), stage)
+
+    def _decode(self, cached: Optional[str], stage: str):
+        if cached is None:
+            _count(stage, "misses")
+            return None
+        _count(stage, "hits")
+        return messages_from_dict([json.loads(cached)])[0]
+
+    def _store(self, key: Optional[str], response):
+        if key is not None and self.cache_enabled:
+            get_llm_cache().set(key, json.dumps(message_to_dict(response)))
+
+    async def _astore(self, key: Optional[str], response):
+        if key is not None and self.cache_enabled:
+            cache = _llm_cache or await asyncio.to_thread(get_llm_cache)
+            await cache.aset(key, json.dumps(message_to_dict(response)))
+
+    def _record_usage(self, stage: str, input, response, cached: bool):
+        if cached:
+            token_service.record_usage(stage, cached=True)
+            return
+        # Prefer the counts reported by the provider, count locally otherwise.
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens") or token_service.count_prompt_tokens(input)
+        completion_tokens = usage.get("output_tokens") or token_service.count_tokens(str(response.content))
+        token_service.record_usage(stage, prompt_tokens, completion_tokens)
+        metrics_service.record_tokens(stage, prompt_tokens, completion_tokens)
+
+    def _join_flight(self, key: Optional[str]):
+        """Returns (future, leader). The leader sends the request, the others wait for its future."""
+        if key is None or not LLM_SINGLE_FLIGHT_ENABLED:
+            return None, True
+        with _in_flight_lock:
+            future = _in_flight.get(key)
+            if future is not None:
+                return future, False
+            # A leader may have landed between our cache lookup and now: it stores its response before it leaves
+            # _in_flight, so the memory tier (no I/O under the lock) has it.
+            cached = get_llm_cache().memory.get(key) if self.cache_enabled else None
+            if cached is not None:
+                future = Future()
+                future.set_result(messages_from_dict([json.loads(cached)])[0])
+                return future, False
+            future = _in_flight[key] = Future()
+            return future, True
+
+    def _land(self, key: Optional[str], future: Optional[Future], response=None, error: Optional[Exception] = None):
+        if future is None:
+            return
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
+
+    def invoke(self, input, stage: str = "default", **kwargs):
+        key = self._request_key(input, kwargs)
+        response = self._lookup(key, stage)
+        cached = response is not None
+        while response is None:
+            future, leader = self._join_flight(key)
+            if not leader:
+                response = future.result()
+                if response is _LEADER_GONE:
+                    response = None
+                    continue
+                _count(stage, "coalesced")
+                cached = True
+                continue
+            try:
+                with metrics_service.observe_llm_call(stage):
+                    response = rate_limit_service.call(
+                        lambda: self.llm.invoke(input, **kwargs), stage, token_service.count_prompt_tokens(input)
+                    )
+                self._store(key, response)
+            except Exception as e:
+                self._land(key, future, error=e)
+                raise
+            except BaseException:
+                # Only this caller was interrupted, not the request: the followers must not get its exception.
+                self._land(key, future, _LEADER_GONE)
+                raise
+            self._land(key, future, response)
+        self._record_usage(stage, input, response, cached)
+        return response
+
+    async def ainvoke(self, input, stage: str = "default", **kwargs):
+        key = self._request_key(input, kwargs)
+        response = await self._alookup(key, stage)
+        cached = response is not None
+        while response is None:
+            future, leader = self._join_flight(key)
+            if not leader:
+                # Shielded: cancelling this follower must not cancel the future shared with the other callers.
+                response = await asyncio.shield(asyncio.wrap_future(future))
+                if response is _LEADER_GONE:
+                    response = None
+                    continue
+                _count(stage, "coalesced")
+                cached = True
+                continue
+            try:
+                with metrics_service.observe_llm_call(stage):
+                    response = await rate_limit_service.acall(
+                        lambda: self.llm.ainvoke(input, **kwargs), stage, token_service.count_prompt_tokens(input)
+                    )
+                await self._astore(key, response)
+            except Exception as e:
+                self._land(key, future, error=e)
+                raise
+            except BaseException:
+                # A cancelled leader (e.g. a sibling branch of a failed project) hands the request over to its followers.
+                self._land(key, future, _LEADER_GONE)
+                raise
+            self._land(key, future, response)
+        self._record_usage(stage, input, response, cached)
+        return response
+
+
+class Cassette:
+    """Append-only JSONL file of recorded LLM responses, keyed by request key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = entry
+        return self._entries
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._load().get(key)
+
+    def add(self, key: str, model: str, response, latency: float):
+        entry = {"key": key, "model": model, "latency": round(latency, 4), "message": message_to_dict(response)}
+        with self._lock:
+            self._load()[key] = entry
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+
+class RecordingChatModel:
+    """Calls the wrapped model and appends every response to a cassette."""
+
+    def __init__(self, llm, cassette: Cassette):
+        self.llm = llm
+        self.cassette = cassette
+        self.model_name = getattr(llm, "model_name", None) or getattr(llm, "model", "")
+        self.temperature = getattr(llm, "temperature", None)
+
+    def _key(self, input, kwargs) -> str:
+        return make_cache_key(kwargs.get("model") or self.model_name, self.temperature, input)
+
+    def invoke(self, input, **kwargs):
+        started = time.perf_counter()
+        response = self.llm.invoke(input, **kwargs)
+        self.cassette.add(self._key(input, kwargs), kwargs.get("model") or self.model_name, response, time.perf_counter() - started)
+        return response
+
+    async def ainvoke(self, input, **kwargs):
+        started = time.perf_counter()
+        response = await self.llm.ainvoke(input, **kwargs)
+        self.cassette.add(self._key(input, kwargs), kwargs.get("model") or self.model_name, response, time.perf_counter() - started)
+        return response
+
+
+"""
+    Default answer of the replay backend for requests missing from the cassette (LLM_REPLAY_ON_MISS=synthetic).
+"""
+def synthetic_response(input) -> str:
+    """Default answer of the replay backend for requests missing from the cassette."""
+    return "```typescript\n// synthetic response\nexport {};\n```"
+
+
+class ReplayChatModel:
+    """Answers from a cassette without network access, optionally with synthetic latency."""
+
+    def __init__(self, cassette: Cassette, model_name: str = "", temperature: Any = 0,
+                 latency: str = LLM_REPLAY_LATENCY, jitter: float = LLM_REPLAY_JITTER,
+                 on_miss: str = LLM_REPLAY_ON_MISS, responder: Optional[Callable] = None):
+        self.cassette = cassette
+        self.model_name = model_name
+        self.temperature = temperature
+        self.latency = latency
+        self.jitter = jitter
+        self.on_miss = on_miss
+        # Builds the content of synthetic answers, can be replaced (e.g. by a benchmark with realistic answers).
+        self.responder = responder or synthetic_response
+
+    def _reply(self, input, kwargs):
+        entry = self.cassette.get(make_cache_key(kwargs.get("model") or self.model_name, self.temperature, input))
+        if entry is not None:
+            return messages_from_dict([entry["message"]])[0], entry.get("latency", 0)
+        if self.on_miss != "synthetic":
+            raise LookupError("LLM request not found in the cassette (set LLM_REPLAY_ON_MISS=synthetic to answer it anyway).")
+        return AIMessage(content=self.responder(input)), 0
+
+    def _delay(self, recorded_latency: float) -> float:
+        delay = recorded_latency if self.latency == "recorded" else float(self.latency or 0)
+        return max(0.0, delay + random.uniform(-self.jitter, self.jitter))
+
+    def invoke(self, input, **kwargs):
+        response, recorded_latency = self._reply(input, kwargs)
+        time.sleep(self._delay(recorded_latency))
+        return response
+
+    async def ainvoke(self, input, **kwargs):
+        response, recorded_latency = self._reply(input, kwargs)
+        await asyncio.sleep(self._delay(recorded_latency))
+        return response
+
+
+_cassette: Optional[Cassette] = None
+
+
+"""
+    Returns the process-wide cassette (LLM_CASSETTE_PATH).
+"""
+def get_cassette() -> Cassette:
+    """Returns the process-wide cassette."""
+    global _cassette
+    with _llm_cache_lock:
+        if _cassette is None:
+            _cassette = Cassette(LLM_CASSETTE_PATH)
+        return _cassette
+
+
+"""
+    Wraps a chat model in the backend selected by LLM_BACKEND (live, record or replay).
+"""
+def get_backend(llm, backend: Optional[str] = None):
+    """Wraps a chat model in the backend selected by LLM_BACKEND."""
+    backend = backend or LLM_BACKEND
+    if backend == "record":
+        return RecordingChatModel(llm, get_cassette())
+    if backend == "replay":
+        return ReplayChatModel(
+            get_cassette(),
+            getattr(llm, "model_name", None) or getattr(llm, "model", ""),
+            getattr(llm, "temperature", None),
+        )
+    return llm
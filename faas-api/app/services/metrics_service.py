@@ -0,0 +1,146 @@
+## Prometheus metrics of the generation pipeline, served on /metrics.
+## Stage latencies come from the stage listener hook of common_service, LLM calls, tokens and cache lookups from
+## llm_service, retries and queue waits from rate_limit_service and the Angular CLI / npm steps from command_service.
+## Only the label values listed here are used (stage names, command names, outcomes), so the series count stays bounded.
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+from app.settings import load_environment
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from app.services.common_service import add_stage_listener
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Stages and subprocesses take from milliseconds (cached) to many minutes (npm install, large projects).
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+STAGE_DURATION = Histogram(
+    "faas_stage_duration_seconds", "Wall time of a pipeline stage.", ["stage", "status"], buckets=STAGE_BUCKETS
+)
+STAGE_CPU = Counter("faas_stage_cpu_seconds_total", "CPU time of a pipeline stage, including its worker threads.", ["stage"])
+PIPELINE_DURATION = Histogram(
+    "faas_pipeline_duration_seconds", "Wall time of a whole project generation.", ["status"], buckets=STAGE_BUCKETS
+)
+
+LLM_CALLS = Counter("faas_llm_calls_total", "LLM requests sent to the provider.", ["stage", "status"])
+LLM_CALL_DURATION = Histogram(
+    "faas_llm_call_duration_seconds", "Time of an LLM request, including rate limit waits and retries.",
+    ["stage"], buckets=LLM_BUCKETS,
+)
+LLM_IN_FLIGHT = Gauge("faas_llm_requests_in_flight", "LLM requests waiting for admission or for the provider.")
+LLM_TOKENS = Counter("faas_llm_tokens_total", "Tokens of the LLM requests sent to the provider.", ["stage", "kind"])
+LLM_CACHE = Counter("faas_llm_cache_total", "LLM response cache lookups.", ["stage", "result"])
+LLM_RETRIES = Counter("faas_llm_retries_total", "Retried LLM requests.", ["stage", "reason"])
+LLM_QUEUE_WAIT = Histogram(
+    "faas_llm_queue_wait_seconds", "Time an LLM request waited for the rate limit scheduler.", ["stage"], buckets=LLM_BUCKETS
+)
+# Filled by rate_limit_service and job_service, which set the functions reading their queues.
+LLM_QUEUE_DEPTH = Gauge("faas_llm_queue_depth", "LLM requests waiting for the rate limit scheduler.")
+JOBS_PENDING = Gauge("faas_jobs_pending", "Project generations running or waiting for a worker.")
+
+COMMAND_DURATION = Histogram(
+    "faas_command_duration_seconds", "Run time of an Angular CLI / npm command.", ["command", "status"], buckets=STAGE_BUCKETS
+)
+
+COMMAND_ALIASES = {"g": "generate", "i": "install"}
+
+
+def _status(error) -> str:
+    return "error" if error else "success"
+
+
+"""
+    Stage listener (see common_service.add_stage_listener) feeding the stage histograms.
+"""
+def observe_stage(stage: str, timings: Dict[str, Any]):
+    """Stage listener feeding the stage histograms."""
+    if not METRICS_ENABLED:
+        return
+    STAGE_DURATION.labels(stage, _status(timings.get("error"))).observe(timings["wall"])
+    STAGE_CPU.labels(stage).inc(timings["cpu"])
+
+
+def observe_pipeline(status: str, seconds: float):
+    if METRICS_ENABLED:
+        PIPELINE_DURATION.labels(status).observe(seconds)
+
+
+"""
+    Times an LLM request sent to the provider and counts it as a success or an error.
+"""
+@contextmanager
+def observe_llm_call(stage: str):
+    """Times an LLM request sent to the provider."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    LLM_IN_FLIGHT.inc()
+    status = "error"
+    try:
+        yield
+        status = "success"
+    finally:
+        LLM_IN_FLIGHT.dec()
+        LLM_CALLS.labels(stage, status).inc()
+        LLM_CALL_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_tokens(stage: str, prompt_tokens: int, completion_tokens: int):
+    if METRICS_ENABLED:
+        LLM_TOKENS.labels(stage, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(stage, "completion").inc(completion_tokens)
+
+
+def record_cache(stage: str, result: str):
+    if METRICS_ENABLED:
+        LLM_CACHE.labels(stage, result).inc()
+
+
+def record_retry(stage: str, reason: str):
+    if METRICS_ENABLED:
+        LLM_RETRIES.labels(stage, reason).inc()
+
+
+def record_queue_wait(stage: str, seconds: float):
+    if METRICS_ENABLED:
+        LLM_QUEUE_WAIT.labels(stage).observe(seconds)
+
+
+"""
+    Returns the command label of a CLI invocation, e.g. "ng generate" for ["ng", "g", "component", "x"].
+"""
+def command_label(args: List[str]) -> str:
+    """Returns the command label of a CLI invocation."""
+    if not args:
+        return "unknown"
+    if len(args) == 1 or args[1].startswith("-"):
+        return os.path.basename(args[0])
+    return f"{os.path.basename(args[0])} {COMMAND_ALIASES.get(args[1], args[1])}"
+
+
+def observe_command(args: List[str], status: str, seconds: float):
+    if METRICS_ENABLED:
+        COMMAND_DURATION.labels(command_label(args), status).observe(seconds)
+
+
+"""
+    Renders the metrics in the Prometheus text format.
+
+    Returns:
+        Tuple[bytes, str]: The body and its content type.
+"""
+def render() -> Tuple[bytes, str]:
+    """Renders the metrics in the Prometheus text format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+add_stage_listener(observe_stage)
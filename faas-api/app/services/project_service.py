@@ -1,88 +1,220 @@
 import logging
 import os
-from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from app.settings import load_environment
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
 from app.models.project import Project
+from app.database import SessionLocal
 from fastapi import UploadFile
 import docx
+import asyncio
 import io
-from . import analysis_service, generation_service # Import analysis and generation services.
-from langchain_core.tools import tool
-from langchain.callbacks import StdOutCallbackHandler
-from langchain.callbacks import LangChainTracer
+import time
+from . import generation_service # Import the generation service.
 import uuid
-from .common_service import GraphState, deploy_frontend;
+from .common_service import GraphState, get_failed_stage;
+from .checkpoint_service import get_checkpointer, project_thread_id
+from .workspace_service import create_workspace
+from . import blob_service, metrics_service, srs_index_service, token_service
+from datetime import datetime
+from typing import List, Optional
 
 logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
+load_environment()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
+# Keep the workflow checkpoints of completed projects (they are only needed to resume failed runs).
+CHECKPOINT_RETAIN_COMPLETED = os.getenv("CHECKPOINT_RETAIN_COMPLETED", "false").lower() == "true"
 
-# Initialize LangChainTracer
-tracer = LangChainTracer(project_name="AI-Frontend-Generation11223") #LangChainTracer
+# Fields GET /projects can return; srs_content and srs_sections are only loaded when asked for.
+PROJECT_LIST_FIELDS = [
+    "id", "status", "stage", "error", "screenshot_url", "preview_link", "langsmith_run_id", "token_usage", "created_at",
+    "srs_content", "srs_sections",
+]
+PROJECT_LIST_DEFAULT_FIELDS = ["id", "status", "stage", "preview_link", "created_at"]
 
 # Function to create a project
 def create_project(db: Session, srs_file: UploadFile, screenshot_url: str):
-    # Extract text from the uploaded DOCX file
+    """Stores the uploaded SRS as a new queued project. The workflow itself runs in run_project_pipeline."""
+    # Extract text and sections from the uploaded DOCX file
+    srs_content, srs_sections = extract_srs_from_docx(srs_file.file.read())
+    return store_project(db, srs_content, srs_sections, screenshot_url)
+
+# Function to create a project from the async API.
+# Parsing the DOCX is CPU work and runs in a worker thread; the database work runs on the async connection
+# (AsyncSession.run_sync runs the sync service code without blocking the event loop on I/O).
+async def acreate_project(db: AsyncSession, srs_bytes: bytes, screenshot_url: str):
+    """Stores an uploaded SRS as a new queued project without blocking the event loop."""
+    srs_content, srs_sections = await asyncio.to_thread(extract_srs_from_docx, srs_bytes)
+    return await db.run_sync(store_project, srs_content, srs_sections, screenshot_url)
+
+# Function to store the extracted SRS of a new project
+def store_project(db: Session, srs_content: str, srs_sections, screenshot_url: str):
+    # Create a new Project instance, the SRS text goes to the (deduplicated, compressed) blob store
+    srs_blob_sha = blob_service.put(db, srs_content)
+    project = Project(srs_blob_sha=srs_blob_sha, srs_sections=srs_sections, screenshot_url=screenshot_url, status="queued")
+    db.add(project)
+    db.commit()
+    db.refresh(project)
+    return project
+
+# Function to record the progress of a project's background job (clear_stage=True empties the stage)
+def update_project_status(db: Session, project: Project, status: str = None, stage: str = None, error: str = None,
+                          clear_stage: bool = False):
+    if status is not None:
+        project.status = status
+    if stage is not None or clear_stage:
+        project.stage = stage
+    project.error = error
+    db.commit()
+
+# Function to stream the compiled workflow, recording the running stages on the project.
+# graph_state=None continues the project's thread from its last checkpoint.
+# The stages make their LLM calls with ainvoke, so the workflow runs on an event loop of its own in the job worker thread;
+# the parallel branches and their per-component calls interleave on it instead of taking a thread each.
+def run_workflow(db: Session, project: Project, graph_state: Optional[GraphState]):
+    return asyncio.run(astream_workflow(db, project, graph_state))
+
+async def astream_workflow(db: Session, project: Project, graph_state: Optional[GraphState]):
+    graph = generation_service.get_compiled_graph()
+    config = {"configurable": {"thread_id": project_thread_id(project.id)}}
+    step, step_tasks = None, set()
+    final_state = {}
+    async for mode, chunk in graph.astream(graph_state, config, stream_mode=["debug", "values"]):
+        if mode == "values":
+            final_state = chunk
+            continue
+        # The task events of a step all arrive when it starts; parallel branches run side by side, so the stage
+        # lists every node of the current step. (task_result events are not relied on, a failing step skips them.)
+        if chunk["type"] == "task":
+            if chunk["step"] != step:
+                step, step_tasks = chunk["step"], set()
+            step_tasks.add(chunk["payload"].get("name"))
+            update_project_status(db, project, status="running", stage=",".join(sorted(step_tasks)))
+            logging.info(f"Project-{project.id} stage: {project.stage}")
+    return final_state
+
+# Function to check whether a project has a checkpoint its workflow can continue from
+def has_checkpoint(project_id: int) -> bool:
+    checkpoint = get_checkpointer().get_tuple({"configurable": {"thread_id": project_thread_id(project_id)}})
+    return checkpoint is not None
+
+# Function to run the generation workflow of a stored project (executed by the job worker pool).
+# With resume=True the workflow continues from the last completed stage of a failed or interrupted run.
+def run_project_pipeline(project_id: int, resume: bool = False):
     # with LangChainTracer("create_project",project_name="AI-Frontend-Generation11223") as run:
+    db = SessionLocal()
     try:
-        srs_content = extract_text_from_docx(srs_file.file.read())
-
-        # Create a new Project instance
-        project = Project(srs_content=srs_content, screenshot_url=screenshot_url)
-        db.add(project)
-        db.commit()
-        db.refresh(project)
-
-        # Run the LangGraph workflow with LangSmith tracing
-        # with tracer.run(f"Project-{project.id}",project_name="AI-Frontend-Generation11223") as run:
-        # Analyze SRS and generate frontend project
-        graph_state = GraphState() 
-        screenshot_details = analysis_service.analyze_screenshot(screenshot_url)
-        graph_state.screenshot_details=screenshot_details
-        graph_state.srs_content=srs_content
-        analysis_results = analysis_service.analyze_srs(srs_content,screenshot_details)
-        generated_code = generation_service.generate_angular_setup(analysis_results)
-        generation_service.execute_angular_setup(generated_code)
-        ui_generation_results = generation_service.generate_ui_components(graph_state, analysis_results)
-        graph_state.ui_components = ui_generation_results["ui_components"] 
-        graph_state.ui_dependencies = ui_generation_results["ui_dependencies"]
-        graph_state.api_endpoints = analysis_results["api_endpoints"] 
-        graph_state = generation_service.generate_api_integration(graph_state)
-        ui_test_results = generation_service.generate_ui_tests(graph_state)
-        graph_state.ui_tests = ui_test_results["ui_tests"]
-        generation_service.generate_documentation(graph_state)
-        graph_state = generation_service.generate_frontend_dockerfile(graph_state)
-        validation_report = generation_service.validate_ui(graph_state.ui_components, graph_state.srs_content, graph_state.screenshot_details)
-        logging.info(f"UI Validation Report: {validation_report}")
-        generation_service.save_generated_files(graph_state)
-        # Deploy the generated project (conceptual)
-        preview_link = deploy_frontend(graph_state.dockerfile_content)
-
-        # Update the project with preview link and LangSmith run ID
-        project.preview_link = preview_link
-        project.langsmith_run_id = str(uuid.uuid4()) # run.run_id
-        db.commit()
-        return project
-    except Exception as inner_e:
-        logging.error(f"Error in Project-{project.id} workflow: {inner_e}")
-        #run.record_exception(inner_e)
-        return None
+        project = get_project(db, project_id)
+        if not project:
+            logging.error(f"Project-{project_id} not found, skipping workflow.")
+            return None
+
+        usage = {}
+        started = time.perf_counter()
+        try:
+            # Run the compiled LangGraph workflow with LangSmith tracing
+            # with tracer.run(f"Project-{project.id}",project_name="AI-Frontend-Generation11223") as run:
+            if resume and has_checkpoint(project.id):
+                logging.info(f"Project-{project.id} resuming from its last checkpoint.")
+                graph_state = None
+            else:
+                get_checkpointer().delete_thread(project_thread_id(project.id))
+                srs_content = get_srs_content(db, project)
+                graph_state = GraphState(
+                    srs_content=srs_content,
+                    srs_sections=project.srs_sections or srs_index_service.split_sections(srs_content),
+                    screenshot_url=project.screenshot_url,
+                    workspace_path=create_workspace(project.id),
+                )
+            with token_service.track_usage() as usage:
+                final_state = run_workflow(db, project, graph_state)
+            # A resumed run adds to the usage of the interrupted one.
+            project.token_usage = token_service.merge_usage(project.token_usage if resume else None, usage)
+
+            # Update the project with preview link and LangSmith run ID
+            project.preview_link = final_state.get("preview_link")
+            project.langsmith_run_id = str(uuid.uuid4()) # run.run_id
+            # Keep the generated code with the project, shared files are stored once
+            blob_service.save_project_artifacts(db, project.id, generation_service.collect_generated_files(GraphState(**final_state)))
+            update_project_status(db, project, status="completed", clear_stage=True)
+            metrics_service.observe_pipeline("completed", time.perf_counter() - started)
+            if not CHECKPOINT_RETAIN_COMPLETED:
+                get_checkpointer().delete_thread(project_thread_id(project.id))
+            return project
+        except Exception as inner_e:
+            logging.error(f"Error in Project-{project.id} workflow: {inner_e}")
+            #run.record_exception(inner_e)
+            db.rollback()
+            project.token_usage = token_service.merge_usage(project.token_usage if resume else None, usage)
+            # The stage is the node that raised, not the siblings that were running next to it.
+            update_project_status(db, project, status="failed", stage=get_failed_stage(inner_e), error=str(inner_e))
+            metrics_service.observe_pipeline("failed", time.perf_counter() - started)
+            return None
     except Exception as outer_e:
-        logging.error(f"Error creating project: {outer_e}")
+        logging.error(f"Error running Project-{project_id} workflow: {outer_e}")
         #run.record_exception(outer_e)
         return None
+    finally:
+        db.close()
     
+# Function to continue a failed or interrupted project from its last good stage
+def resume_project_pipeline(project_id: int):
+    return run_project_pipeline(project_id, resume=True)
+
 # Function to get a project by ID
 def get_project(db: Session, project_id: int):
     # with LangChainTracer("get_project",project_name="AI-Frontend-Generation11223") as run:
     return db.query(Project).filter(Project.id == project_id).first()
 
+# Function to read the SRS text of a project, from the blob store or, for older projects, from the srs_content column
+def get_srs_content(db: Session, project: Project) -> Optional[str]:
+    if project.srs_blob_sha:
+        return blob_service.get_text(db, project.srs_blob_sha)
+    return project.srs_content
+
+# Function to read the SRS texts of many projects with one blob store query: {project id: text}
+def get_srs_contents(db: Session, projects: List[Project]):
+    contents = blob_service.get_many(db, [project.srs_blob_sha for project in projects if project.srs_blob_sha])
+    return {
+        project.id: contents[project.srs_blob_sha].decode("utf-8") if project.srs_blob_sha else project.srs_content
+        for project in projects
+    }
+
+# Function to list projects one page at a time, in id order.
+# Keyset pagination: the page starts after the last id of the previous page, so every page is an index range scan
+# however deep it is. Only the requested fields are loaded. Returns the projects and the cursor of the next page.
+def list_projects(db: Session, after_id: Optional[int] = None, limit: int = 50, statuses: Optional[List[str]] = None,
+                  created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                  fields: Optional[List[str]] = None):
+    fields = fields or PROJECT_LIST_DEFAULT_FIELDS
+    columns = [getattr(Project, field) for field in fields]
+    if "srs_content" in fields:
+        columns.append(Project.srs_blob_sha)
+    query = db.query(Project).options(load_only(*columns))
+    if after_id is not None:
+        query = query.filter(Project.id > after_id)
+    if statuses:
+        query = query.filter(Project.status.in_(statuses))
+    if created_after is not None:
+        query = query.filter(Project.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(Project.created_at < created_before)
+    # One extra row tells whether there is a next page.
+    projects = query.order_by(Project.id).limit(limit + 1).all()
+    next_after_id = projects[limit - 1].id if len(projects) > limit else None
+    return projects[:limit], next_after_id
+
 # Function to extract text from a DOCX file
 def extract_text_from_docx(file_content: bytes):
     # with LangChainTracer("extract_text_from_docx",project_name="AI-Frontend-Generation11223") as run:
     doc = docx.Document(io.BytesIO(file_content))
     text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
     return text
+
+# Function to extract the text of a DOCX file and split it into sections, using the Heading styles as section starts
+def extract_srs_from_docx(file_content: bytes):
+    doc = docx.Document(io.BytesIO(file_content))
+    text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+    headings = [paragraph.text for paragraph in doc.paragraphs if paragraph.style is not None and paragraph.style.name.startswith("Heading")]
+    return text, srs_index_service.split_sections(text, headings)
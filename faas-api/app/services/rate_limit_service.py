@@ -0,0 +1,359 @@
+## Client-side rate limiting for LLM calls.
+## All LLM calls of the process go through one scheduler with token buckets for the provider's requests-per-minute
+## and tokens-per-minute quotas. Waiting calls are admitted by priority (interactive analysis before documentation)
+## and failed calls are retried with jittered exponential backoff, honoring the provider's retry-after.
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+from app.settings import load_environment
+from app.services import metrics_service
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Provider quotas of the API key (Groq free tier defaults), shared by every project running in this process.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "7000"))
+# Completion tokens reserved per call until the actual usage is known.
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "512"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60.0"))
+
+# Lower runs first. Analysis blocks everything after it, documentation blocks nothing.
+STAGE_PRIORITIES = {
+    "analyze_screenshot": 0,
+    "analyze_srs": 0,
+    "generate_angular_setup": 1,
+    "generate_ui_components": 1,
+    "generate_api_integration": 2,
+    "generate_ui_tests": 2,
+    "generate_frontend_dockerfile": 2,
+    "validate_ui": 2,
+    "generate_documentation": 3,
+}
+DEFAULT_PRIORITY = 2
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute, holding at most capacity tokens."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount tokens are available (0 if they are available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Charges (positive) or refunds (negative) tokens after the fact, e.g. once the real usage is known."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class _ThreadWaiter:
+    """A blocking call waiting for admission."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def wake(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    def wait(self, timeout: Optional[float]):
+        self._event.wait(timeout)
+
+
+class _AsyncWaiter:
+    """A coroutine waiting for admission on its event loop; it can be woken from any thread."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def wake(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # The loop is closed, its waiter is gone.
+            pass
+
+    def clear(self):
+        self._event.clear()
+
+    async def wait(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RateLimitScheduler:
+    """
+    Admits LLM calls in priority order (then arrival order) as soon as both the request and the token bucket allow.
+
+    Every waiter sleeps on its own event: threads on a threading.Event, coroutines on an asyncio.Event of their loop,
+    so waiting coroutines take no thread. Only the first in line waits for the buckets to refill (with a timeout);
+    it is woken again when the line or the buckets change, and the next one when it is admitted or leaves.
+    Tokens are only taken at admission, so a waiter that is cancelled or interrupted leaves without taking any.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+    def _enqueue(self, waiter, priority: int):
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+
+    def _remove(self, waiter):
+        # Called with the lock held. The new first in line recomputes its wait.
+        self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+        heapq.heapify(self._queue)
+        self._wake_first()
+
+    def _wake_first(self):
+        if self._queue:
+            self._queue[0][2].wake()
+
+    def _try_admit(self, waiter, tokens: int) -> Optional[float]:
+        """Admits the waiter if it is first in line and the buckets allow: returns 0 when admitted,
+        the seconds to wait for the buckets when it is first in line, None when it is not."""
+        with self._lock:
+            if self._queue[0][2] is not waiter:
+                return None
+            now = time.monotonic()
+            wait = max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._remove(waiter)
+            return 0.0
+
+    def _leave(self, waiter):
+        with self._lock:
+            if any(entry[2] is waiter for entry in self._queue):
+                self._remove(waiter)
+
+    def acquire(self, tokens: int, priority: int = DEFAULT_PRIORITY):
+        """Blocks until the call may be sent."""
+        waiter = _ThreadWaiter()
+        self._enqueue(waiter, priority)
+        try:
+            while True:
+                # Cleared before checking, so a wake-up arriving in between is not lost.
+                waiter.clear()
+                wait = self._try_admit(waiter, tokens)
+                if wait == 0:
+                    return
+                waiter.wait(wait)
+        finally:
+            self._leave(waiter)
+
+    async def aacquire(self, tokens: int, priority: int = DEFAULT_PRIORITY):
+        """Waits until the call may be sent, without blocking the event loop or a thread."""
+        waiter = _AsyncWaiter()
+        self._enqueue(waiter, priority)
+        try:
+            while True:
+                waiter.clear()
+                wait = self._try_admit(waiter, tokens)
+                if wait == 0:
+                    return
+                await waiter.wait(wait)
+        finally:
+            # On cancellation the waiter leaves the line; it took no tokens.
+            self._leave(waiter)
+
+    def queue_depth(self) -> int:
+        """Number of calls waiting for admission."""
+        with self._lock:
+            return len(self._queue)
+
+    def adjust_tokens(self, amount: int):
+        with self._lock:
+            self.tokens.adjust(amount)
+            self._wake_first()
+
+    def pause(self, seconds: float):
+        """Holds back every call for seconds, e.g. after the provider answered 429 with a retry-after."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._wake_first()
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+"""
+    Returns the process-wide scheduler.
+"""
+def get_scheduler() -> RateLimitScheduler:
+    """Returns the process-wide scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+        return _scheduler
+
+
+metrics_service.LLM_QUEUE_DEPTH.set_function(lambda: get_scheduler().queue_depth())
+
+
+def get_priority(stage: str) -> int:
+    return STAGE_PRIORITIES.get(stage, DEFAULT_PRIORITY)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+"""
+    Reads the retry-after delay (seconds) of a provider error, if it has one.
+"""
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Reads the retry-after delay of a provider error, if it has one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+"""
+    Checks whether an LLM call failed for a transient reason (rate limit, overload, connection problem).
+"""
+def is_retryable(error: Exception) -> bool:
+    """Checks whether an LLM call failed for a transient reason."""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name or isinstance(error, (TimeoutError, ConnectionError))
+
+
+"""
+    Returns the delay before retry number attempt (0-based): the provider's retry-after if given,
+    else exponential backoff with full jitter.
+"""
+def get_backoff(attempt: int, error: Exception) -> float:
+    """Returns the delay before a retry."""
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        # A little jitter so waiting callers do not all retry at the same instant.
+        return retry_after + random.uniform(0, LLM_BACKOFF_BASE)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _on_failure(scheduler: RateLimitScheduler, stage: str, attempt: int, error: Exception) -> float:
+    delay = get_backoff(attempt, error)
+    metrics_service.record_retry(stage, str(_status_code(error) or type(error).__name__))
+    if _status_code(error) == 429:
+        # The quota is exhausted for everyone, not just for this call.
+        scheduler.pause(delay)
+    logging.warning(f"{stage}: LLM call failed ({error}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s.")
+    return delay
+
+
+"""
+    Runs an LLM call through the scheduler, retrying transient failures.
+
+    Args:
+        fn (Callable): Sends the request and returns the response.
+        stage (str): The pipeline stage, selects the priority.
+        prompt_tokens (int): Token estimate of the prompt; the completion estimate is added.
+
+    Returns:
+        The response of fn.
+"""
+def call(fn: Callable, stage: str, prompt_tokens: int):
+    """Runs an LLM call through the scheduler, retrying transient failures."""
+    if not LLM_RATE_LIMIT_ENABLED:
+        return fn()
+    scheduler = get_scheduler()
+    reserved = prompt_tokens + LLM_COMPLETION_TOKEN_ESTIMATE
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        waiting_since = time.monotonic()
+        scheduler.acquire(reserved, get_priority(stage))
+        metrics_service.record_queue_wait(stage, time.monotonic() - waiting_since)
+        try:
+            response = fn()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            time.sleep(_on_failure(scheduler, stage, attempt, e))
+            continue
+        _settle(scheduler, response, reserved)
+        return response
+
+
+"""
+    Async version of call(), for coroutine LLM calls. Waiting for admission takes neither the event loop nor a thread.
+"""
+async def acall(fn: Callable, stage: str, prompt_tokens: int):
+    """Async version of call()."""
+    if not LLM_RATE_LIMIT_ENABLED:
+        return await fn()
+    scheduler = get_scheduler()
+    reserved = prompt_tokens + LLM_COMPLETION_TOKEN_ESTIMATE
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        waiting_since = time.monotonic()
+        await scheduler.aacquire(reserved, get_priority(stage))
+        metrics_service.record_queue_wait(stage, time.monotonic() - waiting_since)
+        try:
+            response = await fn()
+        except asyncio.CancelledError:
+            # No usage is reported for a cancelled call: give its reservation back to the other callers.
+            scheduler.adjust_tokens(-reserved)
+            raise
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            await asyncio.sleep(_on_failure(scheduler, stage, attempt, e))
+            continue
+        _settle(scheduler, response, reserved)
+        return response
+
+
+def _settle(scheduler: RateLimitScheduler, response, reserved: int):
+    # Replace the reservation by the provider-reported usage when it is known.
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens"):
+        scheduler.adjust_tokens(usage["total_tokens"] - reserved)
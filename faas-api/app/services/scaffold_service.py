@@ -0,0 +1,161 @@
+## Deterministic Angular setup plan.
+## The generate_angular_setup prompt asks the LLM for commands, package.json scripts, dependencies and a folder
+## structure that are fixed for every project. Only the state management and styling choices depend on the
+## analysis, so the plan is synthesized here from a template and the LLM is only used when those cannot be read.
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+from app.services.workspace_service import ANGULAR_PROJECT_NAME
+
+logging.basicConfig(level=logging.INFO)
+
+# Keep in sync with the generate_angular_setup prompt.
+PACKAGE_SCRIPTS = {
+    "ng": "ng",
+    "start": "ng serve",
+    "build": "ng build",
+    "watch": "ng build --watch --configuration development",
+    "test": "ng test",
+    "json-server": "json-server --watch db.json --port 3000",
+}
+
+DEPENDENCIES = {
+    "@angular/animations": "^17.3.0",
+    "@angular/cdk": "^17.3.10",
+    "@angular/common": "^17.3.0",
+    "@angular/compiler": "^17.3.0",
+    "@angular/core": "^17.3.0",
+    "@angular/forms": "^17.3.0",
+    "@angular/material": "^17.3.10",
+    "@angular/platform-browser": "^17.3.0",
+    "@angular/platform-browser-dynamic": "^17.3.0",
+    "@angular/platform-server": "^17.3.0",
+    "@angular/router": "^17.3.0",
+    "@angular/ssr": "^17.3.8",
+    "apexcharts": "^4.5.0",
+    "chart.js": "^4.4.8",
+    "express": "^4.18.2",
+    "leaflet": "^1.9.4",
+    "material-icons": "^1.13.14",
+    "ngx-apexcharts": "^0.7.0",
+    "rxjs": "~7.8.0",
+    "tslib": "^2.3.0",
+    "zone.js": "~0.14.3",
+}
+
+DEV_DEPENDENCIES = {
+    "@angular-devkit/build-angular": "^17.3.8",
+    "@angular/cli": "^17.3.8",
+    "@angular/compiler-cli": "^17.3.0",
+    "@types/express": "^4.17.17",
+    "@types/jasmine": "~5.1.0",
+    "@types/jest": "^29.5.14",
+    "@types/leaflet": "^1.9.16",
+    "@types/node": "^18.18.0",
+    "jasmine-core": "~5.1.0",
+    "json-server": "^1.0.0-beta.3",
+    "karma": "~6.4.0",
+    "karma-chrome-launcher": "~3.2.0",
+    "karma-coverage": "~2.2.0",
+    "karma-jasmine": "~5.1.0",
+    "karma-jasmine-html-reporter": "~2.1.0",
+    "typescript": "~5.4.2",
+}
+
+NGRX_PACKAGES = ["@ngrx/store", "@ngrx/effects", "@ngrx/entity", "@ngrx/router-store"]
+
+FOLDERS = [
+    "src/app/components",
+    "src/app/pages",
+    "src/app/services",
+    "src/app/state",
+    "src/app/assets",
+    "src/app/styles",
+    "src/tests",
+    "docs",
+]
+
+STYLE_EXTENSIONS = ["scss", "sass", "less", "css"]
+
+
+"""
+    Reads the state management choice from the analysis results.
+
+    Returns:
+        str or None: "ngrx", "services", or None if the analysis does not say.
+"""
+def get_state_management(analysis_results: Dict[str, Any]) -> Optional[str]:
+    """Reads the state management choice from the analysis results."""
+    value = json.dumps(analysis_results.get("state_management") or "").lower()
+    if "ngrx" in value or "redux" in value or "store" in value:
+        return "ngrx"
+    if "service" in value or "rxjs" in value or "signal" in value:
+        return "services"
+    return None
+
+
+"""
+    Reads the stylesheet format from the analysis results. SCSS is the default the prompt asks for.
+
+    Returns:
+        str or None: The stylesheet extension, or None if the analysis has no styling section at all.
+"""
+def get_style(analysis_results: Dict[str, Any]) -> Optional[str]:
+    """Reads the stylesheet format from the analysis results."""
+    styling = analysis_results.get("styling")
+    if not styling:
+        return None
+    value = json.dumps(styling).lower()
+    for extension in STYLE_EXTENSIONS:
+        if re.search(rf"\b{extension}\b", value):
+            return extension
+    return "scss"
+
+
+"""
+    Builds the Angular setup plan (commands, package.json and folder structure) without an LLM call.
+
+    Args:
+        analysis_results (Dict[str, Any]): The analysis results of analyze_srs.
+
+    Returns:
+        str or None: The plan in the markdown format execute_angular_setup reads, or None if
+                     the state management or styling cannot be determined and the LLM has to decide.
+"""
+def build_setup_plan(analysis_results: Dict[str, Any]) -> Optional[str]:
+    """Builds the Angular setup plan without an LLM call."""
+    analysis_results = analysis_results or {}
+    state_management = get_state_management(analysis_results)
+    style = get_style(analysis_results)
+    if not state_management or not style:
+        logging.info(f"Setup plan needs the LLM (state management: {state_management}, style: {style}).")
+        return None
+
+    commands: List[str] = [
+        f"ng new {ANGULAR_PROJECT_NAME} --skip-git --routing --style={style}",
+        f"cd {ANGULAR_PROJECT_NAME}",
+        "ng add @angular/material",
+    ]
+    if state_management == "ngrx":
+        commands += [f"ng add {package}" for package in NGRX_PACKAGES]
+    commands += [f"mkdir -p {folder}" for folder in FOLDERS if state_management == "ngrx" or folder != "src/app/state"]
+
+    package_json = {"scripts": PACKAGE_SCRIPTS, "dependencies": DEPENDENCIES, "devDependencies": DEV_DEPENDENCIES}
+
+    return "\n".join([
+        f"# Angular 17 setup for {ANGULAR_PROJECT_NAME}",
+        "",
+        f"State management: {'NgRx' if state_management == 'ngrx' else 'Services-based (RxJS)'}, styles: {style.upper()}, Angular Material.",
+        "",
+        "## Commands",
+        "```bash",
+        *commands,
+        "```",
+        "",
+        "## package.json",
+        "```json",
+        json.dumps(package_json, indent=4),
+        "```",
+    ])
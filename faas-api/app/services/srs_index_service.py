@@ -0,0 +1,179 @@
+## Local SRS section index.
+## The SRS is split into sections once, when the document is uploaded, and a BM25 index over the sections
+## lets every per-component prompt carry only the few sections relevant to it instead of none or the whole SRS.
+## Pure Python, no network.
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from app.settings import load_environment
+from app.services.cache_service import LRUCache
+from app.services import token_service
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+# Number of sections retrieved per prompt, and the token limit of the retrieved context.
+SRS_TOP_K = int(os.getenv("SRS_TOP_K", "3"))
+SRS_CONTEXT_TOKENS = int(os.getenv("SRS_CONTEXT_TOKENS", "1500"))
+# Longer sections are split into chunks of about this size, so one section cannot take the whole context.
+SRS_SECTION_MAX_TOKENS = int(os.getenv("SRS_SECTION_MAX_TOKENS", "400"))
+
+# "1. Overview", "2.3 Login Page", "# Dashboard", "Section 4: Reports"
+HEADING_PATTERN = re.compile(r"^(#{1,6}\s+\S|\d+(\.\d+)*\.?\s+[A-Za-z]|section\s+\d+)", re.IGNORECASE)
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "from", "will", "shall", "should", "must", "can", "all",
+    "any", "each", "has", "have", "not", "use", "user", "users", "into", "when", "which", "their", "its", "be",
+    "is", "of", "to", "in", "on", "an", "or", "by", "as", "at", "it", "a",
+}
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_indexes = LRUCache(32)
+
+
+"""
+    Splits text into lower-case index terms (kebab / camel / snake case names are split into words).
+"""
+def tokenize(text: str) -> List[str]:
+    """Splits text into lower-case index terms."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text or ""))
+    return [term for term in re.split(r"[^a-z0-9]+", text.lower()) if len(term) >= 2 and term not in STOPWORDS]
+
+
+def _is_heading(line: str) -> bool:
+    return len(line) <= 120 and bool(HEADING_PATTERN.match(line))
+
+
+def _chunk(title: str, paragraphs: List[str]) -> List[Dict[str, str]]:
+    chunks, current, used = [], [], 0
+    for paragraph in paragraphs:
+        tokens = token_service.count_tokens(paragraph)
+        if current and used + tokens > SRS_SECTION_MAX_TOKENS:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(paragraph)
+        used += tokens
+    if current or not chunks:
+        chunks.append(current)
+    return [{"title": title, "text": "\n".join([title, *chunk]).strip()} for chunk in chunks]
+
+
+"""
+    Splits an SRS document into sections.
+
+    A section starts at a heading line: a numbered heading ("2.1 Login"), a markdown heading, or one of the
+    headings passed in (e.g. paragraphs with a Heading style in the DOCX). Text before the first heading
+    becomes an "Introduction" section. Sections longer than SRS_SECTION_MAX_TOKENS are split into chunks.
+
+    Args:
+        text (str): The SRS text, one paragraph per line.
+        headings (Iterable[str]): Paragraphs known to be headings.
+
+    Returns:
+        List[Dict[str, str]]: [{"title": str, "text": str}] in document order.
+"""
+def split_sections(text: str, headings: Optional[Iterable[str]] = None) -> List[Dict[str, str]]:
+    """Splits an SRS document into sections."""
+    headings = {heading.strip() for heading in headings or [] if heading.strip()}
+    sections, title, paragraphs = [], "Introduction", []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line in headings or _is_heading(line):
+            if paragraphs or title != "Introduction":
+                sections += _chunk(title, paragraphs)
+            title, paragraphs = line, []
+        else:
+            paragraphs.append(line)
+    if paragraphs or title != "Introduction":
+        sections += _chunk(title, paragraphs)
+    return sections
+
+
+class SectionIndex:
+    """Okapi BM25 index over SRS sections."""
+
+    def __init__(self, sections: List[Dict[str, str]]):
+        self.sections = sections
+        self.term_counts = [Counter(tokenize(section["text"])) for section in sections]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(sections)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def score(self, query_terms: List[str]) -> List[float]:
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            for term in query_terms:
+                frequency = counts.get(term)
+                if not frequency:
+                    continue
+                normalization = BM25_K1 * (1 - BM25_B + BM25_B * length / (self.average_length or 1))
+                score += self.idf[term] * frequency * (BM25_K1 + 1) / (frequency + normalization)
+            scores.append(score)
+        return scores
+
+    def search(self, query: str, k: int = SRS_TOP_K) -> List[int]:
+        """Returns the indexes of the k best matching sections, best first."""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        scores = self.score(query_terms)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: (-scores[i], i))
+        return ranked[:k]
+
+
+"""
+    Returns the (cached) index of a list of sections.
+"""
+def get_index(sections: List[Dict[str, str]]) -> SectionIndex:
+    """Returns the (cached) index of a list of sections."""
+    key = hashlib.sha256(json.dumps(sections, sort_keys=True).encode("utf-8")).hexdigest()
+    index = _indexes.get(key)
+    if index is None:
+        index = SectionIndex(sections)
+        _indexes.set(key, index)
+    return index
+
+
+"""
+    Retrieves the SRS sections most relevant to a query, formatted for a prompt.
+
+    Args:
+        sections (List[Dict[str, str]]): The sections of split_sections.
+        query: What the prompt is about (component name, details ...), any value is converted to text.
+        k (int): Maximum number of sections. Defaults to SRS_TOP_K.
+        max_tokens (int): Token limit of the returned text. Defaults to SRS_CONTEXT_TOKENS.
+
+    Returns:
+        str: The selected sections in document order, or the beginning of the SRS when no section matches.
+"""
+def retrieve(sections: List[Dict[str, str]], query, k: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+    """Retrieves the SRS sections most relevant to a query, formatted for a prompt."""
+    if not sections:
+        return ""
+    max_tokens = max_tokens or SRS_CONTEXT_TOKENS
+    query = query if isinstance(query, str) else json.dumps(query, default=str)
+    ranked = get_index(sections).search(query, k or SRS_TOP_K)
+    if not ranked:
+        return token_service.truncate_to_tokens(sections[0]["text"], max_tokens)
+
+    selected, used = [], 0
+    for i in ranked:
+        tokens = token_service.count_tokens(sections[i]["text"])
+        if selected and used + tokens > max_tokens:
+            continue
+        selected.append(i)
+        used += tokens
+    return token_service.truncate_to_tokens("\n\n".join(sections[i]["text"] for i in sorted(selected)), max_tokens)
@@ -0,0 +1,353 @@
+## Golden Angular workspace template.
+## The scaffold created by `ng new project_root` + the `ng add` libraries is identical for every project,
+## so it is built once per template version and cloned into each project workspace (reflink, hardlink or copy)
+## instead of re-running minutes of npm installs. LLM generated files are written on top afterwards.
+## A failed build is recorded next to the template and only retried after an exponential backoff.
+##
+## Prebuild the template (e.g. while building the API image) with: python -m app.services.template_service
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Optional
+from app.settings import load_environment
+from app.services import command_service
+from app.services.workspace_service import ANGULAR_PROJECT_NAME
+
+try:
+    import fcntl  # cross-process build lock, not available on Windows
+except ImportError:
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+TEMPLATE_ENABLED = os.getenv("TEMPLATE_ENABLED", "true").lower() == "true"
+TEMPLATE_ROOT = os.path.abspath(os.getenv("TEMPLATE_ROOT", ".cache/angular_templates"))
+# auto: reflink when the filesystem supports it, otherwise hardlink node_modules and copy the rest.
+TEMPLATE_CLONE_MODE = os.getenv("TEMPLATE_CLONE_MODE", "auto")
+# Maximum run time of the whole build.
+TEMPLATE_BUILD_TIMEOUT = int(os.getenv("TEMPLATE_BUILD_TIMEOUT", "1800"))
+# How long a project waits for a build running in another thread or process before scaffolding itself.
+TEMPLATE_LOCK_WAIT = float(os.getenv("TEMPLATE_LOCK_WAIT", "60"))
+# After a failed build, no project retries it for this many seconds, doubled after each further failure.
+TEMPLATE_RETRY_AFTER = int(os.getenv("TEMPLATE_RETRY_AFTER", "300"))
+TEMPLATE_RETRY_AFTER_MAX = int(os.getenv("TEMPLATE_RETRY_AFTER_MAX", str(6 * 3600)))
+# Bump to force a rebuild of the golden workspace (e.g. after an Angular CLI upgrade).
+TEMPLATE_VERSION = os.getenv("TEMPLATE_VERSION", "1")
+
+NG_NEW_COMMAND = f"ng new {ANGULAR_PROJECT_NAME} --skip-git --routing --style=scss --defaults"
+NG_ADD_PACKAGES = [
+    "@angular/material",
+    "@ngrx/store",
+    "@ngrx/effects",
+    "@ngrx/entity",
+    "@ngrx/router-store",
+]
+
+# Values `ng new --defaults` uses for the options that change the generated workspace.
+NG_NEW_DEFAULTS = {
+    "style": "css",
+    "routing": "true",
+    "standalone": "true",
+    "ssr": "false",
+    "strict": "true",
+    "inline-style": "false",
+    "inline-template": "false",
+    "skip-tests": "false",
+    "prefix": "app",
+    "view-encapsulation": "Emulated",
+}
+# Options that do not change the files of the generated Angular project.
+NG_NEW_IGNORED_OPTIONS = {"defaults", "interactive", "skip-git", "skip-install", "verbose", "commit", "package-manager"}
+NG_NEW_ALIASES = {"-g": "skip-git", "-S": "skip-tests", "-s": "inline-style", "-t": "inline-template", "-p": "prefix",
+                  "-c": "collection", "-d": "dry-run"}
+
+_build_lock = threading.Lock()
+
+
+"""
+    Parses the options of an `ng new` command into a normalized dict: kebab-case names, "true" / "false" for
+    boolean flags (--no-x is x=false), with the ng new defaults filled in and the options that do not change the
+    generated project left out.
+
+    Args:
+        command (str): The `ng new` command line.
+
+    Returns:
+        Dict[str, str]: Option name -> value.
+"""
+def ng_new_options(command: str) -> Dict[str, str]:
+    """Parses the options of an `ng new` command into a normalized dict."""
+    options = dict(NG_NEW_DEFAULTS)
+    parts = shlex.split(command)[3:]
+    i = 0
+    while i < len(parts):
+        part = parts[i]
+        i += 1
+        if not part.startswith("-"):
+            continue
+        name, separator, value = part.partition("=")
+        name = NG_NEW_ALIASES.get(name, name.lstrip("-"))
+        name = re.sub(r"([a-z0-9])([A-Z])", r"\1-\2", name).lower()
+        if not separator:
+            if name.startswith("no-"):
+                name, value = name[3:], "false"
+            elif i < len(parts) and not parts[i].startswith("-"):
+                value = parts[i]
+                i += 1
+            else:
+                value = "true"
+        options[name] = value.lower() if value.lower() in ("true", "false") else value
+    return {name: value for name, value in options.items() if name not in NG_NEW_IGNORED_OPTIONS}
+
+
+"""
+    Returns the version key of the golden workspace, derived from the scaffold commands and every ng new option.
+"""
+def get_template_key() -> str:
+    """Returns the version key of the golden workspace."""
+    spec = {"version": TEMPLATE_VERSION, "ng_new": ng_new_options(NG_NEW_COMMAND), "ng_add": NG_ADD_PACKAGES}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def get_template_path() -> str:
+    return os.path.join(TEMPLATE_ROOT, get_template_key(), ANGULAR_PROJECT_NAME)
+
+
+def _is_built(template_dir: str) -> bool:
+    return os.path.exists(os.path.join(template_dir, ".complete"))
+
+
+"""
+    Builds the golden workspace if it does not exist yet.
+
+    Only one thread or process builds; the others wait for it up to TEMPLATE_LOCK_WAIT seconds, then scaffold their
+    project themselves. A failed build is not retried before its backoff expires (see _record_failure).
+
+    Returns:
+        str or None: The path of the template Angular project, or None if it is not available.
+"""
+def ensure_template() -> Optional[str]:
+    """Builds the golden workspace if it does not exist yet."""
+    template_dir = os.path.join(TEMPLATE_ROOT, get_template_key())
+    if _is_built(template_dir):
+        return get_template_path()
+    if command_service.COMMAND_DRY_RUN or _in_backoff(template_dir):
+        return None
+
+    os.makedirs(TEMPLATE_ROOT, exist_ok=True)
+    if not _build_lock.acquire(timeout=TEMPLATE_LOCK_WAIT):
+        logging.info("Angular workspace template is being built, not waiting for it.")
+        return None
+    try:
+        with open(template_dir + ".lock", "w") as lock_file:
+            if fcntl and not _flock(lock_file, TEMPLATE_LOCK_WAIT):
+                logging.info("Angular workspace template is being built by another process, not waiting for it.")
+                return None
+            # Another thread or process may have finished (or failed) the build while we waited for the lock.
+            if _is_built(template_dir):
+                return get_template_path()
+            if _in_backoff(template_dir):
+                return None
+            if not _build(template_dir):
+                return None
+    finally:
+        _build_lock.release()
+
+    logging.info(f"Angular workspace template ready: {get_template_path()}")
+    return get_template_path()
+
+
+def _build(template_dir: str) -> bool:
+    build_dir = f"{template_dir}.build-{os.getpid()}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    deadline = time.monotonic() + TEMPLATE_BUILD_TIMEOUT
+    try:
+        logging.info(f"Building Angular workspace template {get_template_key()} ...")
+        _run(NG_NEW_COMMAND, build_dir, deadline)
+        project_dir = os.path.join(build_dir, ANGULAR_PROJECT_NAME)
+        for package in NG_ADD_PACKAGES:
+            _run(f"ng add {package} --skip-confirmation --defaults", project_dir, deadline)
+        with open(os.path.join(build_dir, ".complete"), "w") as f:
+            f.write(get_template_key())
+        shutil.rmtree(template_dir, ignore_errors=True)
+        os.rename(build_dir, template_dir)
+    except Exception as e:
+        logging.error(f"Error building Angular workspace template: {e}")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        _record_failure(template_dir, e)
+        return False
+    _clear_failures(template_dir)
+    return True
+
+
+def _flock(lock_file, wait: float) -> bool:
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(1)
+
+
+def _failure_path(template_dir: str) -> str:
+    return template_dir + ".failed"
+
+
+def _read_failures(template_dir: str) -> Dict:
+    try:
+        with open(_failure_path(template_dir), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _in_backoff(template_dir: str) -> bool:
+    failures = _read_failures(template_dir)
+    if failures and time.time() < failures.get("retry_at", 0):
+        logging.info(f"Angular workspace template build failed {failures['failures']} time(s), "
+                     f"not retried before {time.ctime(failures['retry_at'])}.")
+        return True
+    return False
+
+
+def _record_failure(template_dir: str, error: Exception):
+    # Exponential backoff shared by every process: the next build is attempted after retry_at.
+    count = _read_failures(template_dir).get("failures", 0) + 1
+    retry_after = min(TEMPLATE_RETRY_AFTER * 2 ** (count - 1), TEMPLATE_RETRY_AFTER_MAX)
+    with open(_failure_path(template_dir), "w") as f:
+        json.dump({"failures": count, "retry_at": time.time() + retry_after, "error": str(error)[-2000:]}, f)
+
+
+def _clear_failures(template_dir: str):
+    if os.path.exists(_failure_path(template_dir)):
+        os.remove(_failure_path(template_dir))
+
+
+"""
+    Clones the golden workspace into a project workspace as <workspace_path>/project_root.
+
+    Args:
+        workspace_path (str): The project workspace.
+
+    Returns:
+        bool: True if the template was cloned, False if the caller has to scaffold the project itself.
+"""
+def clone_template(workspace_path: str) -> bool:
+    """Clones the golden workspace into a project workspace."""
+    if not TEMPLATE_ENABLED:
+        return False
+    template_path = ensure_template()
+    if not template_path:
+        return False
+
+    destination = os.path.join(workspace_path, ANGULAR_PROJECT_NAME)
+    shutil.rmtree(destination, ignore_errors=True)
+    try:
+        if TEMPLATE_CLONE_MODE in ("auto", "reflink") and _reflink_copy(template_path, destination):
+            mode = "reflink"
+        elif TEMPLATE_CLONE_MODE == "copy":
+            shutil.copytree(template_path, destination, symlinks=True)
+            mode = "copy"
+        else:
+            shutil.copytree(template_path, destination, symlinks=True, copy_function=_hardlink_node_modules)
+            mode = "hardlink"
+    except Exception as e:
+        logging.error(f"Error cloning Angular workspace template: {e}")
+        shutil.rmtree(destination, ignore_errors=True)
+        return False
+
+    logging.info(f"Cloned Angular workspace template into {destination} ({mode}).")
+    return True
+
+
+"""
+    Checks whether an `ng new` command creates the same workspace as the template (same options, see ng_new_options).
+"""
+def matches(command: str) -> bool:
+    """Checks whether an `ng new` command creates the same workspace as the template."""
+    try:
+        return ng_new_options(command) == ng_new_options(NG_NEW_COMMAND)
+    except ValueError:
+        return False
+
+
+"""
+    Checks whether an `ng add` command only installs a library the template already contains.
+"""
+def provides(command: str) -> bool:
+    """Checks whether an `ng add` command only installs a library the template already contains."""
+    parts = shlex.split(command)
+    return len(parts) >= 3 and parts[:2] == ["ng", "add"] and parts[2] in NG_ADD_PACKAGES
+
+
+"""
+    Replaces hardlinked node_modules of a cloned project by a private copy.
+    Must be called before a command that changes dependencies (ng add / npm install),
+    since package managers may rewrite files in place and would otherwise modify the template.
+"""
+def detach_node_modules(project_root: str):
+    """Replaces hardlinked node_modules of a cloned project by a private copy."""
+    node_modules = os.path.join(project_root, "node_modules")
+    marker = os.path.join(project_root, ".template-hardlinks")
+    if not os.path.exists(marker):
+        return
+    private_copy = node_modules + ".detached"
+    shutil.rmtree(private_copy, ignore_errors=True)
+    shutil.copytree(node_modules, private_copy, symlinks=True)
+    shutil.rmtree(node_modules)
+    os.rename(private_copy, node_modules)
+    os.remove(marker)
+
+
+def _reflink_copy(source: str, destination: str) -> bool:
+    try:
+        subprocess.run(["cp", "-a", "--reflink=always", source, destination], check=True, capture_output=True)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(destination, ignore_errors=True)
+        return False
+
+
+def _hardlink_node_modules(source: str, destination: str):
+    # node_modules is never written by the pipeline, so it is shared with the template; everything else is copied.
+    if f"{os.sep}node_modules{os.sep}" in source:
+        try:
+            os.link(source, destination)
+            _mark_hardlinked(destination)
+            return destination
+        except OSError:
+            pass
+    return shutil.copy2(source, destination)
+
+
+def _mark_hardlinked(path: str):
+    project_root = path.split(f"{os.sep}node_modules{os.sep}")[0]
+    marker = os.path.join(project_root, ".template-hardlinks")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+
+
+def _run(command: str, cwd: str, deadline: float):
+    # Through command_service, so a timeout kills the whole process group (ng -> node -> npm).
+    timeout = int(deadline - time.monotonic())
+    if timeout <= 0:
+        raise command_service.CommandError(shlex.split(command), f"template build timed out after {TEMPLATE_BUILD_TIMEOUT}s")
+    command_service.run_command(shlex.split(command), cwd, timeout=timeout)
+
+
+if __name__ == "__main__":
+    ensure_template()
@@ -0,0 +1,193 @@
+## Prompt token accounting and budgets.
+## Counts the tokens of rendered prompts with tiktoken, keeps every stage within its prompt budget by trimming
+## lower-priority context first, and accumulates prompt / completion token usage per stage for the current project.
+
+import contextvars
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from app.settings import load_environment
+from langchain_core.messages import convert_to_messages
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+# Default prompt budget of a stage, leaves room for the completion in an 8k context window.
+# Override per stage with TOKEN_BUDGET_<STAGE>, e.g. TOKEN_BUDGET_VALIDATE_UI=4000.
+TOKEN_BUDGET_DEFAULT = int(os.getenv("TOKEN_BUDGET_DEFAULT", "6000"))
+# Prompt tokens counted for an image part of a multimodal message.
+TOKEN_IMAGE_ESTIMATE = int(os.getenv("TOKEN_IMAGE_ESTIMATE", "1000"))
+TRUNCATION_MARKER = "\n... [truncated {count} tokens]"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+# Usage of the project currently running in this context: stage -> counters. None outside of track_usage().
+_usage: contextvars.ContextVar[Optional[Dict[str, Dict[str, int]]]] = contextvars.ContextVar("token_usage", default=None)
+_usage_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Returns the tiktoken encoding, or False when it cannot be loaded (e.g. offline without a cached BPE file)."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                logging.warning(f"tiktoken encoding {TOKEN_ENCODING} unavailable, estimating tokens: {e}")
+                _encoding = False
+        return _encoding
+
+
+"""
+    Counts the tokens of a text. Falls back to an estimate of 4 characters per token without tiktoken.
+"""
+def count_tokens(text: str) -> int:
+    """Counts the tokens of a text."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+"""
+    Counts the tokens of a prompt: a string, a list of messages or anything a chat model accepts.
+"""
+def count_prompt_tokens(messages) -> int:
+    """Counts the tokens of a prompt."""
+    if isinstance(messages, str):
+        return count_tokens(messages)
+    try:
+        rendered = convert_to_messages(messages)
+    except Exception:
+        return count_tokens(str(messages))
+    # A few tokens of per-message overhead (role, separators), as in the OpenAI cookbook estimate.
+    return sum(_count_content_tokens(message.content) + 4 for message in rendered)
+
+
+def _count_content_tokens(content) -> int:
+    if isinstance(content, str):
+        return count_tokens(content)
+    total = 0
+    for part in content or []:
+        if isinstance(part, dict) and part.get("type") == "image_url":
+            # Images are billed by size, not by the length of their base64 data.
+            total += TOKEN_IMAGE_ESTIMATE
+        elif isinstance(part, dict):
+            total += count_tokens(part.get("text") or "")
+        else:
+            total += count_tokens(str(part))
+    return total
+
+
+"""
+    Truncates a text to at most max_tokens tokens, marking the cut.
+"""
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncates a text to at most max_tokens tokens."""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    keep = max(max_tokens - count_tokens(TRUNCATION_MARKER.format(count=total)), 0)
+    encoding = _get_encoding()
+    head = encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) if encoding else text[:keep * 4]
+    return head + TRUNCATION_MARKER.format(count=total - keep)
+
+
+"""
+    Returns the prompt token budget of a stage (TOKEN_BUDGET_<STAGE>, defaults to TOKEN_BUDGET_DEFAULT).
+"""
+def get_stage_budget(stage: str) -> int:
+    """Returns the prompt token budget of a stage."""
+    return int(os.getenv(f"TOKEN_BUDGET_{stage.upper()}", TOKEN_BUDGET_DEFAULT))
+
+
+"""
+    Renders a prompt template within the token budget of a stage.
+
+    When the rendered prompt is too large, the variables listed in trim_order are truncated one after another
+    (the first one is the least important) until the prompt fits. Other variables are never changed.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt template.
+        stage (str): The stage name, selects the budget.
+        trim_order (List[str]): Names of the variables that may be trimmed, lowest priority first.
+        budget (int): Overrides the stage budget.
+        **values: The template variables.
+
+    Returns:
+        list: The rendered messages.
+"""
+def format_messages_within_budget(prompt, stage: str, trim_order: List[str], budget: Optional[int] = None, **values):
+    """Renders a prompt template within the token budget of a stage."""
+    budget = budget or get_stage_budget(stage)
+    messages = prompt.format_messages(**values)
+    tokens = count_prompt_tokens(messages)
+    if tokens <= budget:
+        return messages
+
+    for name in trim_order:
+        text = values[name] if isinstance(values[name], str) else str(values[name])
+        excess = tokens - budget
+        values[name] = truncate_to_tokens(text, max(count_tokens(text) - excess, 0))
+        messages = prompt.format_messages(**values)
+        tokens = count_prompt_tokens(messages)
+        logging.info(f"{stage}: trimmed '{name}' to fit the {budget} token budget, prompt is now {tokens} tokens.")
+        if tokens <= budget:
+            break
+    else:
+        logging.warning(f"{stage}: prompt is {tokens} tokens after trimming, over the {budget} token budget.")
+    return messages
+
+
+"""
+    Collects the token usage of every LLM call made in this context (including threads started with a copied context).
+
+    Yields:
+        dict: stage -> {"calls", "cached_calls", "prompt_tokens", "completion_tokens"}, filled while the block runs.
+"""
+@contextmanager
+def track_usage():
+    """Collects the token usage of every LLM call made in this context."""
+    usage: Dict[str, Dict[str, int]] = {}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+"""
+    Adds one LLM call to the usage of the current context, if it is tracked.
+"""
+def record_usage(stage: str, prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False):
+    """Adds one LLM call to the usage of the current context."""
+    usage = _usage.get()
+    if usage is None:
+        return
+    with _usage_lock:
+        counters = usage.setdefault(stage, {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        counters["cached_calls" if cached else "calls"] += 1
+        counters["prompt_tokens"] += prompt_tokens
+        counters["completion_tokens"] += completion_tokens
+
+
+"""
+    Adds two usage dicts (e.g. a resumed run to the usage stored on the project).
+"""
+def merge_usage(left: Optional[Dict[str, Dict[str, int]]], right: Optional[Dict[str, Dict[str, int]]]) -> Dict[str, Dict[str, int]]:
+    """Adds two usage dicts."""
+    merged = {stage: dict(counters) for stage, counters in (left or {}).items()}
+    for stage, counters in (right or {}).items():
+        target = merged.setdefault(stage, {})
+        for name, value in counters.items():
+            target[name] = target.get(name, 0) + value
+    return merged
@@ -0,0 +1,64 @@
+## Per-project workspaces.
+## Every project gets its own directory under WORKSPACES_ROOT and every stage receives explicit paths,
+## so several projects can be generated by one process without sharing (or changing) the working directory.
+
+import logging
+import os
+import shutil
+from app.settings import load_environment
+
+logging.basicConfig(level=logging.INFO)
+
+load_environment()
+
+WORKSPACES_ROOT = os.path.abspath(os.getenv("WORKSPACES_ROOT", "workspaces"))
+# Name of the Angular workspace created by `ng new` inside a project workspace.
+ANGULAR_PROJECT_NAME = "project_root"
+
+
+"""
+    Creates (if needed) and returns the workspace directory of a project.
+
+    Args:
+        project_id (int): The project id.
+
+    Returns:
+        str: The absolute workspace path.
+"""
+def create_workspace(project_id: int) -> str:
+    """Creates (if needed) and returns the workspace directory of a project."""
+    workspace_path = os.path.join(WORKSPACES_ROOT, f"project-{project_id}")
+    os.makedirs(workspace_path, exist_ok=True)
+    return workspace_path
+
+
+"""
+    Returns the Angular project directory (created by `ng new project_root`) of a workspace.
+    Without a workspace the current directory is used, as the stand-alone scripts do.
+"""
+def get_project_root(workspace_path: str = None) -> str:
+    """Returns the Angular project directory of a workspace."""
+    return os.path.join(workspace_path or ".", ANGULAR_PROJECT_NAME)
+
+
+"""
+    Joins a relative path (typically taken from LLM output) to a base directory.
+
+    Raises:
+        ValueError: If the resulting path escapes the base directory.
+"""
+def resolve_path(base_path: str, relative_path: str) -> str:
+    """Joins a relative path to a base directory, refusing paths that escape it."""
+    base = os.path.abspath(base_path)
+    path = os.path.abspath(os.path.join(base, relative_path.strip().strip("'\"")))
+    if path != base and not path.startswith(base + os.sep):
+        raise ValueError(f"Path escapes the workspace: {relative_path}")
+    return path
+
+
+"""
+    Deletes the workspace directory of a project.
+"""
+def delete_workspace(project_id: int):
+    """Deletes the workspace directory of a project."""
+    shutil.rmtree(os.path.join(WORKSPACES_ROOT, f"project-{project_id}"), ignore_errors=True)
@@ -0,0 +1,46 @@
+## Settings shared by the whole application.
+## The .env file is read once per process (load_environment); every module still reads its own tuning knobs with
+## os.getenv. The credentials and model of the external clients (client_service) are validated once in Settings.
+
+import threading
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+_environment_loaded = False
+_environment_lock = threading.Lock()
+
+
+"""
+    Loads the .env file into the process environment, on the first call only.
+    Variables already set in the environment win over the .env file.
+"""
+def load_environment():
+    """Loads the .env file into the process environment, on the first call only."""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    with _environment_lock:
+        if not _environment_loaded:
+            load_dotenv()
+            _environment_loaded = True
+
+
+class Settings(BaseSettings):
+    """Credentials and model of the LLM provider and LangSmith clients (read from GROQ_API_KEY, LANGCHAIN_API_KEY, LLM_MODEL)."""
+
+    groq_api_key: Optional[str] = None
+    langchain_api_key: Optional[str] = None
+    # Model of every LLM call of the pipeline (the vision model also reads the screenshots).
+    llm_model: str = "llama-3.2-11b-vision-preview"
+
+
+"""
+    Returns the process-wide settings, read from the environment on first use.
+"""
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Returns the process-wide settings."""
+    load_environment()
+    return Settings()
@@ -0,0 +1,103 @@
+## Cold start benchmark: time to import the API (app.main) in a fresh interpreter.
+## Every run is a new `python -X importtime` process on a throw-away SQLite database, so nothing is warm but the
+## OS file cache. Reports the median import time, the slowest modules (cumulative and self time) and which of the
+## libraries that should only load on first use (LAZY_MODULES) were imported at startup anyway.
+##
+## Usage (from faas-api):
+##   python -m benchmarks.bench_import --runs 5
+##   python -m benchmarks.bench_import --module app.services.project_service --top 30
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+# Imported by the functions that use them (workflow drawing, perceptual hashing) or by client_service on first use.
+LAZY_MODULES = ["matplotlib", "networkx", "PIL", "langchain_community", "langchain_groq", "groq"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold import time of the API.")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters")
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules listed")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    return parser.parse_args()
+
+
+def make_environment(work_dir: str):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+        "WORKSPACES_ROOT": os.path.join(work_dir, "workspaces"),
+        "GROQ_API_KEY": env.get("GROQ_API_KEY") or "bench",
+        "LANGCHAIN_API_KEY": env.get("LANGCHAIN_API_KEY") or "bench",
+        "LANGCHAIN_TRACING_V2": "false",
+        "PYTHONWARNINGS": "ignore",
+    })
+    return env
+
+
+def parse_importtime(stderr: str):
+    """Returns {module: (self us, cumulative us)} from the -X importtime report."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_once(module: str, env):
+    # The child also lists the lazy modules it ended up importing.
+    code = f"import sys, json, {module}; print(json.dumps(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=APP_DIR, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr), json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    env = make_environment(tempfile.mkdtemp(prefix="bench-import-"))
+
+    runs = [import_once(args.module, env) for _ in range(args.runs)]
+    totals = [modules[args.module][1] / 1e6 for modules, _ in runs]
+    # Per module medians over the runs, so a single slow run does not reorder the list.
+    names = set.intersection(*(set(modules) for modules, _ in runs))
+    medians = {
+        name: (statistics.median(m[name][0] for m, _ in runs), statistics.median(m[name][1] for m, _ in runs))
+        for name in names
+    }
+    lazy_loaded = runs[-1][1]
+
+    print(f"\nimport {args.module}: median {statistics.median(totals):.3f} s, "
+          f"min {min(totals):.3f} s, max {max(totals):.3f} s over {args.runs} runs, {len(runs[-1][0])} modules")
+    for title, index in (("cumulative", 1), ("self", 0)):
+        print(f"\n{'module (by ' + title + ' time)':60} {'ms':>8}")
+        for name, times in sorted(medians.items(), key=lambda item: -item[1][index])[:args.top]:
+            print(f"{name:60} {times[index] / 1000:>8.1f}")
+    print(f"\nlazy modules imported at startup: {', '.join(lazy_loaded) or 'none'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": args.module,
+                "totals": totals,
+                "modules": {name: {"self_us": s, "cumulative_us": c} for name, (s, c) in medians.items()},
+                "lazy_loaded": lazy_loaded,
+            }, f, indent=2)
+    if lazy_loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+## Offline benchmark of the generation pipeline.
+## Runs project_service.create_project + run_project_pipeline end to end on a throw-away SQLite database,
+## with the LLM answered by the replay backend (no network) and the Angular CLI commands in dry-run mode,
+## and reports the wall time, CPU time and peak memory of every stage.
+##
+## Usage (from faas-api):
+##   python -m benchmarks.bench_pipeline --runs 3 --latency 0.2
+##   python -m benchmarks.bench_pipeline --backend record --cassette bench.jsonl   (live Groq calls, records responses)
+##   python -m benchmarks.bench_pipeline --cassette bench.jsonl --latency recorded (replays them)
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MEDIA_DIR = os.path.join(os.path.dirname(BENCH_DIR), "media")
+DEFAULT_SRS = os.path.join(MEDIA_DIR, "SRD frontend.docx")
+DEFAULT_SCREENSHOT = "Test.png"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmark of the generation pipeline.")
+    parser.add_argument("--runs", type=int, default=3, help="number of projects to generate")
+    parser.add_argument("--backend", choices=["replay", "record", "live"], default="replay")
+    parser.add_argument("--cassette", help="cassette of recorded responses (default: empty, every answer is synthetic)")
+    parser.add_argument("--latency", default="0", help='synthetic latency per LLM call in seconds, or "recorded"')
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds added to the latency")
+    parser.add_argument("--components", type=int, default=6, help="number of UI components in synthetic analyses")
+    parser.add_argument("--srs", default=DEFAULT_SRS, help="SRS document (.docx)")
+    parser.add_argument("--screenshot", default=DEFAULT_SCREENSHOT, help="screenshot file name in media/")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    return parser.parse_args()
+
+
+def configure_environment(args, work_dir: str):
+    # Must run before the app modules are imported, they read their settings at import time.
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+        "WORKSPACES_ROOT": os.path.join(work_dir, "workspaces"),
+        "MEDIA_PATH": MEDIA_DIR + os.sep,
+        "LLM_BACKEND": args.backend,
+        "LLM_CASSETTE_PATH": os.path.abspath(args.cassette) if args.cassette else os.path.join(work_dir, "cassette.jsonl"),
+        "LLM_REPLAY_LATENCY": args.latency,
+        "LLM_REPLAY_JITTER": str(args.jitter),
+        "LLM_REPLAY_ON_MISS": "synthetic",
+        "LLM_CACHE_ENABLED": "false",
+        "SCREENSHOT_CACHE_ENABLED": "false",
+        "COMMAND_DRY_RUN": "true",
+        "TEMPLATE_ENABLED": "false",
+        "LANGCHAIN_TRACING_V2": "false",
+    })
+    if args.backend == "replay":
+        os.environ.update({"LLM_RATE_LIMIT_ENABLED": "false", "GROQ_API_KEY": os.getenv("GROQ_API_KEY") or "bench"})
+
+
+def make_responder(component_count: int):
+    """Synthetic answers shaped like real ones, so every stage parses them and does its full work."""
+    components = [f"component-{i}" for i in range(component_count)]
+    analysis = {
+        "ui_components": components,
+        "state_management": "NgRx store",
+        "api_endpoints": [{"path": f"/api/resource-{i}", "method": "GET"} for i in range(max(component_count // 2, 1))],
+        "accessibility": "WCAG 2.1 AA",
+        "styling": "Angular Material, SCSS",
+    }
+
+    def responder(input) -> str:
+        text = str(input)
+        if "Extract UI components, state management" in text:
+            return f"```json\n{json.dumps(analysis)}\n```"
+        if "Generate an Angular component for" in text:
+            name = text.split("Generate an Angular component for:", 1)[-1].split(".", 1)[0].strip()
+            body = "\n".join(f"  field{i}: string = '';" for i in range(40))
+            return (
+                f"{name}.component.ts\n```typescript\nexport class Component {{\n{body}\n}}\n```\n"
+                f"{name}.component.html\n```html\n<mat-card><app-{components[0]}></app-{components[0]}></mat-card>\n```\n"
+                f"{name}.component.scss\n```scss\n:host {{ display: block; }}\n```"
+            )
+        if "Validate the generated Angular component" in text:
+            return "- Missing aria-label on the submit button."
+        return "```typescript\n" + "\n".join(f"// generated line {i}" for i in range(60)) + "\n```"
+    return responder
+
+
+def main():
+    args = parse_args()
+    work_dir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    configure_environment(args, work_dir)
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+    from app.database import Base, engine, SessionLocal
+    from app.models import project  # noqa: F401 (registers the tables)
+    from app.services import client_service, project_service
+    from app.services.common_service import add_stage_listener
+
+    Base.metadata.create_all(bind=engine)
+    responder = make_responder(args.components)
+    model = client_service.get_chat_model()
+    if hasattr(model.llm, "responder"):
+        model.llm.responder = responder
+
+    stages = {}
+    add_stage_listener(lambda stage, timings: stages.setdefault(stage, []).append(timings))
+
+    with open(args.srs, "rb") as f:
+        srs_bytes = f.read()
+
+    runs = []
+    tracemalloc.start()
+    for run in range(args.runs):
+        tracemalloc.reset_peak()
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        db = SessionLocal()
+        try:
+            created = project_service.create_project(db, SimpleNamespace(file=io.BytesIO(srs_bytes)), args.screenshot)
+            project_service.run_project_pipeline(created.id)
+            db.expire_all()
+            status = project_service.get_project(db, created.id).status
+        finally:
+            db.close()
+        runs.append({
+            "wall": time.perf_counter() - wall_started,
+            "cpu": time.process_time() - cpu_started,
+            "peak_memory": tracemalloc.get_traced_memory()[1],
+            "status": status,
+        })
+    tracemalloc.stop()
+
+    results = {
+        "runs": runs,
+        "stages": {
+            stage: {
+                "calls": len(timings),
+                "wall_median": statistics.median(t["wall"] for t in timings),
+                "cpu_median": statistics.median(t["cpu"] for t in timings),
+                "peak_memory_max": max(t["peak_memory"] or 0 for t in timings),
+                "errors": sum(1 for t in timings if t["error"]),
+            }
+            for stage, timings in stages.items()
+        },
+    }
+
+    print(f"\n{'stage':32} {'calls':>5} {'wall ms':>10} {'cpu ms':>10} {'peak KiB':>10} {'errors':>6}")
+    for stage, row in results["stages"].items():
+        print(f"{stage:32} {row['calls']:>5} {row['wall_median'] * 1000:>10.1f} {row['cpu_median'] * 1000:>10.1f} "
+              f"{row['peak_memory_max'] / 1024:>10.0f} {row['errors']:>6}")
+    print(f"\n{'run':>3} {'status':>10} {'wall s':>8} {'cpu s':>8} {'peak MiB':>9}")
+    for i, run in enumerate(runs):
+        print(f"{i:>3} {run['status']:>10} {run['wall']:>8.2f} {run['cpu']:>8.2f} {run['peak_memory'] / 2**20:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if any(run["status"] != "completed" for run in runs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
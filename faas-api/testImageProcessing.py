@@ -9,6 +9,7 @@ import json
 
 from langchain_groq import ChatGroq
 import requests
+from app.services.llm_service import CachedChatModel
 
 from PIL import Image
 
@@ -21,8 +22,8 @@ MEDIA_PATH = os.getenv("MEDIA_PATH")
 
 #client = Groq(api_key=GROQ_API_KEY)
 
-groq_llm = ChatGroq(groq_api_key=GROQ_API_KEY,model="llama-3.2-11b-vision-preview", #"llama-3.3-70b-versatile", #"mistral-saba-24b" or "llama-3.1-8b-instant",
-                    temperature=0)
+groq_llm = CachedChatModel(ChatGroq(groq_api_key=GROQ_API_KEY,model="llama-3.2-11b-vision-preview", #"llama-3.3-70b-versatile", #"mistral-saba-24b" or "llama-3.1-8b-instant",
+                    temperature=0))
 
 def encode_image(screenshot_path):
     screenshot_details:  Dict[str, Any] = {} 
@@ -54,6 +55,7 @@ def get_image_info(encoded_image):
             }
         ],
         model="llama-3.2-11b-vision-preview",
+        stage="analyze_screenshot",
     )
     return response.content#choices[0].message.content
 
@@ -0,0 +1,39 @@
+## Shared test setup.
+## The application reads its configuration when its modules are imported, so every path (database, caches,
+## workspaces) is pointed at a throw-away directory here, before any test imports app.
+
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="faas-api-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    "WORKSPACES_ROOT": os.path.join(TEST_DIR, "workspaces"),
+    "LLM_CACHE_PATH": os.path.join(TEST_DIR, "llm_cache.sqlite3"),
+    "TEMPLATE_ROOT": os.path.join(TEST_DIR, "templates"),
+    "GROQ_API_KEY": "test",
+    "LANGCHAIN_API_KEY": "test",
+    "LANGCHAIN_TRACING_V2": "false",
+    "COMMAND_DRY_RUN": "true",
+})
+
+import pytest
+from app.database import Base, SessionLocal, engine
+from app.models import blob, checkpoint, project, run_log  # noqa: F401, registers the tables
+
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    """A database session; the rows of every table are deleted after the test."""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
@@ -0,0 +1,86 @@
+import random
+import pytest
+from app.models.blob import Blob
+from app.models.project import Project
+from app.services import blob_service
+
+
+SRS = "The system shall let employees apply for leave and managers approve it. " * 40
+
+
+def test_put_and_get_round_trip(db):
+    sha = blob_service.put(db, SRS)
+    db.commit()
+
+    assert sha == blob_service.content_hash(SRS.encode("utf-8"))
+    assert blob_service.get_text(db, sha) == SRS
+    blob = db.get(Blob, sha)
+    assert blob.codec == "zstd"
+    assert blob.size == len(SRS)
+    assert blob.compressed_size == len(blob.data) < blob.size
+
+
+def test_identical_contents_are_stored_once(db):
+    hashes = blob_service.put_many(db, [SRS, "other", SRS])
+    hashes += blob_service.put_many(db, [SRS.encode("utf-8")])
+    db.commit()
+
+    assert hashes[0] == hashes[2] == hashes[3] != hashes[1]
+    assert db.query(Blob).count() == 2
+
+
+def test_small_and_incompressible_contents_are_stored_raw(db):
+    noise = random.Random(0).randbytes(4096)
+    small, incompressible = blob_service.put_many(db, ["tiny", noise])
+    db.commit()
+
+    assert db.get(Blob, small).codec == "raw"
+    assert db.get(Blob, incompressible).codec == "raw"
+    assert blob_service.get(db, incompressible) == noise
+
+
+def test_get_many_returns_stored_hashes_only(db):
+    sha = blob_service.put(db, SRS)
+    db.commit()
+
+    assert blob_service.get_many(db, [sha, sha, "0" * 64]) == {sha: SRS.encode("utf-8")}
+    assert blob_service.get_many(db, []) == {}
+
+
+def test_missing_blob_raises_key_error(db):
+    with pytest.raises(KeyError):
+        blob_service.get(db, "0" * 64)
+
+
+def test_project_artifacts_are_replaced(db):
+    project = Project(srs_content="SRS")
+    db.add(project)
+    db.commit()
+
+    blob_service.save_project_artifacts(db, project.id, {"b.ts": SRS, "a.ts": "export {};"})
+    db.commit()
+    assert blob_service.load_project_artifacts(db, project.id) == {"a.ts": "export {};", "b.ts": SRS}
+
+    blob_service.save_project_artifacts(db, project.id, {"c.ts": SRS})
+    db.commit()
+    assert blob_service.load_project_artifacts(db, project.id) == {"c.ts": SRS}
+    # The content of b.ts is still stored once, now referenced by c.ts.
+    assert db.query(Blob).count() == 2
+
+
+def test_dictionary_compression_round_trip(db, monkeypatch):
+    samples = [
+        f"Requirement {i}: the {topic} screen shall list the {topic} records of the employee with paging.".encode("utf-8")
+        for i, topic in enumerate(["leave", "payroll", "attendance", "holiday", "profile"] * 40)
+    ]
+    monkeypatch.setattr(blob_service, "BLOB_DICTIONARY_SIZE", 4096)
+    dictionary_sha = blob_service.train_dictionary(db, samples)
+    monkeypatch.setattr(blob_service, "BLOB_DICTIONARY_SHA", dictionary_sha)
+
+    content = "Requirement 900: the leave screen shall list the leave records of the employee with paging."
+    sha = blob_service.put(db, content)
+    db.commit()
+    blob_service._dictionaries.clear()
+
+    assert db.get(Blob, sha).codec == blob_service.DICTIONARY_CODEC_PREFIX + dictionary_sha
+    assert blob_service.get_text(db, sha) == content
@@ -0,0 +1,127 @@
+import asyncio
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.types import ERROR, TASKS
+import pytest
+from app.database import SessionLocal
+from app.services.checkpoint_service import SQLAlchemyCheckpointSaver, complete_task_writes
+
+
+@pytest.fixture
+def saver(db):
+    return SQLAlchemyCheckpointSaver(SessionLocal)
+
+
+def make_checkpoint(checkpoint_id: str, **channel_values):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = checkpoint_id
+    checkpoint["channel_values"] = channel_values
+    return checkpoint
+
+
+def thread_config(thread_id: str = "project-1", **configurable):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", **configurable}}
+
+
+def test_put_and_get_tuple_round_trip(saver):
+    first = saver.put(thread_config(), make_checkpoint("0001", srs_content="SRS"), {"step": 0}, {})
+    second = saver.put(first, make_checkpoint("0002", srs_content="SRS", analysis_results={"a": 1}), {"step": 1}, {})
+
+    latest = saver.get_tuple(thread_config())
+    assert latest.config == second
+    assert latest.checkpoint["channel_values"] == {"srs_content": "SRS", "analysis_results": {"a": 1}}
+    assert latest.metadata["step"] == 1
+    assert latest.parent_config["configurable"]["checkpoint_id"] == "0001"
+
+    earlier = saver.get_tuple(first)
+    assert earlier.checkpoint["id"] == "0001"
+    assert earlier.parent_config is None
+
+
+def test_get_tuple_of_unknown_thread(saver):
+    assert saver.get_tuple(thread_config("project-404")) is None
+
+
+def test_list_newest_first_with_before_and_limit(saver):
+    config = thread_config()
+    for checkpoint_id in ("0001", "0002", "0003"):
+        config = saver.put(config, make_checkpoint(checkpoint_id), {"step": int(checkpoint_id)}, {})
+
+    assert [t.checkpoint["id"] for t in saver.list(thread_config())] == ["0003", "0002", "0001"]
+    assert [t.checkpoint["id"] for t in saver.list(thread_config(), limit=2)] == ["0003", "0002"]
+    assert [t.checkpoint["id"] for t in saver.list(thread_config(), before=config)] == ["0002", "0001"]
+    assert [t.checkpoint["id"] for t in saver.list(thread_config(), filter={"step": 2})] == ["0002"]
+
+
+def test_put_writes_are_pending_writes_of_their_checkpoint(saver):
+    config = saver.put(thread_config(), make_checkpoint("0001"), {}, {})
+    saver.put_writes(config, [("ui_components", {"login": {}}), ("errors", ["e"])], "task-1")
+
+    pending = saver.get_tuple(config).pending_writes
+    assert pending == [("task-1", "ui_components", {"login": {}}), ("task-1", "errors", ["e"])]
+
+
+def test_regular_writes_are_kept_and_errors_replaced(saver):
+    config = saver.put(thread_config(), make_checkpoint("0001"), {}, {})
+    saver.put_writes(config, [("ui_components", "first")], "task-1")
+    saver.put_writes(config, [("ui_components", "second")], "task-1")
+    saver.put_writes(config, [(ERROR, "first")], "task-2")
+    saver.put_writes(config, [(ERROR, "second")], "task-2")
+
+    pending = {(task_id, channel): value for task_id, channel, value in saver.get_tuple(config).pending_writes}
+    assert pending[("task-1", "ui_components")] == "first"
+    assert pending[("task-2", ERROR)] == "second"
+
+
+def test_pending_sends_come_from_the_parent_checkpoint(saver):
+    parent = saver.put(thread_config(), make_checkpoint("0001"), {}, {})
+    saver.put_writes(parent, [(TASKS, "send-a"), (TASKS, "send-b")], "task-1")
+    child = saver.put(parent, make_checkpoint("0002"), {}, {})
+
+    assert saver.get_tuple(child).checkpoint["pending_sends"] == ["send-a", "send-b"]
+    assert saver.get_tuple(parent).checkpoint["pending_sends"] == []
+
+
+def test_cancelled_sibling_writes_are_dropped(saver):
+    # A sibling cancelled by a failed parallel branch stored its partial state next to its CancelledError.
+    config = saver.put(thread_config(), make_checkpoint("0001"), {}, {})
+    saver.put_writes(config, [("api_services", {"/users": "code"}), ("join:a+b:c", None)], "finished")
+    saver.put_writes(config, [("ui_tests", {"login": "test"})], "cancelled")
+    saver.put_writes(config, [(ERROR, RuntimeError("cancelled"))], "cancelled")
+
+    pending = [(task_id, channel) for task_id, channel, _ in saver.get_tuple(config).pending_writes]
+    assert ("finished", "api_services") in pending
+    assert ("finished", "join:a+b:c") in pending
+    assert ("cancelled", "ui_tests") not in pending
+    assert ("cancelled", ERROR) in pending
+
+
+def test_complete_task_writes_keeps_special_writes_of_failed_tasks():
+    class Write:
+        def __init__(self, task_id, channel, idx):
+            self.task_id, self.channel, self.idx = task_id, channel, idx
+
+    writes = [Write("ok", "a", 0), Write("failed", "b", 0), Write("failed", ERROR, -1)]
+    assert [(w.task_id, w.channel) for w in complete_task_writes(writes)] == [("ok", "a"), ("failed", ERROR)]
+
+
+def test_delete_thread(saver):
+    config = saver.put(thread_config(), make_checkpoint("0001"), {}, {})
+    saver.put_writes(config, [("a", 1)], "task-1")
+    other = saver.put(thread_config("project-2"), make_checkpoint("0001"), {}, {})
+
+    saver.delete_thread("project-1")
+
+    assert saver.get_tuple(thread_config()) is None
+    assert saver.get_tuple(other) is not None
+
+
+def test_async_api_matches_sync_api(saver):
+    async def run():
+        config = await saver.aput(thread_config(), make_checkpoint("0001", a=1), {}, {})
+        await saver.aput_writes(config, [("b", 2)], "task-1")
+        return await saver.aget_tuple(config), [t.checkpoint["id"] async for t in saver.alist(thread_config())]
+
+    checkpoint_tuple, listed = asyncio.run(run())
+    assert checkpoint_tuple.checkpoint["channel_values"] == {"a": 1}
+    assert checkpoint_tuple.pending_writes == [("task-1", "b", 2)]
+    assert listed == ["0001"]
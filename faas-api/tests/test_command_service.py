@@ -0,0 +1,164 @@
+import os
+import pytest
+from app.services import command_service
+from app.services.command_service import Command, compile_command_plan, split_generate
+
+
+def lines(commands):
+    return [command.line for command in commands]
+
+
+def test_plan_phases():
+    plan = compile_command_plan("""
+```bash
+ng new project_root --style=scss --routing
+cd project_root
+ng add @angular/material
+npm install lodash
+mkdir -p src/app/state
+touch src/app/state/store.ts
+echo "export const API = '/api';" > src/app/api.ts
+ng generate component login
+ng g service api
+```
+""")
+    assert plan.new_workspace.line == "ng new project_root --style=scss --routing"
+    assert not plan.new_workspace.in_project
+    assert lines(plan.serial) == ["ng add @angular/material --skip-confirmation", "npm install lodash"]
+    assert plan.directories == [("src/app/state", True)]
+    assert plan.files == {("src/app/state/store.ts", True): "", ("src/app/api.ts", True): "export const API = '/api';"}
+    assert lines(plan.generate) == ["ng generate component login", "ng g service api"]
+    assert plan.rejected == []
+
+
+def test_commands_before_cd_run_in_the_workspace():
+    plan = compile_command_plan("npm install\ncd project_root\nnpm install")
+    assert [command.in_project for command in plan.serial] == [False, True]
+
+
+def test_prose_and_other_programs_are_ignored():
+    plan = compile_command_plan("Run the following:\n# comment\npython setup.py\n$ ng g c home")
+    assert lines(plan.generate) == ["ng g c home"]
+    assert plan.rejected == []
+
+
+@pytest.mark.parametrize("line", [
+    "ng serve",
+    "ng deploy",
+    "npm run build",
+    "npm publish",
+    "cd /etc",
+    "ng new other_project",
+])
+def test_commands_outside_the_allowlist_are_rejected(line):
+    plan = compile_command_plan(line)
+    assert plan.rejected == [line]
+    assert not plan.serial and not plan.generate and plan.new_workspace is None
+
+
+@pytest.mark.parametrize("line", [
+    "ng g c a; rm -rf /",
+    "ng g c a && ng serve",
+    "npm install | tee log",
+    "ng g c `whoami`",
+    "ng g c $(whoami)",
+    "ng g c a > out",
+    "echo x > $(whoami)",
+    "echo x > a; rm b",
+])
+def test_shell_metacharacters_are_rejected(line):
+    plan = compile_command_plan(line)
+    assert plan.rejected == [line]
+    assert not plan.files and not plan.generate
+
+
+def test_unbalanced_quotes_are_rejected():
+    assert compile_command_plan('ng g c "login').rejected == ['ng g c "login']
+
+
+def test_duplicates_are_dropped():
+    plan = compile_command_plan("ng g c login\nng g c login\nmkdir a\nmkdir a\nng add @ngrx/store\nng add @ngrx/store")
+    assert lines(plan.generate) == ["ng g c login"]
+    assert plan.directories == [("a", False)]
+    assert lines(plan.serial) == ["ng add @ngrx/store --skip-confirmation"]
+
+
+def test_only_the_first_ng_new_is_kept():
+    plan = compile_command_plan("ng new project_root\nng new project_root --style=css")
+    assert plan.new_workspace.line == "ng new project_root"
+    assert plan.rejected == ["ng new project_root --style=css"]
+
+
+@pytest.mark.parametrize("line, parallel", [
+    ("ng g component login", True),
+    ("ng g c login", True),
+    ("ng g service api", True),
+    ("ng g pipe date", True),
+    ("ng g guard auth", True),
+    ("ng g module admin", False),
+    ("ng g c login --module=app", False),
+    ("ng g c login -m app", False),
+    ("ng g c login --standalone=false", False),
+    ("ng g c login --standalone false", False),
+    ("ng g @ngrx/schematics:store State", False),
+    ("ng g @angular/material:navigation nav", False),
+    ("ng g environments", False),
+])
+def test_only_schematics_writing_their_own_files_run_in_parallel(line, parallel):
+    plan = compile_command_plan(line)
+    assert lines(plan.generate if parallel else plan.serial) == [line]
+
+
+def test_components_of_an_ngmodule_project_run_serially():
+    commands = [Command(["ng", "g", schematic, "x"]) for schematic in ("c", "service", "pipe", "directive", "guard")]
+
+    parallel, serial = split_generate(commands, standalone=False)
+    assert lines(parallel) == ["ng g service x", "ng g guard x"]
+    assert lines(serial) == ["ng g c x", "ng g pipe x", "ng g directive x"]
+    assert split_generate(commands, standalone=True) == (commands, [])
+
+
+def test_is_standalone_project(tmp_path):
+    assert command_service.is_standalone_project(str(tmp_path))
+    (tmp_path / "src" / "app").mkdir(parents=True)
+    (tmp_path / "src" / "app" / "app.module.ts").write_text("")
+    assert not command_service.is_standalone_project(str(tmp_path))
+
+
+def test_installs_get_the_install_idle_timeout(monkeypatch):
+    timeouts = []
+    monkeypatch.setattr(command_service, "COMMAND_DRY_RUN", False)
+    monkeypatch.setattr(command_service, "_run_command", lambda args, cwd, timeout, idle: timeouts.append(idle) or "")
+
+    for args in (["ng", "add", "@ngrx/store"], ["npm", "install"], ["npm", "i", "x"], ["ng", "g", "c", "x"]):
+        command_service.run_command(args, ".")
+    command_service.run_command(["npm", "install"], ".", idle_timeout=5)
+
+    install, default = command_service.COMMAND_INSTALL_IDLE_TIMEOUT, command_service.COMMAND_IDLE_TIMEOUT
+    assert timeouts == [install, install, install, default, 5]
+
+
+def test_failing_command_raises_command_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(command_service, "COMMAND_DRY_RUN", False)
+    with pytest.raises(command_service.CommandError, match="return code 3"):
+        command_service.run_command(["sh", "-c", "echo failing; exit 3"], str(tmp_path))
+
+
+def fake_program(directory, name, script):
+    path = directory / name
+    path.write_text("#!/bin/sh\n" + script)
+    path.chmod(0o755)
+
+
+def test_silent_install_is_not_killed_as_hung(monkeypatch, tmp_path):
+    # npm and ng add print no progress in CI mode: a live install may be silent longer than other commands.
+    fake_program(tmp_path, "npm", "sleep 2\necho installed\n")
+    fake_program(tmp_path, "ng", "sleep 2\necho generated\n")
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    monkeypatch.setattr(command_service, "COMMAND_DRY_RUN", False)
+    monkeypatch.setattr(command_service, "COMMAND_IDLE_TIMEOUT", 1)
+    monkeypatch.setattr(command_service, "COMMAND_INSTALL_IDLE_TIMEOUT", 10)
+
+    assert command_service.run_command(["npm", "install"], str(tmp_path)) == "installed"
+    with pytest.raises(command_service.CommandError, match="no output for 1s"):
+        command_service.run_command(["ng", "g", "c", "x"], str(tmp_path))
@@ -0,0 +1,72 @@
+from app.services.dependency_service import (
+    build_dependency_graph,
+    build_waves,
+    component_selector,
+    component_slug,
+    mentioned_components,
+    resolve_tags,
+)
+
+
+def test_component_names():
+    assert component_slug("LoginForm") == "login-form"
+    assert component_slug("Login Form") == "login-form"
+    assert component_selector("LoginForm") == "app-login-form"
+    assert component_selector("app-header") == "app-header"
+
+
+def test_resolve_tags_maps_selectors_and_ignores_other_elements():
+    components = ["Header", "LoginForm"]
+    tags = ["mat-toolbar", "app-login-form", "header", "div", "app-login-form"]
+    assert resolve_tags(tags, components) == ["LoginForm", "Header"]
+
+
+def test_mentioned_components_only_in_structured_details():
+    components = ["Dashboard", "TileCard", "Chart"]
+    details = {"name": "Dashboard", "layout": "a grid of tile card items above a chart"}
+    assert mentioned_components("Dashboard", details, components) == ["TileCard", "Chart"]
+    assert mentioned_components("Dashboard", "Dashboard with a chart", components) == []
+    # The component's own name is not a dependency.
+    assert mentioned_components("Chart", {"name": "Chart", "type": "Dashboard"}, components) == []
+
+
+def test_build_dependency_graph_combines_tags_and_details():
+    components = ["Dashboard", "TileCard", "Chart"]
+    graph = build_dependency_graph(
+        components,
+        {"Dashboard": {"content": "a chart"}},
+        {"Dashboard": ["app-tile-card", "app-dashboard"]},
+    )
+    assert graph == {"Dashboard": ["TileCard", "Chart"], "TileCard": [], "Chart": []}
+
+
+def test_waves_follow_dependency_levels():
+    components = ["Page", "Form", "Input", "Button", "Footer"]
+    graph = {"Page": ["Form", "Footer"], "Form": ["Input", "Button"], "Input": [], "Button": [], "Footer": []}
+    assert build_waves(components, graph) == [["Input", "Button", "Footer"], ["Form"], ["Page"]]
+
+
+def test_independent_components_form_one_wave_in_input_order():
+    assert build_waves(["C", "A", "B"], {}) == [["C", "A", "B"]]
+
+
+def test_dependencies_outside_the_list_are_treated_as_done():
+    # Already generated components are not scheduled again and do not hold back their dependents.
+    assert build_waves(["Page"], {"Page": ["Header"]}) == [["Page"]]
+
+
+def test_self_and_duplicate_dependencies_are_ignored():
+    assert build_waves(["A", "B"], {"A": ["A", "B", "B"]}) == [["B"], ["A"]]
+
+
+def test_cycles_go_to_a_last_wave_with_their_dependents():
+    components = ["Root", "A", "B", "UsesA", "Leaf"]
+    graph = {"A": ["B"], "B": ["A"], "UsesA": ["A"], "Root": ["Leaf"]}
+    assert build_waves(components, graph) == [["Leaf"], ["Root"], ["A", "B", "UsesA"]]
+
+
+def test_every_component_is_scheduled_once():
+    components = [f"C{i}" for i in range(20)]
+    graph = {f"C{i}": [f"C{(i * 7 + 3) % 20}"] for i in range(20)}
+    waves = build_waves(components, graph)
+    assert sorted(component for wave in waves for component in wave) == sorted(components)
@@ -0,0 +1,27 @@
+import os
+import stat
+from app.services import file_service
+
+
+def mode_of(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_files_get_the_umask_mode(tmp_path):
+    path = tmp_path / "src" / "app.component.ts"
+    file_service.atomic_write(str(path), b"export class AppComponent {}")
+
+    assert path.read_bytes() == b"export class AppComponent {}"
+    assert mode_of(path) == file_service.NEW_FILE_MODE == 0o666 & ~file_service._read_umask()
+    assert os.listdir(path.parent) == ["app.component.ts"]
+
+
+def test_rewrites_keep_the_existing_mode(tmp_path):
+    path = tmp_path / "run.sh"
+    path.write_bytes(b"echo old")
+    os.chmod(path, 0o755)
+
+    file_service.atomic_write(str(path), b"echo new")
+
+    assert path.read_bytes() == b"echo new"
+    assert mode_of(path) == 0o755
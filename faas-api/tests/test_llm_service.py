@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from langchain_core.messages import AIMessage
+import pytest
+from app.services import llm_service, rate_limit_service, token_service
+from app.services.llm_service import CachedChatModel
+
+
+class FakeChatModel:
+    """Answers "answer <n>" for the n-th call; the first async call waits until released."""
+
+    model_name = "fake"
+    temperature = 0
+
+    def __init__(self):
+        self.calls = 0
+        self.first_call_started = threading.Event()
+        self.release = None
+
+    def invoke(self, input, **kwargs):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+    async def ainvoke(self, input, **kwargs):
+        self.calls += 1
+        call = self.calls
+        if call == 1:
+            self.first_call_started.set()
+            await asyncio.sleep(3600)
+        return AIMessage(content=f"answer {call}")
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(llm_service, "LLM_SINGLE_FLIGHT_ENABLED", True)
+    monkeypatch.setattr(rate_limit_service, "LLM_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(token_service, "count_prompt_tokens", lambda input: 1)
+    llm_service.get_llm_cache().clear()
+    return CachedChatModel(FakeChatModel(), cache_enabled=True)
+
+
+def test_followers_share_the_leader_response(model):
+    async def run():
+        async def leader_call():
+            return await model.ainvoke("prompt")
+
+        model.llm.ainvoke = lambda input, **kwargs: asyncio.sleep(0.1, AIMessage(content="shared"))
+        return await asyncio.gather(*(leader_call() for _ in range(5)))
+
+    responses = asyncio.run(run())
+    assert [response.content for response in responses] == ["shared"] * 5
+    assert llm_service._in_flight == {}
+
+
+def test_leader_errors_reach_the_followers(model):
+    async def failing(input, **kwargs):
+        await asyncio.sleep(0.1)
+        raise ValueError("provider down")
+
+    async def run():
+        model.llm.ainvoke = failing
+        return await asyncio.gather(*(model.ainvoke("prompt") for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError] * 3
+
+
+def test_cancelled_leader_hands_the_request_over(model):
+    thread_responses = []
+
+    async def run():
+        leader = asyncio.create_task(model.ainvoke("prompt"))
+        await asyncio.to_thread(model.llm.first_call_started.wait, 5)
+        follower = asyncio.create_task(model.ainvoke("prompt"))
+        # A follower in another thread, as the job of another project would be.
+        thread = threading.Thread(target=lambda: thread_responses.append(model.invoke("prompt")))
+        thread.start()
+        await asyncio.sleep(0.1)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        response = await follower
+        await asyncio.to_thread(thread.join, 5)
+        return response
+
+    response = asyncio.run(run())
+    # One of the followers became the leader and sent the request again, the other got its response
+    # (from the flight, or from the cache when the new leader had already landed).
+    assert response.content.startswith("answer ")
+    assert len(thread_responses) == 1 and thread_responses[0].content.startswith("answer ")
+    assert model.llm.calls == 2
+    assert llm_service._in_flight == {}
+
+
+def test_cancelled_follower_does_not_cancel_the_flight(model):
+    async def run():
+        model.llm.ainvoke = lambda input, **kwargs: asyncio.sleep(0.2, AIMessage(content="shared"))
+        leader = asyncio.create_task(model.ainvoke("prompt"))
+        await asyncio.sleep(0.05)
+        followers = [asyncio.create_task(model.ainvoke("prompt")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        followers[0].cancel()
+        return await leader, await followers[1]
+
+    leader_response, follower_response = asyncio.run(run())
+    assert leader_response.content == follower_response.content == "shared"
@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import inspect
+import pytest
+from app.models.project import Project
+from app.services import blob_service, project_service
+
+
+@pytest.fixture
+def projects(db):
+    rows = [
+        Project(srs_content=f"SRS {i}", status="completed" if i % 2 else "failed",
+                created_at=datetime(2025, 1, 1 + i))
+        for i in range(7)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
+
+
+def page_through(db, **filters):
+    pages, after_id = [], None
+    while True:
+        page, after_id = project_service.list_projects(db, after_id=after_id, **filters)
+        pages.append([project.id for project in page])
+        if after_id is None:
+            return pages
+
+
+def test_pages_follow_the_id_order_without_gaps_or_repeats(db, projects):
+    pages = page_through(db, limit=3)
+    assert pages == [projects[0:3], projects[3:6], projects[6:7]]
+
+
+def test_last_full_page_has_no_next_cursor(db, projects):
+    page, after_id = project_service.list_projects(db, limit=7)
+    assert [project.id for project in page] == projects
+    assert after_id is None
+
+
+def test_cursor_is_the_last_id_of_the_page(db, projects):
+    page, after_id = project_service.list_projects(db, limit=2)
+    assert after_id == page[-1].id == projects[1]
+
+
+def test_rows_deleted_before_the_cursor_do_not_shift_later_pages(db, projects):
+    _, after_id = project_service.list_projects(db, limit=3)
+    db.delete(db.get(Project, projects[0]))
+    db.commit()
+    page, _ = project_service.list_projects(db, after_id=after_id, limit=3)
+    assert [project.id for project in page] == projects[3:6]
+
+
+def test_status_and_creation_filters(db, projects):
+    assert page_through(db, limit=2, statuses=["completed"]) == [projects[1:4:2], projects[5:6]]
+    page, _ = project_service.list_projects(
+        db, created_after=datetime(2025, 1, 3), created_before=datetime(2025, 1, 5), limit=10
+    )
+    assert [project.id for project in page] == projects[2:4]
+
+
+def test_only_the_requested_fields_are_loaded(db, projects):
+    page, _ = project_service.list_projects(db, limit=1, fields=["id", "status"])
+    assert inspect(page[0]).unloaded >= {"srs_content", "stage", "error", "created_at"}
+    assert page[0].status == "failed"
+
+
+def test_srs_is_read_from_the_blob_store_or_the_legacy_column(db):
+    legacy = Project(srs_content="legacy SRS")
+    stored = Project(srs_blob_sha=blob_service.put(db, "stored SRS"))
+    db.add_all([legacy, stored])
+    db.commit()
+
+    assert project_service.get_srs_content(db, legacy) == "legacy SRS"
+    assert project_service.get_srs_content(db, stored) == "stored SRS"
+    assert project_service.get_srs_contents(db, [legacy, stored]) == {legacy.id: "legacy SRS", stored.id: "stored SRS"}
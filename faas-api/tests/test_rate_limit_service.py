@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from app.services import rate_limit_service
+from app.services.rate_limit_service import RateLimitScheduler, TokenBucket
+
+
+def test_bucket_starts_full_and_refills_at_its_rate():
+    bucket = TokenBucket(60, capacity=10)
+    now = bucket.updated_at
+    assert bucket.wait_time(10, now) == 0
+    bucket.take(10)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 1) == 0
+
+
+def test_bucket_never_holds_more_than_its_capacity():
+    bucket = TokenBucket(60, capacity=10)
+    bucket.wait_time(1, bucket.updated_at + 3600)
+    assert bucket.tokens == 10
+    bucket.adjust(-100)
+    assert bucket.tokens == 10
+
+
+def test_requests_larger_than_the_capacity_wait_for_a_full_bucket():
+    bucket = TokenBucket(60, capacity=10)
+    now = bucket.updated_at
+    assert bucket.wait_time(50, now) == 0
+    bucket.take(50)
+    assert bucket.tokens == 0
+
+
+def test_adjust_charges_and_refunds():
+    bucket = TokenBucket(60, capacity=100)
+    bucket.take(50)
+    bucket.adjust(20)
+    assert bucket.tokens == 30
+    bucket.adjust(-40)
+    assert bucket.tokens == 70
+
+
+def test_scheduler_admits_by_priority_then_arrival():
+    scheduler = RateLimitScheduler(6000, 100000)
+    scheduler.requests.tokens = 0
+    order = []
+
+    async def call(name, priority):
+        await scheduler.aacquire(10, priority)
+        order.append(name)
+
+    async def run():
+        tasks = [asyncio.create_task(call(name, priority)) for name, priority in
+                 [("docs", 3), ("tests-1", 2), ("analysis", 0), ("tests-2", 2)]]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["analysis", "tests-1", "tests-2", "docs"]
+    assert scheduler.queue_depth() == 0
+
+
+def test_scheduler_waits_for_the_token_bucket():
+    scheduler = RateLimitScheduler(6000, 6000)
+    scheduler.acquire(6000)
+    started = time.monotonic()
+    scheduler.acquire(50)  # refilled at 100 tokens per second
+    assert time.monotonic() - started == pytest.approx(0.5, abs=0.2)
+
+
+def test_sync_and_async_waiters_share_the_scheduler():
+    scheduler = RateLimitScheduler(600, 100000)
+    scheduler.requests.tokens = 0
+    admitted = []
+    thread = threading.Thread(target=lambda: (scheduler.acquire(1, priority=1), admitted.append("thread")))
+
+    async def run():
+        thread.start()
+        await asyncio.sleep(0.05)
+        await scheduler.aacquire(1, priority=2)
+        admitted.append("coroutine")
+
+    asyncio.run(run())
+    thread.join(timeout=5)
+    assert admitted == ["thread", "coroutine"]
+
+
+def test_cancelled_waiter_leaves_the_line_without_taking_tokens():
+    scheduler = RateLimitScheduler(600, 1000)
+    scheduler.requests.tokens = 0
+
+    async def run():
+        waiter = asyncio.create_task(scheduler.aacquire(400))
+        await asyncio.sleep(0.05)
+        assert scheduler.queue_depth() == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(run())
+    assert scheduler.queue_depth() == 0
+    assert scheduler.tokens.tokens == pytest.approx(1000)
+
+
+def test_waiting_coroutines_do_not_use_threads():
+    scheduler = RateLimitScheduler(60, 100000)
+    scheduler.requests.tokens = 0
+
+    async def run():
+        threads = threading.active_count()
+        waiters = [asyncio.create_task(scheduler.aacquire(1)) for _ in range(20)]
+        await asyncio.sleep(0.1)
+        assert threading.active_count() == threads
+        assert scheduler.queue_depth() == 20
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    asyncio.run(run())
+    assert scheduler.queue_depth() == 0
+
+
+def test_pause_holds_back_every_call():
+    scheduler = RateLimitScheduler(6000, 100000)
+    scheduler.pause(1.0)
+    started = time.monotonic()
+    scheduler.acquire(1)
+    assert time.monotonic() - started >= 0.9
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code,
+                                        headers={"retry-after": retry_after} if retry_after else {})
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (ProviderError(429), True),
+    (ProviderError(503), True),
+    (ProviderError(400), False),
+    (ProviderError(401), False),
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (ValueError(), False),
+])
+def test_is_retryable(error, retryable):
+    assert rate_limit_service.is_retryable(error) == retryable
+
+
+def test_backoff_honors_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit_service, "LLM_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(rate_limit_service, "LLM_BACKOFF_MAX", 8.0)
+    assert 5.0 <= rate_limit_service.get_backoff(0, ProviderError(429, retry_after="5")) <= 6.0
+    assert all(0 <= rate_limit_service.get_backoff(10, ProviderError(503)) <= 8.0 for _ in range(100))
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RateLimitScheduler(6000, 100000)
+    monkeypatch.setattr(rate_limit_service, "LLM_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit_service, "get_scheduler", lambda: scheduler)
+    monkeypatch.setattr(rate_limit_service, "get_backoff", lambda attempt, error: 0.0)
+    return scheduler
+
+
+def test_acall_retries_transient_failures(scheduler):
+    attempts = []
+
+    async def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ProviderError(503)
+        return "response"
+
+    assert asyncio.run(rate_limit_service.acall(fn, "analyze_srs", 100)) == "response"
+    assert len(attempts) == 3
+
+
+def test_acall_does_not_retry_permanent_failures(scheduler):
+    attempts = []
+
+    async def fn():
+        attempts.append(1)
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        asyncio.run(rate_limit_service.acall(fn, "analyze_srs", 100))
+    assert len(attempts) == 1
+
+
+def test_acall_replaces_the_reservation_by_the_reported_usage(scheduler):
+    async def fn():
+        return SimpleNamespace(usage_metadata={"total_tokens": 50})
+
+    asyncio.run(rate_limit_service.acall(fn, "analyze_srs", 1000))
+    assert scheduler.tokens.capacity - scheduler.tokens.tokens == pytest.approx(50, abs=5)
+
+
+def test_acall_gives_the_reservation_back_when_cancelled(scheduler):
+    async def run():
+        async def fn():
+            await asyncio.sleep(10)
+
+        call = asyncio.create_task(rate_limit_service.acall(fn, "analyze_srs", 1000))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    scheduler.tokens.tokens = 50000
+    asyncio.run(run())
+    assert scheduler.tokens.tokens == pytest.approx(50000, abs=5)
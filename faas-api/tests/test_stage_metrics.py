@@ -0,0 +1,59 @@
+import asyncio
+from prometheus_client import REGISTRY
+import pytest
+from app.services import analysis_service, generation_service
+from app.services.common_service import GraphState, timed_stage
+
+
+def stage_count(stage: str, status: str) -> float:
+    labels = {"stage": stage, "status": status}
+    return REGISTRY.get_sample_value("faas_stage_duration_seconds_count", labels) or 0.0
+
+
+@pytest.fixture
+def analyze_screenshot(monkeypatch):
+    monkeypatch.setattr(analysis_service, "SCREENSHOT_CACHE_ENABLED", False)
+    monkeypatch.setattr(analysis_service, "read_image", lambda path: b"png")
+    return timed_stage("analyze_screenshot", generation_service.analyze_screenshot_node)
+
+
+def test_vision_error_fails_the_stage(monkeypatch, analyze_screenshot):
+    async def vision_down(encoded_image):
+        raise RuntimeError("vision model unavailable")
+
+    monkeypatch.setattr(analysis_service, "get_image_info", vision_down)
+    errors_before = stage_count("analyze_screenshot", "error")
+
+    result = asyncio.run(analyze_screenshot(GraphState(screenshot_url="home.png")))
+
+    assert "vision model unavailable" in result["errors"][0]
+    assert stage_count("analyze_screenshot", "error") == errors_before + 1
+
+
+def test_missing_screenshot_fails_the_stage(analyze_screenshot):
+    errors_before = stage_count("analyze_screenshot", "error")
+    result = asyncio.run(analyze_screenshot(GraphState(screenshot_url=None)))
+    assert result["errors"] == ["Screenshot Path not found."]
+    assert stage_count("analyze_screenshot", "error") == errors_before + 1
+
+
+def test_successful_analysis_counts_as_success(monkeypatch, analyze_screenshot):
+    async def describe(encoded_image):
+        return "a login form"
+
+    monkeypatch.setattr(analysis_service, "get_image_info", describe)
+    successes_before = stage_count("analyze_screenshot", "success")
+
+    result = asyncio.run(analyze_screenshot(GraphState(screenshot_url="home.png")))
+
+    assert result["screenshot_details"] == {"screenshot_details": {"description": "a login form"}}
+    assert not result["errors"]
+    assert stage_count("analyze_screenshot", "success") == successes_before + 1
+
+
+def test_srs_analysis_without_input_fails_the_stage():
+    analyze_srs = timed_stage("analyze_srs", generation_service.analyze_srs_node)
+    errors_before = stage_count("analyze_srs", "error")
+    result = asyncio.run(analyze_srs(GraphState(srs_content=None)))
+    assert result["errors"]
+    assert stage_count("analyze_srs", "error") == errors_before + 1